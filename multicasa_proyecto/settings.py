@@ -128,6 +128,88 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Almacén de imágenes de la galería (archivos nombrados por su hash SHA-256).
+# Se puede cambiar por otra clase con los métodos guardar/abrir/existe/ruta.
+MULTICASA_ALMACEN_IMAGENES = 'web.almacenamiento.AlmacenLocalContenido'
+MULTICASA_ALMACEN_IMAGENES_DIR = os.path.join(BASE_DIR, 'almacen_imagenes')
+
+# Geocodificación (la hace el worker: python manage.py procesar_tareas).
+# En pruebas/desarrollo se puede usar 'web.geocodificacion.GeocodificadorFalso'.
+MULTICASA_GEOCODIFICADOR = 'web.geocodificacion.GeocodificadorNominatim'
+MULTICASA_NOMINATIM_INTERVALO = 1.0  # segundos entre peticiones (política de Nominatim)
+MULTICASA_GEOCACHE_DIAS = 180  # vigencia de una dirección encontrada
+MULTICASA_GEOCACHE_DIAS_NEGATIVOS = 7  # vigencia de una dirección sin resultados
+
+# Cola de tareas: una tarea 'en_proceso' sin cambios en estos minutos se da por
+# abandonada (worker detenido a la mitad) y vuelve a la cola con un intento menos
+MULTICASA_TAREAS_MINUTOS_ABANDONO = 30
+
+# Fichas técnicas PDF ya generadas (se regeneran solas cuando la casa cambia)
+MULTICASA_FICHAS_DIR = os.path.join(BASE_DIR, 'fichas_pdf')
+
+# Reportes de ventas generados por el worker. El reporte nocturno se activa una
+# vez con 'python manage.py programar_reporte_nocturno' y corre a esta hora local.
+MULTICASA_REPORTES_DIR = os.path.join(BASE_DIR, 'reportes')
+MULTICASA_REPORTE_NOCTURNO_HORA = 2
+
+# Dashboard: rangos de precio de la gráfica, como (etiqueta, desde, hasta) con
+# desde <= precio < hasta (None = sin límite), y vida máxima de sus datos en caché.
+# Si se cambian los rangos hay que correr 'python manage.py recalcular_resumen'.
+MULTICASA_RANGOS_PRECIO = [
+    ('Menos de $1M', None, 1000000),
+    ('$1M - $2M', 1000000, 2000000),
+    ('$2M - $3M', 2000000, 3000000),
+    ('Más de $3M', 3000000, None),
+]
+MULTICASA_DASHBOARD_CACHE_SEGUNDOS = 600
+
+# Búsqueda por cercanía (?lat=&lng=&radio_km=): radio por defecto y máximo en km
+MULTICASA_RADIO_BUSQUEDA_KM = 10
+MULTICASA_RADIO_MAXIMO_KM = 100
+
+# Mapa de la homepage: vida en caché de los clusters de cada tesela (se invalidan
+# al guardar o borrar una casa)
+MULTICASA_MAPA_CACHE_SEGUNDOS = 300
+
+# Caché de Django. 'default' es la compartida: la usan el servidor web y el worker
+# (versiones de la caché, candados de geocodificación, páginas públicas), así que
+# debe ser la misma para todos los procesos: archivos en el disco o, si se define
+# la variable de entorno MULTICASA_REDIS_URL (p. ej. redis://localhost:6379/1),
+# Redis (requiere el paquete 'redis'). 'local' es memoria de cada proceso; guarda
+# copias de las páginas para no leer la compartida en cada acierto.
+# Los candados (una sola petición genera cada página; un turno por segundo para
+# Nominatim entre procesos) usan cache.add(), que solo es atómico en Redis o
+# Memcached. Con varios procesos en producción, define MULTICASA_REDIS_URL; con
+# la caché de archivos los candados son de mejor esfuerzo.
+MULTICASA_REDIS_URL = os.environ.get('MULTICASA_REDIS_URL')
+if MULTICASA_REDIS_URL:
+    CACHE_COMPARTIDA = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': MULTICASA_REDIS_URL,
+    }
+else:
+    CACHE_COMPARTIDA = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+CACHES = {
+    'default': CACHE_COMPARTIDA,
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'multicasa-paginas',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Páginas públicas en caché (homepage, detalle de casa y API): vida máxima de cada
+# entrada; al guardar o borrar una casa o sus imágenes se invalidan antes.
+MULTICASA_CACHE_PAGINAS_SEGUNDOS = 600
+
+# Fragmentos de la homepage (tarjetas de casa y últimos movimientos). Sus claves
+# llevan la versión de la casa o del listado, así que pueden durar más.
+MULTICASA_CACHE_FRAGMENTOS_SEGUNDOS = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,53 @@
+// Autocompletado de estado, municipio y código postal en el buscador de la homepage.
+// Cada campo con data-autocompletar="<url>" recibe un <datalist> con las sugerencias.
+
+document.addEventListener('DOMContentLoaded', function () {
+    var ESPERA_MS = 200;
+
+    document.querySelectorAll('input[data-autocompletar]').forEach(function (campo) {
+        var lista = document.createElement('datalist');
+        lista.id = campo.id + '_sugerencias';
+        campo.setAttribute('list', lista.id);
+        campo.setAttribute('autocomplete', 'off');
+        campo.parentNode.appendChild(lista);
+
+        var temporizador = null;
+        var ultimaConsulta = null;
+
+        function pedirSugerencias() {
+            var parametros = new URLSearchParams({q: campo.value.trim()});
+            // El municipio se sugiere dentro del estado ya escrito
+            var dependeDe = campo.dataset.dependeDe && document.getElementById(campo.dataset.dependeDe);
+            if (dependeDe && dependeDe.value.trim()) {
+                parametros.set('estado', dependeDe.value.trim());
+            }
+            var url = campo.dataset.autocompletar + '?' + parametros.toString();
+            if (url === ultimaConsulta) {
+                return;
+            }
+            ultimaConsulta = url;
+
+            fetch(url, {headers: {'Accept': 'application/json'}})
+                .then(function (respuesta) { return respuesta.ok ? respuesta.json() : []; })
+                .then(function (sugerencias) {
+                    if (url !== ultimaConsulta) {
+                        return;  // Llegó tarde: ya se pidió otra cosa
+                    }
+                    lista.innerHTML = '';
+                    sugerencias.forEach(function (sugerencia) {
+                        var opcion = document.createElement('option');
+                        opcion.value = sugerencia.valor;
+                        opcion.label = sugerencia.casas + (sugerencia.casas === 1 ? ' casa' : ' casas');
+                        lista.appendChild(opcion);
+                    });
+                })
+                .catch(function () { /* Sin sugerencias; el buscador sigue funcionando */ });
+        }
+
+        campo.addEventListener('input', function () {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(pedirSugerencias, ESPERA_MS);
+        });
+        campo.addEventListener('focus', pedirSugerencias);
+    });
+});
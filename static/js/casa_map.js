@@ -15,6 +15,13 @@ document.addEventListener('DOMContentLoaded', function () {
     var estadoInput    = document.getElementById('id_estado');
     var dirInput       = document.getElementById('id_direccion');
 
+    // Proxy del servidor (caché + límite de peticiones a Nominatim); las URLs
+    // vienen del template del admin (casa_change_form.html)
+    var urlGeoBuscar  = (document.querySelector('meta[name="multicasa-geo-buscar"]') || {}).content || '/geo/search/';
+    var urlGeoInverso = (document.querySelector('meta[name="multicasa-geo-inverso"]') || {}).content || '/geo/reverse/';
+    // Catálogo local de códigos postales (00000 se reemplaza por el CP)
+    var urlCodigoPostal = (document.querySelector('meta[name="multicasa-codigo-postal"]') || {}).content || '/api/codigos-postales/00000/';
+
     if (!latInput || !lngInput) {
         console.log("No se encontraron campos de latitud/longitud. Saliendo.");
         return;
@@ -147,6 +154,9 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    var peticionInversa = null;
+    var esperaClic = null;
+
     function reverseGeocode(lat, lon) {
         
         // -------------------- LIMPIAR CAMPOS ANTES DE LA BÚSQUEDA --------------------
@@ -158,26 +168,28 @@ document.addEventListener('DOMContentLoaded', function () {
         // -------------------- FIN LIMPIEZA --------------------
 
         var params = new URLSearchParams({
-            format: 'json',
-            lat: lat,
-            lon: lon,
-            addressdetails: 1,
-            countrycodes: 'mx' 
+            lat: lat.toFixed(6),
+            lon: lon.toFixed(6)
         });
 
-        var url = 'https://nominatim.openstreetmap.org/reverse?' + params.toString();
+        // Si el usuario hace clic otra vez antes de la respuesta, se cancela la anterior
+        if (peticionInversa) {
+            peticionInversa.abort();
+        }
+        peticionInversa = new AbortController();
 
-        fetch(url, {
-            headers: {
-                'Accept-Language': 'es', 
-                'User-Agent': 'Multicasa/1.0 (contacto@multicasa.com)'
-            }
+        fetch(urlGeoInverso + '?' + params.toString(), {
+            credentials: 'same-origin',
+            signal: peticionInversa.signal
         })
         .then(function (response) {
+            if (!response.ok) {
+                throw new Error('El servidor respondió ' + response.status);
+            }
             return response.json();
         })
         .then(function (data) {
-            if (!data || !data.address) {
+            if (!data || !data.address || Object.keys(data.address).length === 0) {
                 console.log("Sin datos de address en reverse geocode");
                 // Rellenar con los mensajes de "no encontrado"
                 fillAddressFieldsFromNominatim({}); 
@@ -186,14 +198,83 @@ document.addEventListener('DOMContentLoaded', function () {
             fillAddressFieldsFromNominatim(data.address);
         })
         .catch(function (error) {
+            if (error.name === 'AbortError') {
+                return;
+            }
             console.error("Error en reverse geocode:", error);
             // Rellenar con los mensajes de "no encontrado" en caso de error de red
             fillAddressFieldsFromNominatim({});
         });
     }
 
+    var peticionCP = null;
+
+    // Llena municipio/estado (si están vacíos) y, si no hay coordenadas, centra
+    // el mapa en el CP. El catálogo es local: no pasa por Nominatim.
+    function completarDesdeCodigoPostal(codigo) {
+        if (peticionCP) {
+            peticionCP.abort();
+        }
+        peticionCP = new AbortController();
+
+        fetch(urlCodigoPostal.replace('00000', codigo), {
+            credentials: 'same-origin',
+            signal: peticionCP.signal
+        })
+        .then(function (response) {
+            if (response.status === 404) {
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error('El servidor respondió ' + response.status);
+            }
+            return response.json();
+        })
+        .then(function (data) {
+            if (!data) {
+                return;
+            }
+
+            function llenarSiVacio(input, valor, fieldName) {
+                var actual = input.value.trim();
+                if (valor && (!actual || actual === NO_DATA_MSG(fieldName))) {
+                    input.value = valor;
+                }
+            }
+
+            if (municipioInput) llenarSiVacio(municipioInput, data.municipio, 'Municipio');
+            if (estadoInput) llenarSiVacio(estadoInput, data.estado, 'Estado');
+
+            if (data.latitud !== null && data.longitud !== null && !latInput.value && !lngInput.value) {
+                latInput.value = data.latitud.toFixed(8);
+                lngInput.value = data.longitud.toFixed(8);
+                map.setView([data.latitud, data.longitud], 14);
+                if (marker) {
+                    marker.setLatLng([data.latitud, data.longitud]);
+                } else {
+                    marker = L.marker([data.latitud, data.longitud]).addTo(map);
+                }
+            }
+        })
+        .catch(function (error) {
+            if (error.name !== 'AbortError') {
+                console.error('Error consultando el código postal:', error);
+            }
+        });
+    }
+
     // -------------------- EVENTOS --------------------
 
+    // CP completo (5 dígitos) → municipio, estado y centro del mapa
+    if (cpInput) {
+        cpInput.addEventListener('input', function () {
+            var codigo = cpInput.value.trim();
+            if (/^\d{5}$/.test(codigo)) {
+                completarDesdeCodigoPostal(codigo);
+            }
+        });
+    }
+
     // Click en mapa → actualizar lat/long + rellenar dirección/muni/estado/CP
     map.on('click', function (e) {
         var lat = e.latlng.lat;
@@ -208,7 +289,9 @@ document.addEventListener('DOMContentLoaded', function () {
             marker = L.marker(e.latlng).addTo(map);
         }
 
-        reverseGeocode(lat, lng);
+        // Varios clics seguidos solo consultan la dirección del último
+        clearTimeout(esperaClic);
+        esperaClic = setTimeout(function () { reverseGeocode(lat, lng); }, 400);
     });
 
     // Botón: construir query con 1 a 4 campos (calle, muni, estado, CP)
@@ -238,22 +321,20 @@ document.addEventListener('DOMContentLoaded', function () {
             var query = partes.join(', ') + ', México';
 
             var params = new URLSearchParams({
-                format: 'json',
-                q: query,
-                addressdetails: 1,
-                limit: 1,
-                countrycodes: 'mx'
+                q: query
             });
 
-            var url = 'https://nominatim.openstreetmap.org/search?' + params.toString();
-
-            fetch(url, {
-                headers: {
-                    'Accept-Language': 'es',
-                    'User-Agent': 'Multicasa/1.0 (contacto@multicasa.com)'
-                }
+            botonDireccion.disabled = true;
+            fetch(urlGeoBuscar + '?' + params.toString(), {
+                credentials: 'same-origin'
             })
             .then(function (response) {
+                if (response.status === 503) {
+                    throw new Error('El servicio de mapas está ocupado, intenta en unos segundos.');
+                }
+                if (!response.ok) {
+                    throw new Error('El servidor respondió ' + response.status);
+                }
                 return response.json();
             })
             .then(function (data) {
@@ -277,15 +358,18 @@ document.addEventListener('DOMContentLoaded', function () {
                     marker = L.marker([lat, lon]).addTo(map);
                 }
 
-                if (data[0].address) {
+                if (data[0].address && Object.keys(data[0].address).length > 0) {
                     // Llamar a fillAddressFieldsFromNominatim para actualizar los campos de dirección
                     // No limpiamos los campos aquí porque la geocodificación fue exitosa y fillAddressFieldsFromNominatim ya gestiona los mensajes de error.
                     fillAddressFieldsFromNominatim(data[0].address);
                 }
             })
             .catch(function (error) {
-                console.error('Error consultando Nominatim:', error);
-                alert('Error consultando el servicio de mapa.');
+                console.error('Error consultando el servicio de mapa:', error);
+                alert(error.message || 'Error consultando el servicio de mapa.');
+            })
+            .finally(function () {
+                botonDireccion.disabled = false;
             });
         });
     }
@@ -0,0 +1,40 @@
+// Botón "Usar mi ubicación" del buscador: llena lat/lng con la posición del
+// navegador y envía el formulario (la homepage ordena entonces por distancia).
+
+document.addEventListener('DOMContentLoaded', function () {
+    var boton = document.getElementById('boton-cerca-de-mi');
+    var latInput = document.getElementById('lat');
+    var lngInput = document.getElementById('lng');
+    var radioSelect = document.getElementById('radio_km');
+
+    if (!boton || !latInput || !lngInput) {
+        return;
+    }
+    if (!navigator.geolocation) {
+        boton.disabled = true;
+        boton.title = 'Tu navegador no permite obtener la ubicación';
+        return;
+    }
+
+    boton.addEventListener('click', function () {
+        boton.disabled = true;
+        boton.textContent = 'Buscando...';
+        navigator.geolocation.getCurrentPosition(
+            function (posicion) {
+                latInput.value = posicion.coords.latitude.toFixed(6);
+                lngInput.value = posicion.coords.longitude.toFixed(6);
+                // Los campos van deshabilitados mientras no hay ubicación (no se envían vacíos)
+                latInput.disabled = false;
+                lngInput.disabled = false;
+                radioSelect.disabled = false;
+                boton.form.submit();
+            },
+            function () {
+                boton.disabled = false;
+                boton.textContent = '📍 Usar mi ubicación';
+                alert('No se pudo obtener tu ubicación.');
+            },
+            {enableHighAccuracy: false, timeout: 10000, maximumAge: 300000}
+        );
+    });
+});
@@ -0,0 +1,70 @@
+// Mapa de la homepage: pide al servidor los clusters de la ventana visible
+// (/api/mapa/clusters/) y dibuja un círculo por cluster con su cantidad.
+
+document.addEventListener('DOMContentLoaded', function () {
+    var contenedor = document.getElementById('mapa-casas');
+    if (!contenedor || typeof L === 'undefined') {
+        return;
+    }
+
+    // Vista inicial: todo México
+    var map = L.map('mapa-casas').setView([23.6, -102.5], 5);
+    L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        maxZoom: 19,
+        attribution: '&copy; <a href="http://www.openstreetmap.org/copyright">OpenStreetMap</a>'
+    }).addTo(map);
+
+    var capa = L.layerGroup().addTo(map);
+    var ultimaPeticion = 0;
+    var formatoPrecio = new Intl.NumberFormat('es-MX', {style: 'currency', currency: 'MXN', maximumFractionDigits: 0});
+
+    function radioPara(cantidad) {
+        return Math.min(30, 8 + Math.log(cantidad) * 4);
+    }
+
+    function dibujar(datos) {
+        capa.clearLayers();
+        datos.features.forEach(function (feature) {
+            var p = feature.properties;
+            var coordenadas = [feature.geometry.coordinates[1], feature.geometry.coordinates[0]];
+            var marcador = L.circleMarker(coordenadas, {radius: radioPara(p.cantidad), weight: 1, fillOpacity: 0.6});
+            var precios = p.precio_minimo === p.precio_maximo
+                ? formatoPrecio.format(p.precio_minimo)
+                : formatoPrecio.format(p.precio_minimo) + ' - ' + formatoPrecio.format(p.precio_maximo);
+
+            if (p.id_casa) {
+                marcador.bindPopup('<a href="/casa/' + p.id_casa + '/">Ver casa</a><br>' + precios);
+            } else {
+                marcador.bindTooltip(String(p.cantidad), {permanent: true, direction: 'center', className: 'bg-transparent border-0 shadow-none fw-bold'});
+                // Al hacer clic en un cluster se acerca el mapa
+                marcador.on('click', function () {
+                    map.setView(coordenadas, Math.min(map.getZoom() + 2, 19));
+                });
+            }
+            marcador.addTo(capa);
+        });
+    }
+
+    function actualizar() {
+        var limites = map.getBounds();
+        // Leaflet puede dar longitudes fuera de [-180, 180] si el mapa da la vuelta
+        var bbox = [
+            Math.max(-180, limites.getWest()), Math.max(-90, limites.getSouth()),
+            Math.min(180, limites.getEast()), Math.min(90, limites.getNorth())
+        ].map(function (valor) { return valor.toFixed(5); }).join(',');
+        var url = contenedor.dataset.url + '?zoom=' + map.getZoom() + '&bbox=' + bbox;
+        var peticion = ++ultimaPeticion;
+
+        fetch(url, {headers: {'Accept': 'application/json'}})
+            .then(function (respuesta) { return respuesta.json(); })
+            .then(function (datos) {
+                if (peticion === ultimaPeticion && datos.features) {
+                    dibujar(datos);
+                }
+            })
+            .catch(function () { /* El mapa se queda con los clusters anteriores */ });
+    }
+
+    map.on('moveend', actualizar);
+    actualizar();
+});
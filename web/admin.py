@@ -2,7 +2,8 @@ from django.contrib import admin
 from django import forms
 from django.utils.safestring import mark_safe
 
-from .models import Casa, ImagenCasa, ImagenBase
+from .codigos_postales import errores_de_ubicacion
+from .models import Casa, CodigoPostal, GeocodificacionCache, ImagenCasa, ImagenBase, Tarea
 
 
 # =========================
@@ -32,6 +33,7 @@ class ImagenBaseForm(forms.ModelForm):
         archivo_imagen = self.cleaned_data.get('archivo_imagen')
 
         if archivo_imagen:
+            archivo_imagen.seek(0)
             instance.imagen_data = archivo_imagen.read()
             instance.tipo_contenido = archivo_imagen.content_type
             if not instance.nombre:
@@ -50,8 +52,12 @@ class ImagenBaseAdmin(admin.ModelAdmin):
     search_fields = ['nombre', 'categoria']
     readonly_fields = ['preview_imagen']
 
+    def get_queryset(self, request):
+        # El changelist y el autocomplete de ImagenCasaInline no necesitan binarios heredados
+        return super().get_queryset(request).defer('imagen_data')
+
     def preview_imagen(self, obj):
-        src = obj.get_image_src()
+        src = obj.get_miniatura_src()
         if src:
             return mark_safe(
                 f'<img src="{src}" style="max-width: 100px; max-height: 80px;" />'
@@ -139,6 +145,15 @@ class CasaAdminForm(forms.ModelForm):
         if descripcion and any(p in descripcion.lower() for p in palabras_prueba):
             self.add_error('descripcion', 'La descripción contiene palabras de prueba. Ingrese una descripción real.')
 
+        # El municipio y el estado deben ser los del código postal (catálogo local)
+        for campo, mensaje in errores_de_ubicacion(
+            cleaned_data.get('codigo_postal'), cleaned_data.get('estado'), cleaned_data.get('municipio')
+        ).items():
+            valor = cleaned_data.get(campo)
+            self.add_error(campo, mensaje)
+            # add_error quita el campo de cleaned_data y Casa.clean lo reportaría como vacío
+            cleaned_data[campo] = valor
+
         return cleaned_data
 
     class Media:
@@ -164,11 +179,13 @@ class CasaAdmin(admin.ModelAdmin):
         'municipio',
         'estado',
         'estatus',
+        'estado_geocodificacion',
         'fecha_publicacion',
     ]
-    list_filter = ['estatus', 'estado', 'municipio', 'precio', 'fecha_publicacion']
+    list_filter = ['estatus', 'estado', 'municipio', 'precio', 'fecha_publicacion', 'estado_geocodificacion']
     search_fields = ['titulo', 'descripcion', 'direccion', 'municipio', 'estado', 'codigo_postal']
     inlines = [ImagenCasaInline]
+    readonly_fields = ['estado_geocodificacion']
 
     fieldsets = [
         ('Información Básica', {
@@ -182,6 +199,7 @@ class CasaAdmin(admin.ModelAdmin):
                 'codigo_postal',
                 'latitud',
                 'longitud',
+                'estado_geocodificacion',
             ],
             'description': 'Usa el mapa (debajo del código postal) o el botón de código postal para fijar la ubicación.'
         }),
@@ -203,12 +221,48 @@ class ImagenCasaAdmin(admin.ModelAdmin):
     autocomplete_fields = ['casa', 'imagen_base']
     readonly_fields = ['preview_imagen']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('casa', 'imagen_base').defer('imagen_base__imagen_data')
+
     def preview_imagen(self, obj):
-        src = obj.get_image_src()
+        src = obj.get_miniatura_src()
         if src:
             return mark_safe(
                 f'<img src="{src}" style="max-width: 150px; max-height: 120px;" />'
             )
         return "No hay imagen"
 
-    preview_imagen.short_description = "Vista previa"
\ No newline at end of file
+    preview_imagen.short_description = "Vista previa"
+
+
+# =========================
+# ADMIN Tarea (cola en segundo plano)
+# =========================
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'clave', 'estado', 'intentos', 'ejecutar_despues', 'fecha_actualizacion']
+    list_filter = ['estado', 'tipo']
+    search_fields = ['clave', 'ultimo_error']
+    readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
+
+
+# =========================
+# ADMIN GeocodificacionCache
+# =========================
+
+@admin.register(GeocodificacionCache)
+class GeocodificacionCacheAdmin(admin.ModelAdmin):
+    list_display = ['clave', 'encontrado', 'latitud', 'longitud', 'proveedor', 'aciertos', 'fecha_consulta']
+    list_filter = ['encontrado', 'proveedor']
+    search_fields = ['clave']
+
+
+# =========================
+# ADMIN CodigoPostal
+# =========================
+
+@admin.register(CodigoPostal)
+class CodigoPostalAdmin(admin.ModelAdmin):
+    list_display = ['codigo', 'municipio', 'estado', 'ciudad', 'asentamientos', 'latitud', 'longitud']
+    search_fields = ['codigo', 'municipio', 'estado']
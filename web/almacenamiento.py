@@ -0,0 +1,73 @@
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# =========================
+# ALMACÉN DE IMÁGENES DIRECCIONADO POR CONTENIDO
+# =========================
+
+def escribir_atomico(destino, datos):
+    """
+    Escribe a un temporal y renombra: quien lea nunca ve un archivo a medias.
+    """
+    directorio = os.path.dirname(destino)
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(datos)
+        os.replace(temporal, destino)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+class AlmacenLocalContenido:
+    """
+    Guarda cada archivo en disco con su hash SHA-256 como nombre
+    (ej: ab/cd/abcd1234...). Dos imágenes iguales comparten el mismo archivo.
+    """
+
+    def __init__(self, raiz=None):
+        self.raiz = raiz or settings.MULTICASA_ALMACEN_IMAGENES_DIR
+
+    def ruta(self, hash_contenido):
+        return os.path.join(self.raiz, hash_contenido[:2], hash_contenido[2:4], hash_contenido)
+
+    def existe(self, hash_contenido):
+        return bool(hash_contenido) and os.path.exists(self.ruta(hash_contenido))
+
+    def guardar(self, datos):
+        """
+        Escribe los bytes (si no existían ya) y regresa su hash.
+        """
+        datos = bytes(datos)
+        hash_contenido = hashlib.sha256(datos).hexdigest()
+        destino = self.ruta(hash_contenido)
+        if os.path.exists(destino):
+            return hash_contenido
+
+        escribir_atomico(destino, datos)
+        return hash_contenido
+
+    def abrir(self, hash_contenido):
+        return open(self.ruta(hash_contenido), 'rb')
+
+    def eliminar(self, hash_contenido):
+        if self.existe(hash_contenido):
+            os.remove(self.ruta(hash_contenido))
+
+
+@lru_cache(maxsize=1)
+def obtener_almacen():
+    """
+    Instancia del almacén configurado en settings.MULTICASA_ALMACEN_IMAGENES
+    """
+    clase = import_string(settings.MULTICASA_ALMACEN_IMAGENES)
+    return clase()
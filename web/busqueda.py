@@ -0,0 +1,191 @@
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Casa
+from .utilidades import normalizar_texto
+
+
+# =========================
+# BÚSQUEDA DE TEXTO LIBRE (titulo, descripcion, direccion)
+# =========================
+#
+# En MySQL se usa un índice FULLTEXT sobre las tres columnas; en SQLite (pruebas
+# locales) una tabla virtual FTS5 que se mantiene con triggers. En cualquier otra
+# base de datos se cae a icontains por palabra, sin relevancia.
+#
+# Las palabras se normalizan (sin acentos ni mayúsculas), se quitan las palabras
+# vacías y los plurales, y se buscan como prefijo: "jardines" -> jardin*, que
+# encuentra "jardín" y "jardines". Todas las palabras son obligatorias.
+
+TABLA_FTS = 'web_casa_fts'
+INDICE_FULLTEXT = 'casa_texto_ft'
+COLUMNAS_TEXTO = ('titulo', 'descripcion', 'direccion')
+
+# Peso de cada columna en la relevancia de SQLite (bm25), en el orden de COLUMNAS_TEXTO
+PESOS_FTS = (10.0, 1.0, 3.0)
+
+PALABRAS_VACIAS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'o',
+    'para', 'por', 'se', 'sin', 'su', 'sus', 'un', 'una', 'unas', 'unos', 'y',
+}
+VOCALES = set('aeiou')
+
+# Máximo de palabras que se toman de la búsqueda
+MAXIMO_TERMINOS = 8
+
+
+def raiz(palabra):
+    """
+    Quita el plural en español: casas -> casa, jardines -> jardin. Como se busca
+    por prefijo, la raíz debe ser prefijo también del singular.
+    """
+    if len(palabra) > 4 and palabra.endswith('es') and palabra[-3] not in VOCALES:
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith('s') and palabra[-2] in VOCALES:
+        return palabra[:-1]
+    return palabra
+
+
+def terminos_busqueda(texto):
+    """
+    Raíces de las palabras útiles de la búsqueda, sin repetir y en orden.
+    """
+    terminos = []
+    for palabra in normalizar_texto(texto).split():
+        if palabra in PALABRAS_VACIAS or len(palabra) < 2:
+            continue
+        termino = raiz(palabra)
+        if termino not in terminos:
+            terminos.append(termino)
+    return terminos[:MAXIMO_TERMINOS]
+
+
+def _tabla_casa():
+    return connection.ops.quote_name(Casa._meta.db_table)
+
+
+def _buscar_mysql(casas, terminos):
+    # Modo booleano: +palabra* obliga a que aparezca cada término (como prefijo).
+    # El acento y las mayúsculas los ignora la collation de las columnas.
+    consulta = ' '.join(f'+{termino}*' for termino in terminos)
+    columnas = ', '.join(f"{_tabla_casa()}.{connection.ops.quote_name(columna)}" for columna in COLUMNAS_TEXTO)
+    coincide = f"MATCH ({columnas}) AGAINST (%s IN BOOLEAN MODE)"
+    return casas.filter(RawSQL(coincide, (consulta,), output_field=BooleanField())).annotate(
+        relevancia=RawSQL(f"ROUND({coincide}, 6)", (consulta,), output_field=FloatField())
+    )
+
+
+def _buscar_sqlite(casas, terminos):
+    consulta = ' '.join(f'"{termino}"*' for termino in terminos)
+    pesos = ', '.join(str(peso) for peso in PESOS_FTS)
+    # JOIN con la tabla FTS5 (extra() es la única forma de agregarla al FROM): así
+    # bm25 se calcula una vez por resultado. Con una subconsulta correlacionada el
+    # MATCH se repetiría por cada casa.
+    # bm25 es menor entre más relevante: se invierte para ordenar de mayor a menor
+    return casas.extra(
+        tables=[TABLA_FTS],
+        where=[f"{TABLA_FTS}.rowid = {_tabla_casa()}.id_casa", f"{TABLA_FTS} MATCH %s"],
+        params=[consulta],
+    ).annotate(
+        relevancia=RawSQL(f"ROUND(-bm25({TABLA_FTS}, {pesos}), 6)", (), output_field=FloatField())
+    )
+
+
+def _buscar_generico(casas, terminos):
+    for termino in terminos:
+        condicion = Q()
+        for columna in COLUMNAS_TEXTO:
+            condicion |= Q(**{f'{columna}__icontains': termino})
+        casas = casas.filter(condicion)
+    return casas.annotate(relevancia=Value(0.0, output_field=FloatField()))
+
+
+def buscar_texto(casas, texto):
+    """
+    Filtra las casas que contienen todas las palabras de 'texto' y las anota con
+    'relevancia' (mayor = más relevante). Si no queda ninguna palabra útil, regresa
+    el queryset sin tocar.
+    """
+    terminos = terminos_busqueda(texto)
+    if not terminos:
+        return casas
+    if connection.vendor == 'mysql':
+        return _buscar_mysql(casas, terminos)
+    if connection.vendor == 'sqlite':
+        return _buscar_sqlite(casas, terminos)
+    return _buscar_generico(casas, terminos)
+
+
+# =========================
+# CREACIÓN DEL ÍNDICE (migración 0019 y comando reconstruir_busqueda)
+# =========================
+
+def _sql_indice_sqlite(tabla):
+    columnas = ', '.join(COLUMNAS_TEXTO)
+    nuevas = ', '.join(f'new.{columna}' for columna in COLUMNAS_TEXTO)
+    viejas = ', '.join(f'old.{columna}' for columna in COLUMNAS_TEXTO)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+        f"{columnas}, content='{tabla}', content_rowid='id_casa', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_insertar AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {TABLA_FTS}(rowid, {columnas}) VALUES (new.id_casa, {nuevas}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_borrar AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {columnas}) VALUES ('delete', old.id_casa, {viejas}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_actualizar AFTER UPDATE OF {columnas} ON {tabla} BEGIN "
+        f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {columnas}) VALUES ('delete', old.id_casa, {viejas}); "
+        f"INSERT INTO {TABLA_FTS}(rowid, {columnas}) VALUES (new.id_casa, {nuevas}); END",
+        f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')",
+    ]
+
+
+def crear_indice_texto(cursor, vendor, tabla='web_casa'):
+    """
+    Crea el índice de texto de la base de datos (si hace falta) y lo llena.
+    En SQLite también se llama después de migraciones que reconstruyen la tabla
+    web_casa, porque al reconstruirla se pierden los triggers.
+    """
+    if vendor == 'mysql':
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+            [tabla, INDICE_FULLTEXT],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"ALTER TABLE {tabla} ADD FULLTEXT INDEX {INDICE_FULLTEXT} ({', '.join(COLUMNAS_TEXTO)})"
+            )
+    elif vendor == 'sqlite':
+        for sql in _sql_indice_sqlite(tabla):
+            cursor.execute(sql)
+
+
+def asegurar_indice_texto(conexion, tabla='web_casa'):
+    """
+    En SQLite, vuelve a crear el índice si una migración reconstruyó la tabla
+    de casas (al hacerlo SQLite borra sus triggers). Se llama en post_migrate.
+    """
+    if conexion.vendor != 'sqlite':
+        return False
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [tabla])
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s AND name LIKE %s",
+            [tabla, f'{TABLA_FTS}_%'],
+        )
+        if cursor.fetchone()[0] == 3:
+            return False
+        eliminar_indice_texto(cursor, conexion.vendor, tabla)
+        crear_indice_texto(cursor, conexion.vendor, tabla)
+    return True
+
+
+def eliminar_indice_texto(cursor, vendor, tabla='web_casa'):
+    if vendor == 'mysql':
+        cursor.execute(f"ALTER TABLE {tabla} DROP INDEX {INDICE_FULLTEXT}")
+    elif vendor == 'sqlite':
+        for accion in ('insertar', 'borrar', 'actualizar'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {TABLA_FTS}_{accion}")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
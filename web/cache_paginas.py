@@ -0,0 +1,284 @@
+import hashlib
+import re
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+
+# =========================
+# CACHÉ DE PÁGINAS PÚBLICAS (homepage, detalle y API)
+# =========================
+#
+# La respuesta completa de cada vista se guarda con una clave que combina la
+# vista, los parámetros GET normalizados y una versión. Las páginas de listado
+# (homepage, /api/casas/) usan la versión del listado; las de una casa (detalle
+# y /api/casas/<id>/) la versión de esa casa. Al guardar o borrar una Casa, una
+# ImagenCasa o una ImagenBase se cambian solo las versiones afectadas (ver
+# web/signals.py) y las entradas anteriores expiran solas.
+#
+# Las versiones y las páginas viven en la caché compartida ('default': archivos
+# o Redis) para que el servidor web y el worker vean los mismos cambios; cada
+# proceso guarda además una copia en memoria ('local') para no leer el disco o
+# la red en cada acierto. Si una clave no está en caché, una petición toma un
+# candado con cache.add() y las demás esperan su resultado. Eso evita generar la
+# misma página muchas veces a la vez solo si add() es atómico: lo es en Redis y
+# Memcached; en la caché de archivos (el default sin MULTICASA_REDIS_URL) no, y
+# dos peticiones simultáneas pueden generar la misma página (el resultado es el
+# mismo, solo se repite el trabajo).
+#
+# La clave incluye el esquema y el host: la API responde URLs absolutas (next,
+# previous, imágenes), que no deben servirse a quien entró por otro dominio.
+#
+# No se usa la caché con usuarios autenticados, con peticiones que no son GET ni
+# con mensajes pendientes (los del formulario de contacto). El token CSRF de los
+# formularios se guarda como una marca y se reemplaza por el de cada visitante.
+
+CLAVE_VERSION_LISTADO = 'paginas:version:listado'
+
+# Segundos que una petición espera a que otra termine de generar la misma página
+ESPERA_MAXIMA = 5
+
+# Parámetros que no cambian la respuesta (campañas, redes sociales)
+PARAMETROS_IGNORADOS = {'fbclid', 'gclid'}
+
+MARCA_CSRF = b'__multicasa_csrf__'
+TOKEN_CSRF = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _segundos_cache():
+    return getattr(settings, 'MULTICASA_CACHE_PAGINAS_SEGUNDOS', 600)
+
+
+def _compartida():
+    return caches[getattr(settings, 'MULTICASA_CACHE_PAGINAS', 'default')]
+
+
+def _local():
+    alias = getattr(settings, 'MULTICASA_CACHE_PAGINAS_LOCAL', 'local')
+    return caches[alias] if alias in settings.CACHES else None
+
+
+def clave_version_casa(id_casa):
+    return f'paginas:version:casa:{id_casa}'
+
+
+# --- Versiones ---
+
+def version_nueva():
+    # Nunca se repite, aunque la versión anterior se haya perdido de la caché
+    return int(time.time() * 1000)
+
+
+def _version(clave):
+    cache = _compartida()
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, version_nueva(), None)
+        version = cache.get(clave)
+    return version
+
+
+def _cambiar_version(clave):
+    cache = _compartida()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, version_nueva(), None)
+
+
+def invalidar_paginas(*ids_casa):
+    """
+    Cambia la versión del listado y la de cada casa indicada. Si hay una
+    transacción abierta, espera a que se confirme (antes, una petición podría
+    volver a guardar los datos viejos con la versión nueva).
+    """
+    def cambiar():
+        _cambiar_version(CLAVE_VERSION_LISTADO)
+        for id_casa in set(ids_casa):
+            _cambiar_version(clave_version_casa(id_casa))
+
+    transaction.on_commit(cambiar)
+
+
+# --- Claves ---
+
+def parametros_normalizados(parametros):
+    """
+    Query string con los parámetros ordenados y sin valores vacíos:
+    ?estado=Jalisco&q= y ?q=&estado=Jalisco comparten la misma entrada.
+    """
+    pares = []
+    for nombre in sorted(parametros):
+        if nombre in PARAMETROS_IGNORADOS or nombre.startswith('utm_'):
+            continue
+        valores = sorted(valor.strip() for valor in parametros.getlist(nombre) if valor.strip())
+        pares.extend((nombre, valor) for valor in valores)
+    return urlencode(pares)
+
+
+def _clave_pagina(nombre, version, request, args, kwargs):
+    # La API responde HTML (navegable) o JSON según el Accept
+    formato = 'html' if 'text/html' in request.META.get('HTTP_ACCEPT', '') else 'otro'
+    partes = [
+        request.scheme,
+        request.get_host(),
+        parametros_normalizados(request.GET),
+        formato,
+        *(str(valor) for valor in args),
+        *(f'{campo}={valor}' for campo, valor in sorted(kwargs.items())),
+    ]
+    huella = hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()
+    return f'paginas:{nombre}:{version}:{huella}'
+
+
+# --- Respuestas ---
+
+def _usa_cache(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # len() no marca los mensajes como leídos
+    return len(messages.get_messages(request)) == 0
+
+
+def _como_entrada(response, tipos):
+    """
+    Contenido y cabeceras de la respuesta para guardarla, o None si no se debe
+    guardar (errores, streaming, cookies propias u otro tipo de contenido).
+    """
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+    if not response.get('Content-Type', '').startswith(tipos):
+        return None
+    return {
+        'contenido': TOKEN_CSRF.sub(rb'\1' + MARCA_CSRF + rb'\2', response.content),
+        # Content-Length cambia al reemplazar el token CSRF; lo calcula HttpResponse
+        'cabeceras': {nombre: valor for nombre, valor in response.headers.items() if nombre.lower() != 'content-length'},
+    }
+
+
+def _como_respuesta(request, entrada, estado_cache):
+    contenido = entrada['contenido']
+    if MARCA_CSRF in contenido:
+        contenido = contenido.replace(MARCA_CSRF, get_token(request).encode('ascii'))
+    response = HttpResponse(contenido)
+    for nombre, valor in entrada['cabeceras'].items():
+        response[nombre] = valor
+    response['X-Cache'] = estado_cache
+    return response
+
+
+def pagina_en_cache(nombre, por_casa=False, tipos=('text/html',)):
+    """
+    Decorador de vistas públicas. Con por_casa=True la vista recibe id_casa y su
+    entrada depende solo de la versión de esa casa; si no, de la del listado.
+    'tipos' son los Content-Type que se guardan.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not _usa_cache(request):
+                return vista(request, *args, **kwargs)
+
+            clave_version = clave_version_casa(kwargs['id_casa']) if por_casa else CLAVE_VERSION_LISTADO
+            version = _version(clave_version)
+            clave = _clave_pagina(nombre, version, request, args, kwargs)
+            compartida, local = _compartida(), _local()
+
+            entrada = local.get(clave) if local is not None else None
+            if entrada is not None:
+                return _como_respuesta(request, entrada, 'HIT')
+            entrada = compartida.get(clave)
+            if entrada is not None:
+                if local is not None:
+                    local.set(clave, entrada, _segundos_cache())
+                return _como_respuesta(request, entrada, 'HIT')
+
+            # Solo una petición genera la página; las demás esperan su resultado
+            candado = f'{clave}:en_curso'
+            limite = time.monotonic() + ESPERA_MAXIMA
+            while not compartida.add(candado, 1, timeout=30):
+                if time.monotonic() > limite:
+                    # Tarda demasiado: la generamos también, sin esperar más
+                    candado = None
+                    break
+                time.sleep(0.05)
+                entrada = compartida.get(clave)
+                if entrada is not None:
+                    return _como_respuesta(request, entrada, 'HIT')
+
+            try:
+                response = vista(request, *args, **kwargs)
+                entrada = _como_entrada(response, tipos)
+                if entrada is not None:
+                    compartida.set(clave, entrada, _segundos_cache())
+                    if local is not None:
+                        local.set(clave, entrada, _segundos_cache())
+                    response['X-Cache'] = 'MISS'
+                return response
+            finally:
+                if candado is not None:
+                    compartida.delete(candado)
+
+        return envoltura
+    return decorador
+
+
+# =========================
+# CACHÉ DE FRAGMENTOS (tarjetas de casa y últimos movimientos de la homepage)
+# =========================
+#
+# Cada tarjeta de casa se guarda con {% cache %} usando la versión de esa casa, y
+# el bloque de últimos movimientos con la versión del listado: son las mismas
+# versiones de las páginas, así que las invalidan las mismas señales. Una
+# combinación nueva de filtros solo paga la consulta y arma tarjetas ya hechas.
+# Los fragmentos van en la caché 'local' (si no existe, en la compartida): las
+# claves llevan la versión, así que cada proceso ve los cambios al momento.
+
+FRAGMENTO_TARJETA = 'tarjeta_casa'
+
+
+def segundos_cache_fragmentos():
+    return getattr(settings, 'MULTICASA_CACHE_FRAGMENTOS_SEGUNDOS', 3600)
+
+
+def alias_cache_fragmentos():
+    alias = getattr(settings, 'MULTICASA_CACHE_PAGINAS_LOCAL', 'local')
+    return alias if alias in settings.CACHES else getattr(settings, 'MULTICASA_CACHE_PAGINAS', 'default')
+
+
+def version_listado():
+    return _version(CLAVE_VERSION_LISTADO)
+
+
+def preparar_tarjetas(casas, prefetch):
+    """
+    Anota cada casa con 'version_cache' (la de su tarjeta) y aplica el prefetch
+    de imágenes solo a las casas cuya tarjeta no está en caché.
+    """
+    claves_version = {casa.pk: clave_version_casa(casa.pk) for casa in casas}
+    versiones = _compartida().get_many(list(claves_version.values()))
+    for casa in casas:
+        clave = claves_version[casa.pk]
+        casa.version_cache = versiones[clave] if clave in versiones else _version(clave)
+
+    claves = {
+        make_template_fragment_key(FRAGMENTO_TARJETA, [casa.pk, casa.version_cache]): casa
+        for casa in casas
+    }
+    en_cache = caches[alias_cache_fragmentos()].get_many(list(claves))
+    faltan = [casa for clave, casa in claves.items() if clave not in en_cache]
+    prefetch_related_objects(faltan, prefetch)
+    return casas
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .utilidades import normalizar_texto
+
+
+# =========================
+# CATÁLOGO DE CÓDIGOS POSTALES EN MEMORIA
+# =========================
+#
+# La tabla CodigoPostal (unos 32 mil renglones) se carga completa en un
+# diccionario la primera vez que se consulta: después cada búsqueda es un acceso
+# al diccionario, sin base de datos ni red. Al reimportar el catálogo se cambia
+# una versión en la caché y cada proceso lo vuelve a cargar (lo revisa cada
+# SEGUNDOS_REVISION, no en cada búsqueda).
+
+UbicacionCP = namedtuple('UbicacionCP', 'codigo estado municipio ciudad latitud longitud')
+
+CLAVE_VERSION_CATALOGO = 'codigos_postales:version'
+SEGUNDOS_REVISION = 60
+
+_catalogo = {'version': None, 'revisado': 0.0, 'datos': {}}
+_candado = threading.Lock()
+
+
+def _cargar():
+    from .models import CodigoPostal
+
+    datos = {}
+    for fila in CodigoPostal.objects.values_list(
+        'codigo', 'estado', 'municipio', 'ciudad', 'latitud', 'longitud'
+    ).iterator(chunk_size=5000):
+        codigo, estado, municipio, ciudad, latitud, longitud = fila
+        datos[codigo] = UbicacionCP(
+            codigo, estado, municipio, ciudad,
+            float(latitud) if latitud is not None else None,
+            float(longitud) if longitud is not None else None,
+        )
+    return datos
+
+
+def _datos():
+    ahora = time.monotonic()
+    if ahora - _catalogo['revisado'] < SEGUNDOS_REVISION:
+        return _catalogo['datos']
+    with _candado:
+        version = cache.get(CLAVE_VERSION_CATALOGO, 0)
+        if version != _catalogo['version']:
+            _catalogo['datos'] = _cargar()
+            _catalogo['version'] = version
+        _catalogo['revisado'] = time.monotonic()
+    return _catalogo['datos']
+
+
+def buscar_codigo_postal(codigo):
+    """
+    UbicacionCP del código postal, o None si no está en el catálogo.
+    """
+    if not codigo:
+        return None
+    return _datos().get(str(codigo).strip())
+
+
+def catalogo_modificado():
+    """
+    Lo llama importar_codigos_postales: todos los procesos recargan el catálogo.
+    """
+    cache.set(CLAVE_VERSION_CATALOGO, time.time(), None)
+    _catalogo['revisado'] = 0.0
+
+
+# Nombres comunes de estados que no empiezan como el nombre oficial de SEPOMEX
+ALIAS_ESTADOS = {
+    'cdmx': 'ciudad de mexico',
+    'df': 'ciudad de mexico',
+    'distrito federal': 'ciudad de mexico',
+    'edomex': 'mexico',
+    'estado de mexico': 'mexico',
+}
+
+
+def mismo_estado(escrito, oficial):
+    """
+    'Coahuila' es el mismo estado que 'Coahuila de Zaragoza' (nombre de SEPOMEX).
+    """
+    escrito = normalizar_texto(escrito)
+    escrito = ALIAS_ESTADOS.get(escrito, escrito)
+    oficial = normalizar_texto(oficial)
+    return escrito == oficial or oficial.startswith(escrito + ' ')
+
+
+def errores_de_ubicacion(codigo_postal, estado, municipio):
+    """
+    Compara estado y municipio con los del CP en el catálogo (sin acentos ni
+    mayúsculas). Regresa {campo: mensaje}; vacío si coinciden o si el CP no
+    está en el catálogo. Como municipio también se acepta la ciudad del CP.
+    """
+    ubicacion = buscar_codigo_postal(codigo_postal)
+    if ubicacion is None:
+        return {}
+
+    errores = {}
+    if estado and not mismo_estado(estado, ubicacion.estado):
+        errores['estado'] = f"El CP {ubicacion.codigo} pertenece a {ubicacion.estado}."
+    if municipio and normalizar_texto(municipio) not in {
+        normalizar_texto(ubicacion.municipio), normalizar_texto(ubicacion.ciudad)
+    }:
+        errores['municipio'] = f"El CP {ubicacion.codigo} pertenece al municipio de {ubicacion.municipio}."
+    return errores
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import Casa, ResumenCasas
+from .resumen import rangos_precio
+
+
+# =========================
+# ESTADÍSTICAS DEL DASHBOARD (en caché)
+# =========================
+#
+# Todos los datos de las gráficas se calculan juntos (casi todo a partir de
+# ResumenCasas, que tiene pocos renglones) y se guardan en la caché.
+# Al guardar o borrar una Casa se invalida la entrada (ver web/signals.py); el
+# tiempo de vida es solo una red de seguridad para cambios hechos con update().
+
+CLAVE_CACHE_DASHBOARD = 'dashboard:estadisticas'
+
+# Cuántos meses muestra la gráfica de publicaciones
+MESES_PUBLICACIONES = 12
+
+
+def _conteos():
+    """
+    Casas por estatus y por rango de precio en UNA consulta sobre el resumen
+    precalculado (ver web/resumen.py), no sobre toda la tabla de casas.
+    """
+    agregados = {}
+    for i, (estatus, _) in enumerate(Casa.ESTATUS_CHOICES):
+        agregados[f'estatus_{i}'] = Coalesce(Sum('cantidad', filter=Q(estatus=estatus)), 0)
+    for i in range(len(rangos_precio())):
+        agregados[f'rango_{i}'] = Coalesce(Sum('cantidad', filter=Q(rango=i)), 0)
+    return ResumenCasas.objects.aggregate(**agregados)
+
+
+def _precio_m2_por_estado():
+    """
+    Precio promedio por m² de cada estado: suma de precios entre suma de
+    superficies (así una casa enorme no pesa igual que una pequeña).
+    """
+    filas = (
+        ResumenCasas.objects.values('estado')
+        .annotate(precio_total=Sum('suma_precio_con_superficie'), superficie_total=Sum('suma_superficie'))
+        .order_by('estado')
+    )
+    return [
+        (fila['estado'] or 'Sin estado', round(float(fila['precio_total']) / fila['superficie_total'], 2))
+        for fila in filas
+        if fila['superficie_total']
+    ]
+
+
+def _publicaciones_por_mes():
+    # Primer día del mes de hace MESES_PUBLICACIONES - 1 meses
+    hoy = timezone.localtime()
+    meses = hoy.year * 12 + hoy.month - 1 - (MESES_PUBLICACIONES - 1)
+    desde = hoy.replace(year=meses // 12, month=meses % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    filas = (
+        Casa.objects.filter(fecha_publicacion__gte=desde)
+        .annotate(mes=TruncMonth('fecha_publicacion'))
+        .values('mes')
+        .annotate(cantidad=Count('id_casa'))
+        .order_by('mes')
+    )
+    return [(fila['mes'].strftime('%m/%Y'), fila['cantidad']) for fila in filas]
+
+
+def calcular_estadisticas():
+    conteos = _conteos()
+    precio_m2 = _precio_m2_por_estado()
+    publicaciones = _publicaciones_por_mes()
+    return {
+        'estatus_labels': [etiqueta for _, etiqueta in Casa.ESTATUS_CHOICES],
+        'estatus_valores': [conteos[f'estatus_{i}'] for i in range(len(Casa.ESTATUS_CHOICES))],
+        'costo_labels': [etiqueta for etiqueta, _, _ in rangos_precio()],
+        'costo_valores': [conteos[f'rango_{i}'] for i in range(len(rangos_precio()))],
+        'precio_m2_labels': [estado for estado, _ in precio_m2],
+        'precio_m2_valores': [valor for _, valor in precio_m2],
+        'publicaciones_labels': [mes for mes, _ in publicaciones],
+        'publicaciones_valores': [cantidad for _, cantidad in publicaciones],
+        'calculado_en': timezone.now(),
+    }
+
+
+def estadisticas_dashboard():
+    datos = cache.get(CLAVE_CACHE_DASHBOARD)
+    if datos is None:
+        datos = calcular_estadisticas()
+        cache.set(CLAVE_CACHE_DASHBOARD, datos, getattr(settings, 'MULTICASA_DASHBOARD_CACHE_SEGUNDOS', 600))
+    return datos
+
+
+def invalidar_estadisticas():
+    """
+    Borra la entrada cuando se confirma la transacción: antes, una petición del
+    dashboard podría volver a guardar los datos previos al cambio.
+    """
+    transaction.on_commit(lambda: cache.delete(CLAVE_CACHE_DASHBOARD))
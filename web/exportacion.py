@@ -0,0 +1,135 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Casa, ImagenCasa, url_variante
+
+
+# =========================
+# EXPORTACIÓN DEL CATÁLOGO (CSV / JSONL / XLSX)
+# =========================
+#
+# Todo se genera fila por fila: las casas se leen con values() en lotes por
+# id_casa (WHERE id_casa > último ORDER BY id_casa LIMIT n), sin instanciar
+# modelos ni cargar toda la tabla. No se usa iterator(): con mysqlclient el
+# cursor normal trae el resultado completo a memoria aunque se lea por partes.
+# Así la memoria se mantiene constante aunque el catálogo tenga cientos de
+# miles de casas.
+
+CAMPOS_EXPORTACION = [
+    'id_casa',
+    'titulo',
+    'precio',
+    'estatus',
+    'habitaciones',
+    'banos',
+    'superficie_m2',
+    'direccion',
+    'municipio',
+    'estado',
+    'codigo_postal',
+    'latitud',
+    'longitud',
+    'fecha_publicacion',
+]
+
+TAMANO_LOTE_EXPORTACION = 2000
+
+
+def _portadas(ids_casas):
+    """
+    {id_casa: id_imagen_base} de la primera imagen de cada casa del lote (una consulta).
+    """
+    portadas = {}
+    imagenes = (
+        ImagenCasa.objects.filter(casa_id__in=ids_casas)
+        .order_by('casa_id', 'orden', 'id_imagen_casa')
+        .values_list('casa_id', 'imagen_base_id')
+    )
+    for id_casa, id_imagen in imagenes:
+        portadas.setdefault(id_casa, id_imagen)
+    return portadas
+
+
+def filas_catalogo(casas=None, incluir_portada=False, url_base='', tamano_lote=TAMANO_LOTE_EXPORTACION):
+    """
+    Genera un dict por casa con CAMPOS_EXPORTACION (y 'portada' si se pide).
+    'url_base' se antepone a la URL de la portada (p. ej. 'https://multicasa.com').
+    """
+    if casas is None:
+        casas = Casa.objects.all()
+    casas = casas.order_by('id_casa').values(*CAMPOS_EXPORTACION)
+
+    ultimo = None
+    while True:
+        pendientes = casas if ultimo is None else casas.filter(id_casa__gt=ultimo)
+        lote = list(pendientes[:tamano_lote])
+        if not lote:
+            return
+        ultimo = lote[-1]['id_casa']
+        if incluir_portada:
+            portadas = _portadas([fila['id_casa'] for fila in lote])
+            for fila in lote:
+                id_imagen = portadas.get(fila['id_casa'])
+                fila['portada'] = f"{url_base}{url_variante(id_imagen, 'tarjeta', 'jpeg')}" if id_imagen else ''
+        yield from lote
+
+
+def columnas_exportacion(incluir_portada=False):
+    return CAMPOS_EXPORTACION + (['portada'] if incluir_portada else [])
+
+
+class _Eco:
+    """
+    "Archivo" que regresa lo que se le escribe, para usar csv.writer sin buffer.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(filas, columnas):
+    escritor = csv.DictWriter(_Eco(), fieldnames=columnas, extrasaction='ignore')
+    # BOM para que Excel abra bien los acentos
+    yield '\ufeff' + escritor.writeheader()
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def generar_jsonl(filas, columnas=None):
+    for fila in filas:
+        yield json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def escribir_xlsx(filas, columnas, destino):
+    """
+    Escribe un .xlsx en modo write_only (no guarda las filas en memoria).
+    Requiere openpyxl, que es opcional.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ImportError("La exportación a XLSX requiere openpyxl (pip install openpyxl).")
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Casas')
+    hoja.append(columnas)
+    for fila in filas:
+        valores = []
+        for columna in columnas:
+            valor = fila.get(columna)
+            # Excel no acepta fechas con zona horaria
+            if hasattr(valor, 'tzinfo') and valor.tzinfo is not None:
+                valor = valor.replace(tzinfo=None)
+            valores.append(valor)
+        hoja.append(valores)
+    libro.save(destino)
+
+
+GENERADORES = {
+    'csv': (generar_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (generar_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
+
+TIPO_CONTENIDO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import io
+import os
+import shutil
+
+from django.conf import settings
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+from .almacenamiento import escribir_atomico, obtener_almacen
+from .models import ImagenCasa, VarianteImagen
+
+
+# =========================
+# CACHÉ EN DISCO DE FICHAS TÉCNICAS PDF
+# =========================
+#
+# Cada ficha se guarda como <MULTICASA_FICHAS_DIR>/<id_casa>/<huella>.pdf, donde
+# la huella es un hash de los campos e imágenes que usa la plantilla. Si la casa
+# o su portada cambian, cambia la huella y la ficha anterior deja de usarse.
+
+PLANTILLA_FICHA = 'publico/ficha_tecnica.html'
+
+# Cambiar este número invalida todas las fichas (p. ej. al modificar la plantilla)
+VERSION_FICHA = 1
+
+CAMPOS_FICHA = [
+    'titulo',
+    'descripcion',
+    'precio',
+    'estatus',
+    'direccion',
+    'municipio',
+    'estado',
+    'codigo_postal',
+    'habitaciones',
+    'banos',
+    'superficie_m2',
+    'latitud',
+    'longitud',
+]
+
+
+def directorio_fichas(id_casa):
+    raiz = getattr(settings, 'MULTICASA_FICHAS_DIR', os.path.join(settings.BASE_DIR, 'fichas_pdf'))
+    return os.path.join(raiz, str(id_casa))
+
+
+def portada_ficha(casa):
+    """
+    Primera imagen de la casa, con su ImagenBase (una consulta).
+    """
+    return (
+        ImagenCasa.objects.filter(casa=casa)
+        .select_related('imagen_base')
+        .defer('imagen_base__imagen_data')
+        .order_by('orden', 'id_imagen_casa')
+        .first()
+    )
+
+
+def huella_ficha(casa, portada):
+    """
+    Hash de todo lo que aparece en el PDF: si no cambia, el PDF tampoco.
+    """
+    partes = [str(VERSION_FICHA), str(casa.pk)]
+    partes += [f"{campo}={getattr(casa, campo)}" for campo in CAMPOS_FICHA]
+    if portada is not None:
+        partes += [
+            str(portada.imagen_base_id),
+            portada.imagen_base.hash_contenido,
+            portada.texto_alternativo or '',
+        ]
+    return hashlib.sha256("\n".join(partes).encode('utf-8')).hexdigest()[:32]
+
+
+def ruta_ficha(id_casa, huella):
+    return os.path.join(directorio_fichas(id_casa), f"{huella}.pdf")
+
+
+def imagen_para_pdf(imagen_base):
+    """
+    La imagen como data URI, leída del almacén local: el PDF nunca hace peticiones
+    de red (y no depende de qué rutas de disco permita leer xhtml2pdf).
+    Prefiere la variante 'completa' en JPEG; si no existe, usa el original.
+    """
+    variante = (
+        VarianteImagen.objects.filter(imagen_base_id=imagen_base.pk, tipo='completa', formato='jpeg')
+        .values_list('hash_contenido', 'tipo_contenido')
+        .first()
+    )
+    if variante is not None and obtener_almacen().existe(variante[0]):
+        with obtener_almacen().abrir(variante[0]) as archivo:
+            datos, tipo_contenido = archivo.read(), variante[1]
+    else:
+        datos, tipo_contenido = imagen_base.leer_datos(), imagen_base.tipo_contenido
+    if not datos:
+        return None
+    return f"data:{tipo_contenido};base64,{base64.b64encode(datos).decode('ascii')}"
+
+
+def renderizar_ficha(casa, portada):
+    """
+    Renderiza el PDF y regresa sus bytes (o None si xhtml2pdf falló).
+    """
+    contexto = {
+        'casa': casa,
+        'portada': portada,
+        'imagen_portada': imagen_para_pdf(portada.imagen_base) if portada is not None else None,
+    }
+    html = get_template(PLANTILLA_FICHA).render(contexto)
+    resultado = io.BytesIO()
+    pdf = pisa.pisaDocument(io.BytesIO(html.encode("UTF-8")), resultado)
+    if pdf.err:
+        return None
+    return resultado.getvalue()
+
+
+def _limpiar_anteriores(id_casa, vigente):
+    directorio = directorio_fichas(id_casa)
+    if not os.path.isdir(directorio):
+        return
+    for nombre in os.listdir(directorio):
+        if nombre != os.path.basename(vigente) and not nombre.startswith('.tmp-'):
+            try:
+                os.remove(os.path.join(directorio, nombre))
+            except FileNotFoundError:
+                pass
+
+
+def obtener_ficha(casa, portada=None, huella=None):
+    """
+    Regresa la ruta del PDF vigente de la casa; lo genera si aún no existe.
+    Regresa None si no se pudo generar.
+    """
+    if huella is None:
+        portada = portada_ficha(casa)
+        huella = huella_ficha(casa, portada)
+
+    ruta = ruta_ficha(casa.pk, huella)
+    if os.path.exists(ruta):
+        return ruta
+
+    datos = renderizar_ficha(casa, portada)
+    if datos is None:
+        return None
+    escribir_atomico(ruta, datos)
+    _limpiar_anteriores(casa.pk, ruta)
+    return ruta
+
+
+def eliminar_fichas(id_casa):
+    shutil.rmtree(directorio_fichas(id_casa), ignore_errors=True)
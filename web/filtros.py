@@ -0,0 +1,106 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from .busqueda import buscar_texto
+from .geo import cerca_de, dentro_de_caja, leer_caja, leer_centro
+from .utilidades import normalizar_texto
+
+
+# =========================
+# FILTROS DE BÚSQUEDA DE CASAS (homepage y API)
+# =========================
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decimal(valor):
+    try:
+        numero = Decimal(valor)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    # 'nan' e 'inf' son Decimal válidos, pero la consulta no los acepta
+    return numero if numero.is_finite() else None
+
+
+def prefijo(campo, texto):
+    """
+    campo LIKE 'texto%' escrito como rango (texto <= campo < siguiente), para que
+    cualquier base de datos lo resuelva con el índice sin importar su collation.
+    """
+    return Q(**{f'{campo}__gte': texto, f'{campo}__lt': texto[:-1] + chr(ord(texto[-1]) + 1)})
+
+
+def filtrar_casas(casas, parametros):
+    """
+    Aplica los filtros del buscador (los mismos GET de la homepage).
+    Los valores numéricos inválidos se ignoran en lugar de provocar un error.
+    Con ?q= las casas quedan anotadas con 'relevancia' (ver web/busqueda.py) y
+    con ?lat=&lng= con 'distancia' (ver web/geo.py).
+    """
+    texto = (parametros.get('q') or '').strip()
+    if texto:
+        casas = buscar_texto(casas, texto)
+
+    # Ventana del mapa (?bbox=oeste,sur,este,norte) y radio alrededor de un punto
+    caja = leer_caja(parametros)
+    if caja:
+        casas = dentro_de_caja(casas, *caja)
+
+    centro = leer_centro(parametros)
+    if centro:
+        casas = cerca_de(casas, *centro)
+
+    # Estado y municipio se comparan contra sus copias normalizadas (sin acentos ni
+    # mayúsculas) por prefijo: 'nuevo' encuentra 'Nuevo León' usando el índice
+    # (estatus, estado_normalizado, municipio_normalizado).
+    estado = normalizar_texto(parametros.get('estado'))
+    if estado:
+        casas = casas.filter(prefijo('estado_normalizado', estado))
+
+    municipio = normalizar_texto(parametros.get('municipio'))
+    if municipio:
+        casas = casas.filter(prefijo('municipio_normalizado', municipio))
+
+    codigo_postal = (parametros.get('codigo_postal') or '').strip()
+    if codigo_postal:
+        # Un CP completo se busca exacto; uno parcial, por prefijo ('250' -> 250xx)
+        if len(codigo_postal) == 5 and codigo_postal.isdigit():
+            casas = casas.filter(codigo_postal=codigo_postal)
+        else:
+            casas = casas.filter(prefijo('codigo_postal', codigo_postal))
+
+    habitaciones = _entero(parametros.get('habitaciones'))
+    if habitaciones is not None:
+        casas = casas.filter(habitaciones=habitaciones)
+
+    banos = _entero(parametros.get('banos'))
+    if banos is not None:
+        casas = casas.filter(banos=banos)
+
+    min_precio = _decimal(parametros.get('min_precio'))
+    if min_precio is not None:
+        casas = casas.filter(precio__gte=min_precio)
+
+    max_precio = _decimal(parametros.get('max_precio'))
+    if max_precio is not None:
+        casas = casas.filter(precio__lte=max_precio)
+
+    return casas
+
+
+def orden_resultados(casas):
+    """
+    Orden de la paginación por cursor: por distancia si se buscó alrededor de un
+    punto, por relevancia si hubo búsqueda de texto, si no, las más recientes
+    primero. El último campo siempre es la llave primaria.
+    """
+    if 'distancia' in casas.query.annotations:
+        return [('distancia', False), ('id_casa', False)]
+    if 'relevancia' in casas.query.annotations:
+        return [('relevancia', True), ('id_casa', True)]
+    return [('fecha_publicacion', True), ('id_casa', True)]
@@ -0,0 +1,205 @@
+import math
+
+from django.conf import settings
+from django.db.models import FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Round, Sin, Sqrt
+
+
+# =========================
+# BÚSQUEDA GEOGRÁFICA (radio y ventana del mapa)
+# =========================
+#
+# Primero se filtra por una caja de latitud/longitud (rango sobre el índice
+# (estatus, latitud, longitud)) y solo a las casas que quedan dentro se les
+# calcula la distancia exacta con la fórmula de haversine. El radio tiene un
+# máximo para que la consulta siempre recorra una parte acotada del catálogo.
+
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO = RADIO_TIERRA_KM * math.pi / 180
+
+
+def radio_por_defecto():
+    return getattr(settings, 'MULTICASA_RADIO_BUSQUEDA_KM', 10)
+
+
+def radio_maximo():
+    return getattr(settings, 'MULTICASA_RADIO_MAXIMO_KM', 100)
+
+
+def distancia_km(lat1, lng1, lat2, lng2):
+    """
+    Distancia haversine en km entre dos puntos (en Python).
+    """
+    lat1, lng1, lat2, lng2 = (math.radians(float(valor)) for valor in (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def expresion_distancia(lat, lng):
+    """
+    Distancia haversine en km de cada casa al punto, calculada por la base de datos
+    (redondeada a metros para que el cursor de la paginación sea estable).
+    """
+    latitud = Radians(Cast('latitud', FloatField()))
+    longitud = Radians(Cast('longitud', FloatField()))
+    lat0 = math.radians(lat)
+    lng0 = math.radians(lng)
+    a = (
+        Power(Sin((latitud - lat0) / 2), 2)
+        + math.cos(lat0) * Cos(latitud) * Power(Sin((longitud - lng0) / 2), 2)
+    )
+    return Round(2 * RADIO_TIERRA_KM * ASin(Sqrt(a)), 3, output_field=FloatField())
+
+
+def condicion_caja(sur, oeste, norte, este):
+    """
+    Casas dentro de la caja. Si oeste > este la caja cruza el antimeridiano.
+    """
+    condicion = Q(latitud__gte=sur, latitud__lte=norte)
+    if oeste <= este:
+        return condicion & Q(longitud__gte=oeste, longitud__lte=este)
+    return condicion & (Q(longitud__gte=oeste) | Q(longitud__lte=este))
+
+
+def caja_alrededor(lat, lng, radio_km):
+    """
+    (sur, oeste, norte, este) de la caja que contiene el círculo. Cerca de los
+    polos la caja abarca todas las longitudes.
+    """
+    delta_lat = radio_km / KM_POR_GRADO
+    sur, norte = max(-90.0, lat - delta_lat), min(90.0, lat + delta_lat)
+    coseno = math.cos(math.radians(max(abs(sur), abs(norte))))
+    if coseno < 1e-6 or radio_km / (KM_POR_GRADO * coseno) >= 180:
+        return sur, -180.0, norte, 180.0
+    delta_lng = radio_km / (KM_POR_GRADO * coseno)
+    oeste, este = lng - delta_lng, lng + delta_lng
+    # Normaliza a [-180, 180]; si cruza el antimeridiano queda oeste > este
+    if oeste < -180:
+        oeste += 360
+    if este > 180:
+        este -= 360
+    return sur, oeste, norte, este
+
+
+def cerca_de(casas, lat, lng, radio_km):
+    """
+    Casas a no más de radio_km del punto, anotadas con 'distancia' (km).
+    """
+    radio_km = min(radio_km, radio_maximo())
+    return (
+        casas.filter(condicion_caja(*caja_alrededor(lat, lng, radio_km)))
+        .annotate(distancia=expresion_distancia(lat, lng))
+        .filter(distancia__lte=radio_km)
+    )
+
+
+def dentro_de_caja(casas, sur, oeste, norte, este):
+    return casas.filter(condicion_caja(sur, oeste, norte, este))
+
+
+# =========================
+# PARÁMETROS GET (?lat=&lng=&radio_km= y ?bbox=oeste,sur,este,norte)
+# =========================
+
+def _flotante(valor):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return numero if math.isfinite(numero) else None
+
+
+def leer_centro(parametros):
+    """
+    (lat, lng, radio_km) o None si no vienen o no son válidos.
+    """
+    lat = _flotante(parametros.get('lat'))
+    lng = _flotante(parametros.get('lng'))
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    radio = _flotante(parametros.get('radio_km'))
+    if radio is None or radio <= 0:
+        radio = radio_por_defecto()
+    return lat, lng, min(radio, radio_maximo())
+
+
+def leer_caja(parametros):
+    """
+    (sur, oeste, norte, este) a partir de ?bbox=oeste,sur,este,norte (el orden
+    de Leaflet/GeoJSON) o None si no es válida.
+    """
+    partes = (parametros.get('bbox') or '').split(',')
+    if len(partes) != 4:
+        return None
+    oeste, sur, este, norte = (_flotante(parte) for parte in partes)
+    if None in (oeste, sur, este, norte):
+        return None
+    if not (-90 <= sur <= norte <= 90 and -180 <= oeste <= 180 and -180 <= este <= 180):
+        return None
+    return sur, oeste, norte, este
+
+
+# =========================
+# GEOHASH
+# =========================
+#
+# Celdas jerárquicas: cada carácter extra divide la celda en 32. Las casas de una
+# misma celda comparten el prefijo, así que agrupar por los primeros N caracteres
+# agrupa por celda (lo usa el mapa de la homepage, ver web/mapa.py).
+
+ALFABETO_GEOHASH = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION_GEOHASH = 12
+
+
+def codificar_geohash(lat, lng, precision=PRECISION_GEOHASH):
+    lat, lng = float(lat), float(lng)
+    rango_lat, rango_lng = [-90.0, 90.0], [-180.0, 180.0]
+    caracteres = []
+    bits = valor = 0
+    par = True  # Los bits pares son de longitud
+    while len(caracteres) < precision:
+        rango, coordenada = (rango_lng, lng) if par else (rango_lat, lat)
+        medio = (rango[0] + rango[1]) / 2
+        if coordenada >= medio:
+            valor = valor * 2 + 1
+            rango[0] = medio
+        else:
+            valor *= 2
+            rango[1] = medio
+        par = not par
+        bits += 1
+        if bits == 5:
+            caracteres.append(ALFABETO_GEOHASH[valor])
+            bits = valor = 0
+    return ''.join(caracteres)
+
+
+def tamano_celda_geohash(precision):
+    """
+    (alto, ancho) en grados de una celda de geohash con esa precisión.
+    """
+    bits_lng = (5 * precision + 1) // 2
+    bits_lat = 5 * precision // 2
+    return 180.0 / 2 ** bits_lat, 360.0 / 2 ** bits_lng
+
+
+def geohashes_que_cubren(sur, oeste, norte, este, precision):
+    """
+    Prefijos de geohash (con esa precisión) de todas las celdas que tocan la caja.
+    """
+    alto, ancho = tamano_celda_geohash(precision)
+
+    def pasos(desde, hasta, tamano):
+        valores = []
+        valor = desde
+        while valor < hasta:
+            valores.append(valor)
+            valor += tamano
+        valores.append(hasta)
+        return valores
+
+    return sorted({
+        codificar_geohash(lat, lng, precision)
+        for lat in pasos(sur, norte, alto)
+        for lng in pasos(oeste, este, ancho)
+    })
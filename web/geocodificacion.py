@@ -0,0 +1,353 @@
+import hashlib
+import math
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import Avg, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .utilidades import normalizar_texto
+
+
+# =========================
+# GEOCODIFICADORES (intercambiables vía settings.MULTICASA_GEOCODIFICADOR)
+# =========================
+
+class ErrorGeocodificacion(Exception):
+    """
+    Falla temporal del servicio (red, timeout, 5xx...). La cola reintenta.
+    """
+
+
+class LimitadorFrecuencia:
+    """
+    Garantiza un intervalo mínimo entre llamadas (Nominatim pide 1 por segundo).
+    El turno se reserva también en la caché de Django, así que con una caché
+    compartida (Redis, Memcached) el límite vale para todos los procesos: el
+    worker de geocodificación y el proxy de /geo/ que usa el mapa del admin.
+    """
+    clave_cache = 'geocodificacion:turno'
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self._ultima = 0.0
+        self._candado = threading.Lock()
+
+    def esperar(self, maximo=None):
+        """
+        Espera su turno. Con 'maximo' (segundos) lanza ErrorGeocodificacion si
+        tendría que esperar más que eso (una vista no debe quedarse bloqueada).
+        """
+        limite = None if maximo is None else time.monotonic() + maximo
+        with self._candado:
+            while True:
+                restante = self._ultima + self.intervalo - time.monotonic()
+                if restante <= 0 and cache.add(self.clave_cache, 1, timeout=max(1, math.ceil(self.intervalo))):
+                    break
+                pausa = max(restante, 0.1)
+                if limite is not None and time.monotonic() + pausa > limite:
+                    raise ErrorGeocodificacion("El servicio de geocodificación está ocupado; intenta de nuevo.")
+                time.sleep(pausa)
+            self._ultima = time.monotonic()
+
+
+class GeocodificadorNominatim:
+    """
+    Geocodificador real: Nominatim (OpenStreetMap), máximo 1 petición por segundo.
+    """
+    url = "https://nominatim.openstreetmap.org/search"
+    url_inversa = "https://nominatim.openstreetmap.org/reverse"
+    headers = {
+        'User-Agent': 'Multicasa/1.0 (contacto@multicasa.com)',
+        'Accept-Language': 'es',
+    }
+
+    def __init__(self):
+        self.limitador = LimitadorFrecuencia(getattr(settings, 'MULTICASA_NOMINATIM_INTERVALO', 1.0))
+
+    def _consultar(self, url, params, espera_maxima=None):
+        self.limitador.esperar(espera_maxima)
+        try:
+            response = requests.get(url, params=params, headers=self.headers, timeout=10)
+        except requests.RequestException as e:
+            raise ErrorGeocodificacion(str(e))
+
+        if response.status_code != 200:
+            raise ErrorGeocodificacion(f"Nominatim respondió {response.status_code}")
+        try:
+            return response.json()
+        except ValueError:
+            # Una página de error en HTML (de Nominatim o de un proxy) con 200
+            raise ErrorGeocodificacion("Nominatim respondió algo que no es JSON")
+
+    def geocodificar(self, direccion_completa):
+        """
+        Regresa (lat, lon), o (None, None) si no hubo resultados.
+        Lanza ErrorGeocodificacion si el servicio falló.
+        """
+        params = {
+            'q': direccion_completa,
+            'format': 'json',
+            'limit': 1,
+            'countrycodes': 'mx'
+        }
+        data = self._consultar(self.url, params)
+        if data:
+            return float(data[0]['lat']), float(data[0]['lon'])
+        return None, None
+
+    def buscar(self, consulta, espera_maxima=None):
+        """
+        Primer resultado como {'lat', 'lon', 'address'}, o None si no hubo.
+        """
+        params = {
+            'q': consulta,
+            'format': 'json',
+            'addressdetails': 1,
+            'limit': 1,
+            'countrycodes': 'mx'
+        }
+        data = self._consultar(self.url, params, espera_maxima)
+        if not data:
+            return None
+        return {'lat': float(data[0]['lat']), 'lon': float(data[0]['lon']), 'address': data[0].get('address') or {}}
+
+    def inverso(self, lat, lon, espera_maxima=None):
+        """
+        Componentes de la dirección del punto (el 'address' de Nominatim), o None.
+        """
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'format': 'json',
+            'addressdetails': 1,
+            'countrycodes': 'mx'
+        }
+        data = self._consultar(self.url_inversa, params, espera_maxima)
+        if not data or 'address' not in data:
+            return None
+        # /reverse no siempre respeta countrycodes: un punto fuera de México no tiene dirección
+        if data['address'].get('country_code', 'mx') != 'mx':
+            return None
+        return data['address']
+
+
+class GeocodificadorFalso:
+    """
+    Geocodificador local para pruebas y desarrollo: nunca sale a la red.
+    Responde con lo que haya en 'resultados' y registra cada consulta.
+    """
+    resultados = {}
+    direcciones = {}
+    llamadas = []
+
+    def geocodificar(self, direccion_completa):
+        self.llamadas.append(direccion_completa)
+        return self.resultados.get(direccion_completa, (None, None))
+
+    def buscar(self, consulta, espera_maxima=None):
+        lat, lon = self.geocodificar(consulta)
+        if lat is None:
+            return None
+        return {'lat': lat, 'lon': lon, 'address': {}}
+
+    def inverso(self, lat, lon, espera_maxima=None):
+        self.llamadas.append((lat, lon))
+        return self.direcciones.get((round(lat, 4), round(lon, 4)))
+
+
+@lru_cache(maxsize=1)
+def obtener_geocodificador():
+    clase = import_string(getattr(
+        settings, 'MULTICASA_GEOCODIFICADOR', 'web.geocodificacion.GeocodificadorNominatim'
+    ))
+    return clase()
+
+
+# =========================
+# CACHÉ PERSISTENTE DE GEOCODIFICACIÓN
+# =========================
+
+def _contar(nombre):
+    """
+    Contadores de aciertos/fallos de la caché (ver estadisticas_cache).
+    """
+    clave = f'geocache:{nombre}'
+    cache.add(clave, 0, timeout=None)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, timeout=None)
+
+
+def estadisticas_cache():
+    return {
+        'aciertos': cache.get('geocache:aciertos', 0),
+        'fallos': cache.get('geocache:fallos', 0),
+        'catalogo_cp': cache.get('geocache:catalogo_cp', 0),
+    }
+
+
+def guardar_en_cache(clave, lat, lon, proveedor):
+    from .models import GeocodificacionCache
+
+    try:
+        GeocodificacionCache.objects.update_or_create(
+            clave=clave,
+            defaults={
+                'latitud': lat,
+                'longitud': lon,
+                'encontrado': lat is not None and lon is not None,
+                'proveedor': proveedor,
+                'fecha_consulta': timezone.now(),
+            }
+        )
+    except IntegrityError:
+        # Otro proceso la guardó al mismo tiempo; su resultado es igual de bueno
+        pass
+
+
+def geocodificar_con_cache(direccion_completa):
+    """
+    Consulta la caché antes de cualquier llamada de red. Los errores del
+    servicio no se guardan (se propagan para reintentar).
+    """
+    from .models import GeocodificacionCache
+
+    clave = normalizar_texto(direccion_completa)[:255]
+    entrada = GeocodificacionCache.objects.filter(clave=clave).first()
+    if entrada is not None and entrada.vigente():
+        _contar('aciertos')
+        GeocodificacionCache.objects.filter(pk=entrada.pk).update(aciertos=F('aciertos') + 1)
+        return entrada.coordenadas()
+
+    _contar('fallos')
+    geocodificador = obtener_geocodificador()
+    lat, lon = geocodificador.geocodificar(direccion_completa)
+    guardar_en_cache(clave, lat, lon, type(geocodificador).__name__)
+    return lat, lon
+
+
+def centroide_codigo_postal(codigo_postal, estado=None):
+    """
+    Respaldo cuando la dirección exacta no se encuentra: el centroide del
+    catálogo local de códigos postales, el promedio de las casas ya ubicadas en
+    ese CP o, si no hay ninguno, la geocodificación del CP.
+    """
+    from .codigos_postales import buscar_codigo_postal
+    from .models import Casa
+
+    ubicacion = buscar_codigo_postal(codigo_postal)
+    if ubicacion is not None and ubicacion.latitud is not None:
+        _contar('catalogo_cp')
+        return ubicacion.latitud, ubicacion.longitud
+
+    promedio = Casa.objects.filter(
+        codigo_postal=codigo_postal, latitud__isnull=False, longitud__isnull=False
+    ).aggregate(lat=Avg('latitud'), lon=Avg('longitud'))
+    if promedio['lat'] is not None:
+        return float(promedio['lat']), float(promedio['lon'])
+
+    partes = [codigo_postal] + ([estado] if estado else [])
+    return geocodificar_con_cache(", ".join(partes) + ", México")
+
+
+# =========================
+# PROXY PARA EL MAPA DEL ADMIN (/geo/search y /geo/reverse)
+# =========================
+#
+# El mapa del admin ya no llama a Nominatim desde el navegador: pasa por estas
+# funciones, que usan el mismo geocodificador (y su limitador) que la cola de
+# tareas. Las respuestas se guardan en la caché de Django; las búsquedas además
+# alimentan GeocodificacionCache, así que al guardar la casa ya no se consulta
+# Nominatim otra vez. Si llega la misma consulta mientras otra está en curso,
+# espera su resultado en lugar de repetir la llamada.
+
+# Segundos que una petición del navegador espera su turno o el resultado de otra
+ESPERA_MAXIMA_PROXY = 5
+
+
+def _vigencia_segundos(encontrado):
+    if encontrado:
+        return getattr(settings, 'MULTICASA_GEOCACHE_DIAS', 180) * 86400
+    return getattr(settings, 'MULTICASA_GEOCACHE_DIAS_NEGATIVOS', 7) * 86400
+
+
+def _consulta_unica(clave, consultar):
+    """
+    Regresa el resultado en caché de 'clave' o lo calcula con consultar(),
+    dejando que solo una petición a la vez llame al servicio por cada clave.
+    El resultado se guarda como {'valor': ...} para distinguir "sin resultados"
+    (valor None) de "no está en caché".
+    """
+    entrada = cache.get(clave)
+    if entrada is not None:
+        _contar('aciertos')
+        return entrada['valor']
+
+    candado = f'{clave}:en_curso'
+    limite = time.monotonic() + ESPERA_MAXIMA_PROXY
+    while not cache.add(candado, 1, timeout=30):
+        # Otra petición está consultando lo mismo: esperamos su resultado
+        if time.monotonic() > limite:
+            raise ErrorGeocodificacion("La misma consulta sigue en curso; intenta de nuevo.")
+        time.sleep(0.2)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            _contar('aciertos')
+            return entrada['valor']
+
+    try:
+        _contar('fallos')
+        valor = consultar()
+        cache.set(clave, {'valor': valor}, _vigencia_segundos(valor is not None))
+        return valor
+    finally:
+        cache.delete(candado)
+
+
+def buscar_lugar(consulta):
+    """
+    {'lat', 'lon', 'address'} del primer resultado de la búsqueda, o None.
+    """
+    normalizada = normalizar_texto(consulta)[:255]
+    clave = 'geo:buscar:' + hashlib.sha1(normalizada.encode('utf-8')).hexdigest()
+
+    def consultar():
+        from .models import GeocodificacionCache
+
+        # Si el worker ya la geocodificó, basta con las coordenadas
+        entrada = GeocodificacionCache.objects.filter(clave=normalizada).first()
+        if entrada is not None and entrada.vigente():
+            if not entrada.encontrado:
+                return None
+            lat, lon = entrada.coordenadas()
+            return {'lat': lat, 'lon': lon, 'address': {}}
+
+        geocodificador = obtener_geocodificador()
+        resultado = geocodificador.buscar(consulta, espera_maxima=ESPERA_MAXIMA_PROXY)
+        if resultado is None:
+            guardar_en_cache(normalizada, None, None, type(geocodificador).__name__)
+        else:
+            guardar_en_cache(normalizada, resultado['lat'], resultado['lon'], type(geocodificador).__name__)
+        return resultado
+
+    return _consulta_unica(clave, consultar)
+
+
+def direccion_de_punto(lat, lon):
+    """
+    Componentes de la dirección del punto (el 'address' de Nominatim), o None.
+    El punto se redondea a ~10 m para que clics cercanos compartan la caché.
+    """
+    lat, lon = round(lat, 4), round(lon, 4)
+    clave = f'geo:inverso:{lat:.4f}:{lon:.4f}'
+    return _consulta_unica(
+        clave, lambda: obtener_geocodificador().inverso(lat, lon, espera_maxima=ESPERA_MAXIMA_PROXY)
+    )
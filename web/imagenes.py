@@ -0,0 +1,72 @@
+import io
+
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .almacenamiento import obtener_almacen
+from .models import VarianteImagen
+
+
+# =========================
+# GENERACIÓN DE VARIANTES (miniatura, tarjeta, completa)
+# =========================
+
+# Parámetros de Pillow para cada formato de salida
+FORMATOS_SALIDA = {
+    'jpeg': {'format': 'JPEG', 'tipo_contenido': 'image/jpeg', 'opciones': {'quality': 82, 'optimize': True, 'progressive': True}},
+    'webp': {'format': 'WEBP', 'tipo_contenido': 'image/webp', 'opciones': {'quality': 80, 'method': 4}},
+}
+
+
+def _a_rgb(imagen):
+    """
+    Convierte a RGB; las transparencias se aplanan sobre fondo blanco.
+    """
+    if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.split()[-1])
+        return fondo
+    return imagen.convert('RGB')
+
+
+def generar_variantes(imagen_base, datos=None):
+    """
+    Genera (o regenera) todas las variantes de una ImagenBase ya guardada.
+    Nunca se amplía la imagen: si el original es más chico se conserva su tamaño.
+    """
+    if datos is None:
+        datos = imagen_base.leer_datos()
+    if not datos:
+        return []
+
+    almacen = obtener_almacen()
+    with Image.open(io.BytesIO(bytes(datos))) as original:
+        original = _a_rgb(ImageOps.exif_transpose(original))
+
+        variantes = []
+        for tipo, ancho_maximo in VarianteImagen.ANCHOS.items():
+            copia = original.copy()
+            if copia.width > ancho_maximo:
+                alto = round(copia.height * ancho_maximo / copia.width)
+                copia = copia.resize((ancho_maximo, alto), Image.LANCZOS)
+
+            for formato, config in FORMATOS_SALIDA.items():
+                buffer = io.BytesIO()
+                copia.save(buffer, format=config['format'], **config['opciones'])
+                contenido = buffer.getvalue()
+                variantes.append(VarianteImagen(
+                    imagen_base=imagen_base,
+                    tipo=tipo,
+                    formato=formato,
+                    ancho=copia.width,
+                    alto=copia.height,
+                    tamano_bytes=len(contenido),
+                    tipo_contenido=config['tipo_contenido'],
+                    hash_contenido=almacen.guardar(contenido),
+                ))
+
+    with transaction.atomic():
+        VarianteImagen.objects.filter(imagen_base=imagen_base).delete()
+        VarianteImagen.objects.bulk_create(variantes)
+    return variantes
@@ -0,0 +1,192 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from web.filtros import filtrar_casas, orden_resultados
+from web.models import Casa
+from web.paginacion import TAMANO_PAGINA
+
+
+# Datos de prueba: estados con algunos de sus municipios
+UBICACIONES = {
+    'Coahuila': ['Saltillo', 'Ramos Arizpe', 'Arteaga', 'Torreón', 'Monclova'],
+    'Nuevo León': ['Monterrey', 'San Pedro Garza García', 'Apodaca', 'Guadalupe', 'Escobedo'],
+    'Jalisco': ['Guadalajara', 'Zapopan', 'Tlaquepaque', 'Tonalá', 'Puerto Vallarta'],
+    'Ciudad de México': ['Coyoacán', 'Benito Juárez', 'Tlalpan', 'Miguel Hidalgo', 'Iztapalapa'],
+    'Querétaro': ['Querétaro', 'Corregidora', 'El Marqués', 'San Juan del Río'],
+    'Yucatán': ['Mérida', 'Progreso', 'Valladolid', 'Tizimín'],
+    'Puebla': ['Puebla', 'Cholula', 'Atlixco', 'Tehuacán'],
+    'Guanajuato': ['León', 'Irapuato', 'Celaya', 'Guanajuato', 'San Miguel de Allende'],
+}
+
+# Frases para las descripciones (la búsqueda de texto necesita algo que encontrar)
+AMENIDADES = [
+    'amplio jardín', 'alberca climatizada', 'cochera para dos autos', 'cocina integral',
+    'terraza con asador', 'cuarto de servicio', 'estudio', 'vigilancia 24 horas',
+    'cerca de escuelas', 'acabados de lujo', 'paneles solares', 'vista a la montaña',
+]
+
+# (nombre, filtros GET del buscador): los mismos caminos que usa la homepage
+ESCENARIOS = [
+    ('portada', {}),
+    ('estado', {'estado': 'Jalisco'}),
+    ('estado_municipio', {'estado': 'Nuevo León', 'municipio': 'Monterrey'}),
+    ('estado_prefijo', {'estado': 'nuevo leon'}),
+    ('codigo_postal', {'codigo_postal': '64000'}),
+    ('codigo_postal_prefijo', {'codigo_postal': '640'}),
+    ('rango_precio', {'min_precio': '1500000', 'max_precio': '2500000'}),
+    ('recamaras', {'habitaciones': '3', 'banos': '2'}),
+    ('combinado', {'estado': 'Coahuila', 'habitaciones': '3', 'max_precio': '3000000'}),
+    ('radio_10km', {'lat': '25.4333', 'lng': '-101.0000', 'radio_km': '10'}),
+    ('radio_100km', {'lat': '20.6767', 'lng': '-103.3475', 'radio_km': '100'}),
+    ('ventana_mapa', {'bbox': '-101.2,25.2,-100.8,25.7'}),
+    ('texto', {'q': 'jardín'}),
+    ('texto_combinado', {'q': 'alberca', 'estado': 'Jalisco', 'habitaciones': '3'}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide las consultas del buscador de la homepage sobre un catálogo grande: "
+        "muestra el plan (EXPLAIN) y la latencia de cada escenario. Los datos de "
+        "prueba se crean en una base de datos desechable (la de las pruebas, "
+        "test_<NAME>) que se borra al terminar; la del proyecto no se toca."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--casas', type=int, default=100000, help="Casas de prueba a crear (default: 100000).")
+        parser.add_argument('--repeticiones', type=int, default=20, help="Veces que se ejecuta cada consulta.")
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help="Mide también sin los índices de Casa (se quitan de la base de datos desechable)."
+        )
+        parser.add_argument('--sin-explain', action='store_true', help="No muestra los planes de ejecución.")
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help="Borra sin preguntar la base de datos de prueba si ya existe.",
+        )
+
+    def handle(self, *args, **options):
+        # No se usa una transacción que se deshace al final: en MySQL ANALYZE TABLE y
+        # DROP INDEX confirman la transacción y las casas de prueba se quedarían en
+        # la base de datos del proyecto. La base desechable se crea con migrate.
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=options['verbosity'], autoclobber=not options['interactive'], serialize=False
+        )
+        try:
+            self.sembrar(options['casas'])
+            resultados = {'con índices': self.medir(options, 'con índices')}
+            if options['comparar']:
+                with connection.schema_editor() as editor:
+                    for indice in Casa._meta.indexes:
+                        editor.remove_index(Casa, indice)
+                self.analizar()
+                resultados['sin índices'] = self.medir(options, 'sin índices')
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=options['verbosity'])
+
+        self.stdout.write("")
+        self.stdout.write(self.style.MIGRATE_HEADING("Mediana por consulta (ms)"))
+        columnas = list(resultados)
+        self.stdout.write(f"{'escenario':<20}" + "".join(f"{columna:>15}" for columna in columnas))
+        for nombre, _ in ESCENARIOS:
+            self.stdout.write(
+                f"{nombre:<20}" + "".join(f"{resultados[columna][nombre]:>15.2f}" for columna in columnas)
+            )
+
+    def sembrar(self, cantidad):
+        inicio = time.monotonic()
+        generador = random.Random(42)
+        ahora = timezone.now()
+        ubicaciones = [(estado, municipio) for estado, municipios in UBICACIONES.items() for municipio in municipios]
+        lote_tamano = 2000
+
+        for desde in range(0, cantidad, lote_tamano):
+            lote = []
+            for i in range(desde, min(desde + lote_tamano, cantidad)):
+                estado, municipio = generador.choice(ubicaciones)
+                casa = Casa(
+                    titulo=f"[bench] Casa {i}",
+                    descripcion="Casa con " + ", ".join(generador.sample(AMENIDADES, 3)) + ".",
+                    precio=Decimal(generador.randrange(300000, 9000000, 1000)),
+                    direccion=f"Calle {i}",
+                    municipio=municipio,
+                    estado=estado,
+                    codigo_postal=f"{generador.randrange(10000, 99999)}",
+                    # Puntos al azar dentro de la caja que contiene a México
+                    latitud=Decimal(f"{generador.uniform(14.5, 32.7):.6f}"),
+                    longitud=Decimal(f"{generador.uniform(-117.1, -86.7):.6f}"),
+                    estatus='vendida' if generador.random() < 0.15 else 'en venta',
+                    habitaciones=generador.randint(1, 6),
+                    banos=generador.randint(1, 4),
+                    superficie_m2=generador.randint(45, 600),
+                )
+                casa.normalizar_ubicacion()
+                casa.calcular_geohash()
+                lote.append(casa)
+            creadas = Casa.objects.bulk_create(lote)
+            # fecha_publicacion es auto_now_add: repartimos las fechas por lote
+            Casa.objects.filter(pk__in=[casa.pk for casa in creadas]).update(
+                fecha_publicacion=ahora - timedelta(hours=desde // lote_tamano * 37)
+            )
+
+        self.analizar()
+        self.stdout.write(f"{cantidad} casas de prueba creadas en {time.monotonic() - inicio:.1f}s.")
+
+    def analizar(self):
+        """
+        Actualiza las estadísticas de la tabla para que el planificador elija bien.
+        """
+        tabla = connection.ops.quote_name(Casa._meta.db_table)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(f"ANALYZE TABLE {tabla}")
+            elif connection.vendor in ('sqlite', 'postgresql'):
+                cursor.execute(f"ANALYZE {tabla}")
+
+    def consulta(self, filtros):
+        """
+        La misma consulta que arma la homepage para la primera página.
+        """
+        casas = filtrar_casas(Casa.objects.filter(estatus='en venta'), filtros)
+        orden = [('-' if descendente else '') + campo for campo, descendente in orden_resultados(casas)]
+        return casas.order_by(*orden)[:TAMANO_PAGINA + 1]
+
+    def explicar(self, consulta, fase):
+        """
+        EXPLAIN de la consulta. Se arma a mano con un comentario distinto por fase
+        porque SQLite reutiliza el plan en caché si el texto del EXPLAIN es idéntico,
+        aunque los índices ya no existan.
+        """
+        sql, parametros = consulta.query.sql_with_params()
+        etiqueta = 'sin indices' if fase == 'sin índices' else 'con indices'
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} /* {etiqueta} */ {sql}", parametros)
+            filas = cursor.fetchall()
+        return "\n".join(" ".join(str(columna) for columna in fila) for fila in filas)
+
+    def medir(self, options, fase):
+        medianas = {}
+        for nombre, filtros in ESCENARIOS:
+            consulta = self.consulta(filtros)
+            if not options['sin_explain']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n[{fase}] {nombre}: {filtros or '(sin filtros)'}"))
+                self.stdout.write(self.explicar(consulta, fase))
+
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                list(consulta.all())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            medianas[nombre] = statistics.median(tiempos)
+        return medianas
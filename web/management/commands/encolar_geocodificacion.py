@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from web.tareas import encolar_geocodificacion_pendiente
+
+
+class Command(BaseCommand):
+    help = "Encola la geocodificación de todas las casas marcadas como pendientes."
+
+    def handle(self, *args, **options):
+        encoladas = encolar_geocodificacion_pendiente()
+        self.stdout.write(self.style.SUCCESS(f"{encoladas} casas encoladas para geocodificar."))
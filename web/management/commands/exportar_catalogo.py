@@ -0,0 +1,71 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from web.exportacion import GENERADORES, columnas_exportacion, escribir_xlsx, filas_catalogo
+from web.filtros import filtrar_casas
+from web.models import Casa
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el catálogo de casas a CSV, JSONL o XLSX (XLSX requiere openpyxl). "
+        "Las casas se leen por lotes, así que la memoria no crece con el catálogo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=['csv', 'jsonl', 'xlsx'], default='csv')
+        parser.add_argument(
+            '--salida',
+            help="Archivo de salida (por defecto la salida estándar; obligatorio para XLSX)."
+        )
+        parser.add_argument('--portada', action='store_true', help="Incluye la URL de la imagen de portada.")
+        parser.add_argument(
+            '--url-base',
+            default='',
+            help="Dominio a anteponer a las URLs de portada (p. ej. https://multicasa.com)."
+        )
+        parser.add_argument('--estado', help="Solo casas de este estado.")
+        parser.add_argument('--municipio', help="Solo casas de este municipio.")
+        parser.add_argument('--estatus', help="Solo casas con este estatus (p. ej. 'en venta').")
+        parser.add_argument('--q', help="Solo casas que contengan estas palabras (título, descripción o dirección).")
+
+    def handle(self, *args, **options):
+        formato = options['formato']
+        if formato == 'xlsx' and not options['salida']:
+            raise CommandError("Para XLSX indica el archivo con --salida.")
+
+        casas = filtrar_casas(Casa.objects.all(), options)
+        if options['estatus']:
+            casas = casas.filter(estatus=options['estatus'])
+
+        inicio = time.monotonic()
+        contador = {'filas': 0}
+
+        def contar(filas):
+            for fila in filas:
+                contador['filas'] += 1
+                yield fila
+
+        columnas = columnas_exportacion(options['portada'])
+        filas = contar(filas_catalogo(casas, incluir_portada=options['portada'], url_base=options['url_base']))
+
+        if formato == 'xlsx':
+            try:
+                escribir_xlsx(filas, columnas, options['salida'])
+            except ImportError as e:
+                raise CommandError(str(e))
+        else:
+            generador = GENERADORES[formato][0]
+            if options['salida']:
+                with open(options['salida'], 'w', encoding='utf-8', newline='') as destino:
+                    destino.writelines(generador(filas, columnas))
+            else:
+                sys.stdout.writelines(generador(filas, columnas))
+
+        # El resumen va a stderr para no mezclarse con la exportación en stdout
+        segundos = max(time.monotonic() - inicio, 1e-6)
+        self.stderr.write(self.style.SUCCESS(
+            f"{contador['filas']} casas exportadas en {segundos:.1f}s ({contador['filas'] / segundos:.0f} casas/s)."
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from web.imagenes import generar_variantes
+from web.models import ImagenBase
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes (miniatura, tarjeta, completa en JPEG y WebP) de las imágenes de la galería."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help="Regenera también las imágenes que ya tienen variantes."
+        )
+
+    def handle(self, *args, **options):
+        imagenes = ImagenBase.objects.all()
+        if not options['todas']:
+            imagenes = imagenes.filter(variantes__isnull=True)
+
+        ids = list(imagenes.values_list('pk', flat=True).distinct())
+        generadas = 0
+        for id_imagen in ids:
+            # Cargamos una imagen a la vez para no tener todos los binarios en memoria
+            imagen = ImagenBase.objects.get(pk=id_imagen)
+            try:
+                generar_variantes(imagen)
+                generadas += 1
+            except Exception as e:
+                self.stderr.write(f"Imagen {id_imagen} ({imagen.nombre}): {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Variantes generadas para {generadas} de {len(ids)} imágenes."))
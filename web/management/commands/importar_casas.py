@@ -0,0 +1,170 @@
+import csv
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from web.cache_paginas import invalidar_paginas
+from web.codigos_postales import errores_de_ubicacion
+from web.estadisticas import invalidar_estadisticas
+from web.mapa import invalidar_mapa
+from web.models import Casa
+from web.resumen import reconstruir_resumen
+from web.tareas import encolar_geocodificacion_pendiente
+
+
+# Columnas que se aceptan en el archivo (las demás se ignoran)
+CAMPOS_IMPORTABLES = [
+    'titulo',
+    'descripcion',
+    'precio',
+    'direccion',
+    'municipio',
+    'estado',
+    'codigo_postal',
+    'latitud',
+    'longitud',
+    'estatus',
+    'habitaciones',
+    'banos',
+    'superficie_m2',
+]
+
+
+def leer_csv(ruta):
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        for fila in csv.DictReader(archivo):
+            yield fila
+
+
+def leer_jsonl(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        for linea in archivo:
+            linea = linea.strip()
+            if linea:
+                yield json.loads(linea)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa casas desde un archivo CSV o JSONL (una casa por fila). "
+        "Valida cada fila con los mismos validadores del modelo, inserta por lotes "
+        "con bulk_create y deja la geocodificación para la cola de tareas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo .csv o .jsonl")
+        parser.add_argument(
+            '--formato',
+            choices=['csv', 'jsonl'],
+            help="Formato del archivo (por defecto se deduce de la extensión)."
+        )
+        parser.add_argument('--lote', type=int, default=500, help="Casas por transacción (default: 500).")
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help="Solo valida y reporta errores, sin guardar nada."
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.exists(ruta):
+            raise CommandError(f"No existe el archivo: {ruta}")
+
+        formato = options['formato'] or ('jsonl' if ruta.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+        filas = leer_jsonl(ruta) if formato == 'jsonl' else leer_csv(ruta)
+
+        inicio = time.monotonic()
+        lote = []
+        leidas = importadas = con_error = 0
+
+        numero = 0
+        try:
+            for numero, fila in enumerate(filas, start=1):
+                leidas += 1
+                casa, errores = self.construir_casa(fila)
+                if errores:
+                    con_error += 1
+                    for error in errores:
+                        self.stderr.write(f"Fila {numero}: {error}")
+                    continue
+
+                lote.append(casa)
+                if len(lote) >= options['lote']:
+                    importadas += self.guardar_lote(lote, options['simular'])
+                    lote = []
+                    self.reportar_avance(importadas, inicio)
+        except (csv.Error, json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CommandError(f"Archivo inválido cerca de la fila {numero + 1}: {e}")
+
+        if lote:
+            importadas += self.guardar_lote(lote, options['simular'])
+
+        # La geocodificación se hace después, por la cola (1 petición por segundo)
+        encoladas = 0
+        if not options['simular']:
+            encoladas = encolar_geocodificacion_pendiente()
+            # bulk_create no dispara señales: actualizamos a mano lo que depende de Casa
+            reconstruir_resumen()
+            invalidar_estadisticas()
+            invalidar_paginas()
+            invalidar_mapa()
+
+        segundos = max(time.monotonic() - inicio, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Simulación: ' if options['simular'] else ''}"
+            f"{leidas} filas leídas, {importadas} casas importadas, {con_error} filas con errores "
+            f"en {segundos:.1f}s ({leidas / segundos:.0f} filas/s). "
+            f"{encoladas} casas encoladas para geocodificar."
+        ))
+
+    def construir_casa(self, fila):
+        """
+        Regresa (casa, errores). La validación es la misma de Casa.full_clean
+        (validar_precio_positivo, validar_codigo_postal, etc.) pero sin tocar la BD,
+        más la del admin: municipio y estado deben ser los del código postal.
+        """
+        if not isinstance(fila, dict):
+            # Una línea JSONL válida que no es un objeto ([1, 2], "x", 3...)
+            return None, [f"se esperaba un objeto JSON, no {type(fila).__name__}"]
+
+        datos = {}
+        for campo in CAMPOS_IMPORTABLES:
+            valor = fila.get(campo)
+            if isinstance(valor, str):
+                valor = valor.strip()
+            if valor not in (None, ''):
+                datos[campo] = valor
+
+        casa = Casa(**datos)
+        try:
+            casa.full_clean(validate_unique=False)
+        except ValidationError as e:
+            return None, [f"{campo}: {'; '.join(mensajes)}" for campo, mensajes in e.message_dict.items()]
+
+        errores = errores_de_ubicacion(casa.codigo_postal, casa.estado, casa.municipio)
+        if errores:
+            return None, [f"{campo}: {mensaje}" for campo, mensaje in errores.items()]
+
+        # bulk_create no pasa por save(): las copias normalizadas y el geohash se llenan aquí
+        casa.normalizar_ubicacion()
+        casa.calcular_geohash()
+        if casa.requiere_geocodificacion():
+            casa.estado_geocodificacion = 'pendiente'
+        elif casa.latitud is not None and casa.longitud is not None:
+            casa.estado_geocodificacion = 'completada'
+        return casa, []
+
+    def guardar_lote(self, lote, simular):
+        if simular:
+            return len(lote)
+        with transaction.atomic():
+            Casa.objects.bulk_create(lote)
+        return len(lote)
+
+    def reportar_avance(self, importadas, inicio):
+        segundos = max(time.monotonic() - inicio, 1e-6)
+        self.stdout.write(f"{importadas} casas importadas ({importadas / segundos:.0f} casas/s)...")
@@ -0,0 +1,156 @@
+import csv
+import os
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from web.codigos_postales import catalogo_modificado
+from web.models import CodigoPostal
+
+
+# Formatos que se aceptan (se detectan por el contenido):
+#
+# - SEPOMEX (https://www.correosdemexico.gob.mx, "Descarga CPdescarga.txt"):
+#   una línea de aviso, luego un encabezado con d_codigo|d_asenta|...; separado
+#   por '|', en latin-1. Una fila por asentamiento (colonia), sin coordenadas.
+# - GeoNames (https://download.geonames.org/export/zip/MX.zip, archivo MX.txt):
+#   separado por tabuladores, sin encabezado; una fila por asentamiento con
+#   latitud y longitud aproximadas.
+#
+# Lo ideal es pasar ambos: los nombres salen de SEPOMEX y el centroide de GeoNames
+# (promedio de las coordenadas de los asentamientos del CP).
+
+COLUMNAS_GEONAMES = 12
+
+
+def _formato(ruta):
+    with open(ruta, encoding='latin-1') as archivo:
+        inicio = archivo.read(4096)
+    if 'd_codigo|' in inicio:
+        return 'sepomex'
+    if inicio.startswith('MX\t'):
+        return 'geonames'
+    return None
+
+
+def leer_sepomex(ruta):
+    """
+    (codigo, estado, municipio, ciudad) por asentamiento.
+    """
+    with open(ruta, encoding='latin-1', newline='') as archivo:
+        for linea in archivo:
+            if linea.startswith('d_codigo|'):
+                break
+        else:
+            raise CommandError(f"{ruta}: no se encontró el encabezado d_codigo|...")
+        columnas = linea.strip().split('|')
+        for fila in csv.DictReader(archivo, fieldnames=columnas, delimiter='|', quoting=csv.QUOTE_NONE):
+            yield (
+                (fila.get('d_codigo') or '').strip(),
+                (fila.get('d_estado') or '').strip(),
+                (fila.get('D_mnpio') or '').strip(),
+                (fila.get('d_ciudad') or '').strip(),
+            )
+
+
+def leer_geonames(ruta):
+    """
+    (codigo, estado, municipio, latitud, longitud) por asentamiento.
+    """
+    with open(ruta, encoding='utf-8', newline='') as archivo:
+        for fila in csv.reader(archivo, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(fila) < COLUMNAS_GEONAMES - 1 or fila[0] != 'MX':
+                continue
+            try:
+                latitud, longitud = float(fila[9]), float(fila[10])
+            except ValueError:
+                latitud = longitud = None
+            yield fila[1].strip(), fila[3].strip(), fila[5].strip(), latitud, longitud
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga el catálogo local de códigos postales desde el archivo de SEPOMEX "
+        "(CPdescarga.txt) y/o el de GeoNames (MX.txt). Reemplaza el catálogo completo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivos', nargs='+', help="Rutas de los archivos de SEPOMEX y/o GeoNames")
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        codigos = {}
+
+        def entrada(codigo):
+            return codigos.setdefault(codigo, {
+                'estado': '', 'municipio': '', 'ciudad': '', 'asentamientos': 0,
+                'sepomex': False, 'suma_lat': 0.0, 'suma_lng': 0.0, 'puntos': 0,
+            })
+
+        for ruta in options['archivos']:
+            if not os.path.exists(ruta):
+                raise CommandError(f"No existe el archivo: {ruta}")
+            formato = _formato(ruta)
+            if formato is None:
+                raise CommandError(f"{ruta}: no parece un archivo de SEPOMEX ni de GeoNames.")
+
+            filas = 0
+            try:
+                if formato == 'sepomex':
+                    for codigo, estado, municipio, ciudad in leer_sepomex(ruta):
+                        if len(codigo) != 5 or not codigo.isdigit():
+                            continue
+                        datos = entrada(codigo)
+                        datos.update(estado=estado, municipio=municipio, sepomex=True)
+                        datos['ciudad'] = datos['ciudad'] or ciudad
+                        datos['asentamientos'] += 1
+                        filas += 1
+                else:
+                    for codigo, estado, municipio, latitud, longitud in leer_geonames(ruta):
+                        if len(codigo) != 5 or not codigo.isdigit():
+                            continue
+                        datos = entrada(codigo)
+                        # Los nombres de SEPOMEX (el catálogo oficial) tienen prioridad
+                        if not datos['sepomex']:
+                            datos.update(estado=estado, municipio=municipio)
+                        if latitud is not None:
+                            datos['suma_lat'] += latitud
+                            datos['suma_lng'] += longitud
+                            datos['puntos'] += 1
+                        filas += 1
+            except (csv.Error, UnicodeDecodeError) as e:
+                raise CommandError(f"{ruta}: archivo inválido: {e}")
+            self.stdout.write(f"{ruta} ({formato}): {filas} asentamientos leídos.")
+
+        if not codigos:
+            raise CommandError("Los archivos no tienen ningún código postal.")
+
+        registros = []
+        for codigo, datos in sorted(codigos.items()):
+            centroide = {}
+            if datos['puntos']:
+                centroide = {
+                    'latitud': Decimal(f"{datos['suma_lat'] / datos['puntos']:.6f}"),
+                    'longitud': Decimal(f"{datos['suma_lng'] / datos['puntos']:.6f}"),
+                }
+            registros.append(CodigoPostal(
+                codigo=codigo,
+                estado=datos['estado'][:100],
+                municipio=datos['municipio'][:100],
+                ciudad=datos['ciudad'][:100],
+                asentamientos=datos['asentamientos'] or datos['puntos'],
+                **centroide,
+            ))
+
+        with transaction.atomic():
+            CodigoPostal.objects.all().delete()
+            CodigoPostal.objects.bulk_create(registros, batch_size=2000)
+        catalogo_modificado()
+
+        con_centroide = sum(1 for registro in registros if registro.latitud is not None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(registros)} códigos postales cargados ({con_centroide} con centroide) "
+            f"en {time.monotonic() - inicio:.1f}s."
+        ))
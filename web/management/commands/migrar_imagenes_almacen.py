@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from web.almacenamiento import obtener_almacen
+from web.models import ImagenBase
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los binarios de ImagenBase.imagen_data al almacén de imágenes en disco, "
+        "por lotes pequeños para no bloquear la tabla."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20, help="Imágenes por lote (default: 20).")
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=0.2,
+            help="Segundos de espera entre lotes para no saturar la BD (default: 0.2)."
+        )
+
+    def handle(self, *args, **options):
+        almacen = obtener_almacen()
+        lote = options['lote']
+        migradas = 0
+        ultimo_id = 0
+
+        while True:
+            ids = list(
+                ImagenBase.objects.filter(pk__gt=ultimo_id, imagen_data__isnull=False)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            ultimo_id = ids[-1]
+
+            # 1. Escribimos los archivos fuera de cualquier transacción (es idempotente)
+            cambios = []
+            for id_imagen in ids:
+                datos = ImagenBase.objects.filter(pk=id_imagen).values_list('imagen_data', flat=True).first()
+                if datos:
+                    datos = bytes(datos)
+                    cambios.append((id_imagen, almacen.guardar(datos), len(datos)))
+
+            # 2. Transacción corta: solo actualiza las filas del lote por llave primaria
+            with transaction.atomic():
+                for id_imagen, hash_contenido, tamano in cambios:
+                    ImagenBase.objects.filter(pk=id_imagen).update(
+                        hash_contenido=hash_contenido,
+                        tamano_bytes=tamano,
+                        imagen_data=None,
+                    )
+
+            migradas += len(cambios)
+            self.stdout.write(f"Lote terminado: {migradas} imágenes migradas (último id {ultimo_id}).")
+            time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f"Listo: {migradas} imágenes movidas al almacén."))
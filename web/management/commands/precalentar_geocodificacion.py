@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+
+from web.geocodificacion import ErrorGeocodificacion, estadisticas_cache, guardar_en_cache
+from web.models import Casa, GeocodificacionCache, geocodificar_direccion
+from web.utilidades import normalizar_texto
+
+
+def _direccion_completa(direccion, municipio, estado, codigo_postal):
+    partes = [parte for parte in (direccion, municipio, estado, codigo_postal) if parte]
+    return ", ".join(partes) + ", México"
+
+
+class Command(BaseCommand):
+    help = (
+        "Llena la caché de geocodificación con las direcciones de las casas existentes. "
+        "Las casas que ya tienen coordenadas se guardan sin consultar la red."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolver-faltantes',
+            action='store_true',
+            help="También geocodifica (con red, 1 por segundo) las direcciones sin coordenadas."
+        )
+
+    def handle(self, *args, **options):
+        campos = ('direccion', 'municipio', 'estado', 'codigo_postal')
+        conocidas = set(GeocodificacionCache.objects.values_list('clave', flat=True))
+
+        # 1. Direcciones con coordenadas conocidas: se copian tal cual a la caché
+        agregadas = 0
+        con_coordenadas = (
+            Casa.objects.filter(latitud__isnull=False, longitud__isnull=False)
+            .values_list(*campos, 'latitud', 'longitud')
+            .distinct()
+        )
+        for direccion, municipio, estado, codigo_postal, lat, lon in con_coordenadas.iterator():
+            if not (direccion or municipio or estado or codigo_postal):
+                continue
+            clave = normalizar_texto(_direccion_completa(direccion, municipio, estado, codigo_postal))[:255]
+            if clave not in conocidas:
+                guardar_en_cache(clave, lat, lon, 'casa')
+                conocidas.add(clave)
+                agregadas += 1
+        self.stdout.write(f"{agregadas} direcciones agregadas desde casas con coordenadas.")
+
+        # 2. (Opcional) Direcciones sin coordenadas: se geocodifican una vez cada una
+        if options['resolver_faltantes']:
+            resueltas = 0
+            sin_coordenadas = (
+                Casa.objects.filter(latitud__isnull=True)
+                .values_list(*campos)
+                .distinct()
+            )
+            for partes in sin_coordenadas.iterator():
+                if not any(partes):
+                    continue
+                try:
+                    lat, lon = geocodificar_direccion(*partes, lanzar_errores=True)
+                except ErrorGeocodificacion as e:
+                    self.stderr.write(f"{_direccion_completa(*partes)}: {e}")
+                    continue
+                if lat is not None:
+                    resueltas += 1
+            self.stdout.write(f"{resueltas} direcciones sin coordenadas resueltas.")
+
+        estadisticas = estadisticas_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f"Caché: {GeocodificacionCache.objects.count()} direcciones "
+            f"({GeocodificacionCache.objects.filter(encontrado=False).count()} sin resultado). "
+            f"Aciertos: {estadisticas['aciertos']}, fallos: {estadisticas['fallos']}, "
+            f"resueltas con el catálogo de CP: {estadisticas['catalogo_cp']}."
+        ))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from web import tareas
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola de tareas en segundo plano (geocodificación, PDFs, reportes...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help="Procesa las tareas listas y termina (útil para cron o pruebas)."
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help="Segundos de espera cuando no hay tareas (default: 2)."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker de tareas iniciado.")
+        procesadas = 0
+        try:
+            while True:
+                tarea = tareas.tomar_siguiente()
+                if tarea is None:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                tareas.ejecutar(tarea)
+                procesadas += 1
+                self.stdout.write(f"{tarea} (intento {tarea.intentos})")
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Worker detenido: {procesadas} tareas procesadas."))
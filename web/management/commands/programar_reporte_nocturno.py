@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from web.models import Tarea
+from web.reportes import programar_reporte_nocturno
+
+
+class Command(BaseCommand):
+    help = (
+        "Activa el reporte de ventas nocturno (a la hora de MULTICASA_REPORTE_NOCTURNO_HORA). "
+        "Basta con correrlo una vez: cada noche la tarea se vuelve a programar sola."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cancelar', action='store_true', help="Desactiva el reporte nocturno.")
+
+    def handle(self, *args, **options):
+        if options['cancelar']:
+            canceladas = Tarea.objects.filter(clave='reporte_ventas_nocturno', estado='pendiente').delete()[0]
+            self.stdout.write(self.style.SUCCESS(f"Reporte nocturno cancelado ({canceladas} tareas eliminadas)."))
+            return
+
+        tarea = programar_reporte_nocturno()
+        self.stdout.write(self.style.SUCCESS(
+            f"Próximo reporte nocturno: {timezone.localtime(tarea.ejecutar_despues):%d/%m/%Y %H:%M}."
+        ))
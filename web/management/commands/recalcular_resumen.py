@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from web.estadisticas import invalidar_estadisticas
+from web.resumen import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye desde cero la tabla ResumenCasas. Úsalo después de cambios masivos "
+        "que no pasan por Casa.save() (update(), SQL directo) o al cambiar MULTICASA_RANGOS_PRECIO."
+    )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        renglones = reconstruir_resumen()
+        invalidar_estadisticas()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resumen recalculado: {renglones} renglones en {time.monotonic() - inicio:.1f}s."
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from web.busqueda import crear_indice_texto, eliminar_indice_texto
+from web.models import Casa
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a crear y llenar el índice de búsqueda de texto (FULLTEXT en MySQL, FTS5 en SQLite). "
+        "En SQLite hace falta después de una migración que reconstruya la tabla de casas, "
+        "porque con ella se pierden los triggers que mantienen el índice."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('mysql', 'sqlite'):
+            self.stdout.write(f"{connection.vendor} no usa índice de texto: la búsqueda usa icontains.")
+            return
+
+        inicio = time.monotonic()
+        tabla = Casa._meta.db_table
+        with connection.cursor() as cursor:
+            # En MySQL el índice FULLTEXT lo mantiene InnoDB: solo se crea si no existe
+            if connection.vendor == 'sqlite':
+                eliminar_indice_texto(cursor, connection.vendor, tabla)
+            crear_indice_texto(cursor, connection.vendor, tabla)
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice de búsqueda reconstruido en {time.monotonic() - inicio:.1f}s."
+        ))
@@ -0,0 +1,223 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import Substr
+
+from .cache_paginas import version_nueva
+from .filtros import prefijo
+from .geo import condicion_caja, geohashes_que_cubren, tamano_celda_geohash
+from .models import Casa
+
+
+# =========================
+# MAPA DE LA HOMEPAGE: CLUSTERS POR TESELA
+# =========================
+#
+# La ventana del mapa se parte en teselas (las mismas z/x/y de OpenStreetMap).
+# En cada tesela las casas en venta se agrupan por prefijo de geohash, con una
+# precisión que depende del zoom (unas decenas de celdas por tesela), y la base
+# de datos regresa solo un renglón por celda: cantidad, centroide y rango de
+# precios. Cada tesela se guarda en la caché por separado, así que mover el mapa
+# solo calcula las teselas nuevas. Al guardar o borrar una Casa se cambia la
+# versión de las claves (ver web/signals.py) y todas las teselas se recalculan.
+
+ZOOM_MAXIMO = 20
+LATITUD_MAXIMA = 85.0511287798  # Límite de la proyección Web Mercator
+MAXIMO_TESELAS = 64
+
+# Celdas de geohash, como máximo, a lo ancho de una tesela
+CELDAS_POR_TESELA = 4
+
+CLAVE_VERSION_MAPA = 'mapa:version'
+
+
+def _segundos_cache():
+    return getattr(settings, 'MULTICASA_MAPA_CACHE_SEGUNDOS', 300)
+
+
+# --- Teselas (Web Mercator) ---
+
+def _tesela_x(lng, zoom):
+    return min(2 ** zoom - 1, max(0, int((lng + 180) / 360 * 2 ** zoom)))
+
+
+def _tesela_y(lat, zoom):
+    lat = max(-LATITUD_MAXIMA, min(LATITUD_MAXIMA, lat))
+    radianes = math.radians(lat)
+    y = (1 - math.asinh(math.tan(radianes)) / math.pi) / 2 * 2 ** zoom
+    return min(2 ** zoom - 1, max(0, int(y)))
+
+
+def caja_de_tesela(zoom, x, y):
+    """
+    (sur, oeste, norte, este) de la tesela z/x/y.
+    """
+    n = 2 ** zoom
+
+    def latitud(fila):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * fila / n))))
+
+    return latitud(y + 1), x / n * 360 - 180, latitud(y), (x + 1) / n * 360 - 180
+
+
+def _columnas(zoom, oeste, este):
+    """
+    Índices x de las teselas entre oeste y este. Si oeste > este la caja cruza el
+    antimeridiano: va de oeste a 180 y de -180 a este.
+    """
+    desde, hasta = _tesela_x(oeste, zoom), _tesela_x(este, zoom)
+    if oeste <= este:
+        return [range(desde, hasta + 1)]
+    return [range(desde, 2 ** zoom), range(0, hasta + 1)]
+
+
+def contar_teselas(zoom, sur, oeste, norte, este):
+    """
+    Cuántas teselas toca la caja, sin generarlas.
+    """
+    columnas = sum(len(rango) for rango in _columnas(zoom, oeste, este))
+    return columnas * (_tesela_y(sur, zoom) - _tesela_y(norte, zoom) + 1)
+
+
+def teselas_de_caja(zoom, sur, oeste, norte, este):
+    return [
+        (zoom, x, y)
+        for rango in _columnas(zoom, oeste, este)
+        for x in rango
+        for y in range(_tesela_y(norte, zoom), _tesela_y(sur, zoom) + 1)
+    ]
+
+
+def precision_para_zoom(zoom):
+    """
+    Mayor precisión de geohash cuyas celdas siguen midiendo al menos
+    1/CELDAS_POR_TESELA del ancho de una tesela.
+    """
+    ancho_tesela = 360.0 / 2 ** zoom
+    precision = 1
+    while precision < 12 and tamano_celda_geohash(precision + 1)[1] >= ancho_tesela / CELDAS_POR_TESELA:
+        precision += 1
+    return precision
+
+
+# --- Clusters ---
+
+def _precision_cobertura(zoom):
+    # Celdas del tamaño de la tesela o más grandes: pocas bastan para cubrirla
+    ancho_tesela = 360.0 / 2 ** zoom
+    precision = 1
+    while precision < 12 and tamano_celda_geohash(precision + 1)[1] >= ancho_tesela:
+        precision += 1
+    return precision
+
+
+def calcular_clusters_tesela(zoom, x, y):
+    """
+    Clusters de la tesela en una consulta agrupada. El filtro por prefijos de
+    geohash usa el índice (estatus, geohash); la caja exacta evita contar casas
+    de las teselas vecinas.
+    """
+    sur, oeste, norte, este = caja_de_tesela(zoom, x, y)
+    precision = precision_para_zoom(zoom)
+
+    cobertura = Q()
+    for celda in geohashes_que_cubren(sur, oeste, norte, este, _precision_cobertura(zoom)):
+        cobertura |= prefijo('geohash', celda)
+
+    filas = (
+        Casa.objects.filter(estatus='en venta')
+        .exclude(geohash='')
+        .filter(cobertura)
+        .filter(condicion_caja(sur, oeste, norte, este))
+        .annotate(celda=Substr('geohash', 1, precision))
+        .values('celda')
+        .annotate(
+            cantidad=Count('id_casa'),
+            lat=Avg('latitud'),
+            lng=Avg('longitud'),
+            precio_minimo=Min('precio'),
+            precio_maximo=Max('precio'),
+            id_casa=Max('id_casa'),
+        )
+        .order_by()
+    )
+    return [
+        {
+            'celda': fila['celda'],
+            'cantidad': fila['cantidad'],
+            'lat': round(float(fila['lat']), 6),
+            'lng': round(float(fila['lng']), 6),
+            'precio_minimo': float(fila['precio_minimo']),
+            'precio_maximo': float(fila['precio_maximo']),
+            # Con una sola casa, el cliente puede enlazar directo al detalle
+            'id_casa': fila['id_casa'] if fila['cantidad'] == 1 else None,
+        }
+        for fila in filas
+    ]
+
+
+def _version():
+    version = cache.get(CLAVE_VERSION_MAPA)
+    if version is None:
+        cache.add(CLAVE_VERSION_MAPA, version_nueva(), None)
+        version = cache.get(CLAVE_VERSION_MAPA)
+    return version
+
+
+def clusters_de_caja(zoom, sur, oeste, norte, este):
+    """
+    Clusters de todas las teselas que toca la caja (de la caché o calculados).
+    Si la caja pide demasiadas teselas se usa un zoom menor (se cuentan antes
+    de generarlas: cada nivel de zoom multiplica por 4 las teselas).
+    """
+    zoom = max(0, min(zoom, ZOOM_MAXIMO))
+    while zoom > 0 and contar_teselas(zoom, sur, oeste, norte, este) > MAXIMO_TESELAS:
+        zoom -= 1
+    teselas = teselas_de_caja(zoom, sur, oeste, norte, este)
+
+    version = _version()
+    claves = {f'mapa:clusters:{version}:{z}:{x}:{y}': (z, x, y) for z, x, y in teselas}
+    en_cache = cache.get_many(list(claves))
+
+    nuevos = {}
+    for clave, tesela in claves.items():
+        if clave not in en_cache:
+            nuevos[clave] = calcular_clusters_tesela(*tesela)
+    if nuevos:
+        cache.set_many(nuevos, _segundos_cache())
+
+    clusters = []
+    for clave in claves:
+        clusters.extend(en_cache.get(clave) or nuevos.get(clave) or [])
+    return zoom, clusters
+
+
+def invalidar_mapa():
+    """
+    Cambia la versión de las claves: las teselas anteriores quedan huérfanas y
+    expiran solas. Si hay una transacción abierta, espera a que se confirme.
+    """
+    def cambiar():
+        try:
+            cache.incr(CLAVE_VERSION_MAPA)
+        except ValueError:
+            cache.set(CLAVE_VERSION_MAPA, version_nueva(), None)
+
+    transaction.on_commit(cambiar)
+
+
+def como_geojson(clusters):
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [cluster['lng'], cluster['lat']]},
+                'properties': {clave: valor for clave, valor in cluster.items() if clave not in ('lat', 'lng')},
+            }
+            for cluster in clusters
+        ],
+    }
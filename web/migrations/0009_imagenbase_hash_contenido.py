@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:00
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def calcular_hashes(apps, schema_editor):
+    """
+    Calcula el hash SHA-256 de las imágenes ya existentes (se usa como ETag).
+    """
+    ImagenBase = apps.get_model('web', 'ImagenBase')
+    imagenes = ImagenBase.objects.filter(hash_contenido='').only('pk', 'imagen_data')
+    for imagen in imagenes.iterator(chunk_size=50):
+        if imagen.imagen_data:
+            ImagenBase.objects.filter(pk=imagen.pk).update(
+                hash_contenido=hashlib.sha256(bytes(imagen.imagen_data)).hexdigest()
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0008_alter_casa_options_alter_imagenbase_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenbase',
+            name='hash_contenido',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 del contenido; se usa como ETag al servir la imagen', max_length=64),
+        ),
+        migrations.RunPython(calcular_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0009_imagenbase_hash_contenido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VarianteImagen',
+            fields=[
+                ('id_variante', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('miniatura', 'Miniatura'), ('tarjeta', 'Tarjeta'), ('completa', 'Ancho completo')], max_length=20)),
+                ('formato', models.CharField(choices=[('jpeg', 'JPEG'), ('webp', 'WebP')], max_length=10)),
+                ('ancho', models.PositiveIntegerField()),
+                ('alto', models.PositiveIntegerField()),
+                ('datos', models.BinaryField()),
+                ('tipo_contenido', models.CharField(max_length=100)),
+                ('hash_contenido', models.CharField(editable=False, max_length=64)),
+                ('imagen_base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variantes', to='web.imagenbase')),
+            ],
+            options={
+                'verbose_name': 'Variante de imagen',
+                'verbose_name_plural': 'Variantes de imágenes',
+                'unique_together': {('imagen_base', 'tipo', 'formato')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:00
+
+from django.db import migrations, models
+
+from web.almacenamiento import obtener_almacen
+
+
+def mover_variantes_al_almacen(apps, schema_editor):
+    """
+    Las variantes son pocas y recientes: se mueven aquí mismo.
+    Las imágenes originales se migran por lotes con migrar_imagenes_almacen.
+    """
+    VarianteImagen = apps.get_model('web', 'VarianteImagen')
+    almacen = obtener_almacen()
+    for variante in VarianteImagen.objects.only('pk', 'datos').iterator(chunk_size=50):
+        if variante.datos:
+            datos = bytes(variante.datos)
+            VarianteImagen.objects.filter(pk=variante.pk).update(
+                hash_contenido=almacen.guardar(datos),
+                tamano_bytes=len(datos),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0010_varianteimagen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagenbase',
+            name='imagen_data',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Datos de la imagen (heredado)'),
+        ),
+        migrations.AlterField(
+            model_name='imagenbase',
+            name='hash_contenido',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 del contenido; se usa como ETag y como nombre en el almacén', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='imagenbase',
+            name='tamano_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='varianteimagen',
+            name='tamano_bytes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(mover_variantes_al_almacen, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='varianteimagen',
+            name='datos',
+        ),
+    ]
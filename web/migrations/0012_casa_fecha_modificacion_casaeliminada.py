@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copiar_fecha_publicacion(apps, schema_editor):
+    """
+    Para las casas existentes, la última modificación conocida es su publicación.
+    """
+    Casa = apps.get_model('web', 'Casa')
+    Casa.objects.update(fecha_modificacion=models.F('fecha_publicacion'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0011_almacen_imagenes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casa',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copiar_fecha_publicacion, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='CasaEliminada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_casa', models.IntegerField(db_index=True)),
+                ('fecha_eliminacion', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Casa eliminada',
+                'verbose_name_plural': 'Casas eliminadas',
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def marcar_pendientes(apps, schema_editor):
+    """
+    Las casas sin coordenadas pero con dirección quedan pendientes
+    (se encolan con: python manage.py encolar_geocodificacion).
+    """
+    Casa = apps.get_model('web', 'Casa')
+    sin_coordenadas = models.Q(latitud__isnull=True) | models.Q(longitud__isnull=True)
+    con_direccion = (
+        models.Q(direccion__gt='') | models.Q(municipio__gt='') |
+        models.Q(estado__gt='') | models.Q(codigo_postal__gt='')
+    )
+    Casa.objects.filter(sin_coordenadas & con_direccion).update(estado_geocodificacion='pendiente')
+    Casa.objects.filter(latitud__isnull=False, longitud__isnull=False).update(estado_geocodificacion='completada')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0012_casa_fecha_modificacion_casaeliminada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('clave', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('carga', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=15)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('max_intentos', models.PositiveIntegerField(default=5)),
+                ('ejecutar_despues', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tarea en segundo plano',
+                'verbose_name_plural': 'Tareas en segundo plano',
+                'indexes': [models.Index(fields=['estado', 'ejecutar_despues'], name='tarea_estado_ejecutar_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='casa',
+            name='estado_geocodificacion',
+            field=models.CharField(choices=[('no_requerida', 'No requerida'), ('pendiente', 'Pendiente'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='no_requerida', editable=False, help_text='Las coordenadas faltantes se obtienen en segundo plano (comando procesar_tareas)', max_length=15, verbose_name='Geocodificación'),
+        ),
+        migrations.RunPython(marcar_pendientes, migrations.RunPython.noop),
+    ]
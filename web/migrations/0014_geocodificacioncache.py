@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0013_tarea_casa_estado_geocodificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodificacionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255, unique=True)),
+                ('latitud', models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True)),
+                ('longitud', models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True)),
+                ('encontrado', models.BooleanField(default=False)),
+                ('proveedor', models.CharField(max_length=50)),
+                ('fecha_consulta', models.DateTimeField(default=django.utils.timezone.now)),
+                ('aciertos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Geocodificación en caché',
+                'verbose_name_plural': 'Geocodificaciones en caché',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 15:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0014_geocodificacioncache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteVentas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=15)),
+                ('progreso', models.PositiveSmallIntegerField(default=0, help_text='Porcentaje de avance (0-100)')),
+                ('mensaje', models.CharField(blank=True, help_text='Paso en el que va la generación', max_length=200)),
+                ('programado', models.BooleanField(default=False, help_text='Generado por el reporte nocturno')),
+                ('archivo', models.CharField(blank=True, help_text='Nombre del PDF dentro de MULTICASA_REPORTES_DIR', max_length=255)),
+                ('tamano_bytes', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_solicitud', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_termino', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reportes_ventas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reporte de ventas',
+                'verbose_name_plural': 'Reportes de ventas',
+                'ordering': ['-fecha_solicitud'],
+            },
+        ),
+    ]
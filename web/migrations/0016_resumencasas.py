@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-17 16:00
+
+from django.db import migrations, models
+
+
+def llenar_resumen(apps, schema_editor):
+    from web.resumen import reconstruir_resumen
+
+    reconstruir_resumen(apps.get_model('web', 'Casa'), apps.get_model('web', 'ResumenCasas'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0015_reporteventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCasas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(blank=True, default='', max_length=100)),
+                ('municipio', models.CharField(blank=True, default='', max_length=100)),
+                ('estatus', models.CharField(max_length=10)),
+                ('rango', models.PositiveSmallIntegerField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('suma_precio', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('precio_minimo', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('precio_maximo', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('cantidad_con_superficie', models.PositiveIntegerField(default=0)),
+                ('suma_superficie', models.PositiveBigIntegerField(default=0)),
+                ('suma_precio_con_superficie', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de casas',
+                'verbose_name_plural': 'Resumen de casas',
+                'unique_together': {('estado', 'municipio', 'estatus', 'rango')},
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
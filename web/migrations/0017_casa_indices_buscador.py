@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0016_resumencasas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', '-fecha_publicacion', '-id_casa'], name='casa_estatus_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', 'estado', 'municipio'], name='casa_estatus_ubicacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', 'codigo_postal'], name='casa_estatus_cp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', 'precio'], name='casa_estatus_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', 'habitaciones', 'banos'], name='casa_estatus_recamaras_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['-fecha_publicacion'], name='casa_fecha_publicacion_idx'),
+        ),
+    ]
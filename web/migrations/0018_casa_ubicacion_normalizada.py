@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+def llenar_normalizados(apps, schema_editor):
+    from web.utilidades import normalizar_texto
+
+    Casa = apps.get_model('web', 'Casa')
+    lote = []
+    for casa in Casa.objects.only('pk', 'estado', 'municipio').iterator(chunk_size=2000):
+        casa.estado_normalizado = normalizar_texto(casa.estado)[:100]
+        casa.municipio_normalizado = normalizar_texto(casa.municipio)[:100]
+        lote.append(casa)
+        if len(lote) >= 2000:
+            Casa.objects.bulk_update(lote, ['estado_normalizado', 'municipio_normalizado'])
+            lote = []
+    if lote:
+        Casa.objects.bulk_update(lote, ['estado_normalizado', 'municipio_normalizado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0017_casa_indices_buscador'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casa',
+            name='estado_normalizado',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='casa',
+            name='municipio_normalizado',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(llenar_normalizados, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='casa',
+            name='casa_estatus_ubicacion_idx',
+        ),
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', 'estado_normalizado', 'municipio_normalizado'], name='casa_estatus_ubic_norm_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:00
+
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from web.busqueda import crear_indice_texto
+
+    tabla = apps.get_model('web', 'Casa')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        crear_indice_texto(cursor, schema_editor.connection.vendor, tabla)
+
+
+def eliminar_indice(apps, schema_editor):
+    from web.busqueda import eliminar_indice_texto
+
+    tabla = apps.get_model('web', 'Casa')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        eliminar_indice_texto(cursor, schema_editor.connection.vendor, tabla)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0018_casa_ubicacion_normalizada'),
+    ]
+
+    operations = [
+        # Índice FULLTEXT (MySQL) o tabla FTS5 con triggers (SQLite); ver web/busqueda.py
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0019_casa_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', 'latitud', 'longitud'], name='casa_estatus_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:00
+
+from django.db import migrations, models
+
+
+def llenar_geohash(apps, schema_editor):
+    from web.geo import codificar_geohash
+
+    Casa = apps.get_model('web', 'Casa')
+    lote = []
+    casas = Casa.objects.filter(latitud__isnull=False, longitud__isnull=False).only('pk', 'latitud', 'longitud')
+    for casa in casas.iterator(chunk_size=2000):
+        casa.geohash = codificar_geohash(casa.latitud, casa.longitud)
+        lote.append(casa)
+        if len(lote) >= 2000:
+            Casa.objects.bulk_update(lote, ['geohash'])
+            lote = []
+    if lote:
+        Casa.objects.bulk_update(lote, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0020_casa_indice_coordenadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casa',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(llenar_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='casa',
+            index=models.Index(fields=['estatus', 'geohash'], name='casa_estatus_geohash_idx'),
+        ),
+    ]
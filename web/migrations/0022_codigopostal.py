@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0021_casa_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodigoPostal',
+            fields=[
+                ('codigo', models.CharField(max_length=5, primary_key=True, serialize=False)),
+                ('estado', models.CharField(max_length=100)),
+                ('municipio', models.CharField(max_length=100)),
+                ('ciudad', models.CharField(blank=True, default='', max_length=100)),
+                ('asentamientos', models.PositiveIntegerField(default=0, help_text='Colonias, fraccionamientos, etc. con este CP')),
+                ('latitud', models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True)),
+                ('longitud', models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True)),
+            ],
+            options={
+                'verbose_name': 'Código postal',
+                'verbose_name_plural': 'Códigos postales',
+            },
+        ),
+    ]
@@ -1,9 +1,17 @@
 from django.db import models
 from django.core.exceptions import ValidationError
-import base64
+from django.urls import reverse
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+import io
 import re
-import requests
-from time import sleep
+
+from .almacenamiento import obtener_almacen
+from .codigos_postales import buscar_codigo_postal
+from .geo import codificar_geohash
+from .utilidades import normalizar_texto
+from .geocodificacion import ErrorGeocodificacion, centroide_codigo_postal, geocodificar_con_cache
 
 
 # =========================
@@ -70,9 +78,15 @@ def validar_longitud(value):
 # GEOLOCALIZACIÓN (Nominatim)
 # =========================
 
-def geocodificar_direccion(direccion, municipio, estado, codigo_postal):
+def geocodificar_direccion(direccion, municipio, estado, codigo_postal, lanzar_errores=False):
     """
-    Obtiene latitud y longitud automáticamente usando Nominatim (OpenStreetMap)
+    Obtiene latitud y longitud usando el geocodificador configurado
+    (Nominatim por defecto, ver web/geocodificacion.py).
+    El primer nivel es el catálogo local de CP (sin red): sin calle, su
+    centroide es la respuesta; con calle, es el respaldo mientras la caché
+    persistente (GeocodificacionCache) o la red dan una ubicación más precisa.
+    Con lanzar_errores=True, las fallas del servicio se propagan como
+    ErrorGeocodificacion (la cola de tareas las usa para reintentar el refinamiento).
     """
     partes_direccion = []
     if direccion:
@@ -89,34 +103,63 @@ def geocodificar_direccion(direccion, municipio, estado, codigo_postal):
 
     direccion_completa = ", ".join(partes_direccion) + ", México"
 
+    centroide = None
+    ubicacion = buscar_codigo_postal(codigo_postal)
+    if ubicacion is not None and ubicacion.latitud is not None:
+        centroide = (ubicacion.latitud, ubicacion.longitud)
+        if not direccion:
+            return centroide
+
     try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            'q': direccion_completa,
-            'format': 'json',
-            'limit': 1,
-            'countrycodes': 'mx'
-        }
-        headers = {
-            'User-Agent': 'Multicasa/1.0 (contacto@multicasa.com)'
-        }
-
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        sleep(1)  # ser buen ciudadano con la API
-
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                lat = float(data[0]['lat'])
-                lon = float(data[0]['lon'])
-                return lat, lon
+        lat, lon = geocodificar_con_cache(direccion_completa)
+        if lat is None and centroide is not None:
+            lat, lon = centroide
+        elif lat is None and codigo_postal:
+            lat, lon = centroide_codigo_postal(codigo_postal, estado)
+        return lat, lon
+    except ErrorGeocodificacion as e:
+        if lanzar_errores:
+            raise
+        print(f"Error en geocodificación: {e}")
+        return centroide or (None, None)
 
-        return None, None
 
-    except Exception as e:
-        print(f"Error en geocodificación: {e}")
+# =========================
+# MODELO GeocodificacionCache (resultados de geocodificación ya conocidos)
+# =========================
+
+class GeocodificacionCache(models.Model):
+    """
+    Resultado de geocodificar una dirección normalizada (sin acentos ni signos).
+    También guarda los resultados negativos, que caducan antes.
+    """
+    clave = models.CharField(max_length=255, unique=True)
+    latitud = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    longitud = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    encontrado = models.BooleanField(default=False)
+    proveedor = models.CharField(max_length=50)
+    fecha_consulta = models.DateTimeField(default=timezone.now)
+    aciertos = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.clave
+
+    def vigente(self):
+        if self.encontrado:
+            dias = getattr(settings, 'MULTICASA_GEOCACHE_DIAS', 180)
+        else:
+            dias = getattr(settings, 'MULTICASA_GEOCACHE_DIAS_NEGATIVOS', 7)
+        return self.fecha_consulta >= timezone.now() - timedelta(days=dias)
+
+    def coordenadas(self):
+        if self.encontrado:
+            return float(self.latitud), float(self.longitud)
         return None, None
 
+    class Meta:
+        verbose_name = "Geocodificación en caché"
+        verbose_name_plural = "Geocodificaciones en caché"
+
 
 # =========================
 # MODELO Casa
@@ -127,6 +170,12 @@ class Casa(models.Model):
         ('en venta', 'En Venta'),
         ('vendida', 'Vendida'),
     ]
+    GEOCODIFICACION_CHOICES = [
+        ('no_requerida', 'No requerida'),
+        ('pendiente', 'Pendiente'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
 
     id_casa = models.AutoField(primary_key=True)
 
@@ -193,6 +242,14 @@ class Casa(models.Model):
         validators=[validar_longitud],
         help_text="Coordenada de longitud (-180 a 180). Puede llenarse automáticamente."
     )
+    estado_geocodificacion = models.CharField(
+        max_length=15,
+        choices=GEOCODIFICACION_CHOICES,
+        default='no_requerida',
+        editable=False,
+        verbose_name="Geocodificación",
+        help_text="Las coordenadas faltantes se obtienen en segundo plano (comando procesar_tareas)"
+    )
 
     # --- Características ---
     estatus = models.CharField(
@@ -220,6 +277,14 @@ class Casa(models.Model):
     )
 
     fecha_publicacion = models.DateTimeField(auto_now_add=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    # --- Copias normalizadas para el buscador (minúsculas, sin acentos; ver normalizar_ubicacion) ---
+    estado_normalizado = models.CharField(max_length=100, blank=True, default='', editable=False)
+    municipio_normalizado = models.CharField(max_length=100, blank=True, default='', editable=False)
+
+    # --- Geohash de las coordenadas, para agrupar casas en el mapa (ver calcular_geohash) ---
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
 
     def __str__(self):
         return self.titulo
@@ -245,9 +310,10 @@ class Casa(models.Model):
                 'estado': 'Si proporcionas estado, también debes indicar municipio.',
             })
 
-    def geocodificar_automaticamente(self):
+    def geocodificar_automaticamente(self, lanzar_errores=False):
         """
         Geocodifica automáticamente la dirección si no hay coordenadas
+        (no guarda; lo usa la tarea geocodificar_casa de web/tareas.py)
         """
         if not self.latitud or not self.longitud:
             if self.direccion or self.municipio or self.estado or self.codigo_postal:
@@ -255,7 +321,8 @@ class Casa(models.Model):
                     self.direccion,
                     self.municipio,
                     self.estado,
-                    self.codigo_postal
+                    self.codigo_postal,
+                    lanzar_errores=lanzar_errores
                 )
                 if lat and lon:
                     self.latitud = lat
@@ -263,6 +330,16 @@ class Casa(models.Model):
                     return True
         return False
 
+    @property
+    def portada(self):
+        """
+        Primera imagen de la casa (según 'orden'). Usa la lista precargada por
+        prefetch_imagenes() si existe, para no lanzar una consulta por casa.
+        """
+        if hasattr(self, 'imagenes_ordenadas'):
+            return self.imagenes_ordenadas[0] if self.imagenes_ordenadas else None
+        return self.imagenes.order_by('orden', 'id_imagen_casa').first()
+
     def ubicacion_completa(self):
         partes = []
         if self.direccion:
@@ -275,17 +352,265 @@ class Casa(models.Model):
             partes.append(f"CP: {self.codigo_postal}")
         return ", ".join(partes) if partes else "Ubicación no especificada"
 
+    def normalizar_ubicacion(self):
+        """
+        Llena estado_normalizado y municipio_normalizado. Lo llama save(); quien
+        use bulk_create (p. ej. importar_casas) debe llamarlo a mano.
+        """
+        self.estado_normalizado = normalizar_texto(self.estado)[:100]
+        self.municipio_normalizado = normalizar_texto(self.municipio)[:100]
+
+    def calcular_geohash(self):
+        """
+        Llena geohash a partir de latitud/longitud ('' si no hay coordenadas).
+        Igual que normalizar_ubicacion, bulk_create no lo llama.
+        """
+        if self.latitud is None or self.longitud is None:
+            self.geohash = ''
+        else:
+            self.geohash = codificar_geohash(self.latitud, self.longitud)
+
+    def requiere_geocodificacion(self):
+        return (not self.latitud or not self.longitud) and bool(
+            self.direccion or self.municipio or self.estado or self.codigo_postal
+        )
+
     def save(self, *args, **kwargs):
         # Ejecuta validaciones
         self.full_clean()
-        # Si no hay coordenadas, intenta geocodificar
-        if not self.latitud or not self.longitud:
-            self.geocodificar_automaticamente()
+
+        # Las copias normalizadas siempre acompañan a estado/municipio
+        self.normalizar_ubicacion()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'estado', 'municipio'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'estado_normalizado', 'municipio_normalizado'}
+
+        # Lo mismo el geohash con las coordenadas (el worker de geocodificación guarda con update_fields)
+        self.calcular_geohash()
+        if update_fields is not None and {'latitud', 'longitud'} & set(update_fields):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'geohash'}
+
+        # Si no hay coordenadas, la geocodificación se encola (ya no bloquea el guardado).
+        # Con update_fields es un guardado parcial (p. ej. el del propio worker): no se toca.
+        encolar = False
+        if update_fields is None:
+            if self.requiere_geocodificacion():
+                self.estado_geocodificacion = 'pendiente'
+                encolar = True
+            elif self.estado_geocodificacion == 'pendiente':
+                # Las coordenadas se capturaron a mano mientras esperaba en la cola
+                self.estado_geocodificacion = 'no_requerida'
+
         super().save(*args, **kwargs)
 
+        if encolar:
+            Tarea.encolar('geocodificar_casa', {'id_casa': self.pk}, clave=f'geocodificar_casa:{self.pk}')
+
     class Meta:
         verbose_name = "Casa"
         verbose_name_plural = "Casas"
+        # Índices para los caminos del buscador de la homepage (siempre filtra por
+        # estatus y ordena por fecha_publicacion, id_casa). Ver el comando benchmark_filtros.
+        indexes = [
+            models.Index(fields=['estatus', '-fecha_publicacion', '-id_casa'], name='casa_estatus_fecha_idx'),
+            models.Index(
+                fields=['estatus', 'estado_normalizado', 'municipio_normalizado'],
+                name='casa_estatus_ubic_norm_idx'
+            ),
+            models.Index(fields=['estatus', 'codigo_postal'], name='casa_estatus_cp_idx'),
+            models.Index(fields=['estatus', 'precio'], name='casa_estatus_precio_idx'),
+            models.Index(fields=['estatus', 'habitaciones', 'banos'], name='casa_estatus_recamaras_idx'),
+            models.Index(fields=['estatus', 'latitud', 'longitud'], name='casa_estatus_lat_lng_idx'),
+            models.Index(fields=['estatus', 'geohash'], name='casa_estatus_geohash_idx'),
+            models.Index(fields=['-fecha_publicacion'], name='casa_fecha_publicacion_idx'),
+        ]
+
+
+# =========================
+# MODELO Tarea (cola de trabajos en segundo plano)
+# =========================
+
+class Tarea(models.Model):
+    """
+    Trabajo pendiente para el worker (python manage.py procesar_tareas).
+    Los tipos disponibles y su código están en web/tareas.py.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    # Evita encolar dos veces lo mismo mientras siga pendiente (ej: 'geocodificar_casa:12')
+    clave = models.CharField(max_length=100, blank=True, db_index=True)
+    carga = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=5)
+    ejecutar_despues = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.estado})"
+
+    @classmethod
+    def encolar(cls, tipo, carga=None, clave='', ejecutar_despues=None, max_intentos=5):
+        """
+        Agrega una tarea a la cola. Si ya hay una pendiente con la misma clave,
+        regresa esa en lugar de duplicarla.
+        """
+        if clave:
+            existente = cls.objects.filter(clave=clave, estado='pendiente').first()
+            if existente:
+                return existente
+        return cls.objects.create(
+            tipo=tipo,
+            carga=carga or {},
+            clave=clave,
+            ejecutar_despues=ejecutar_despues or timezone.now(),
+            max_intentos=max_intentos,
+        )
+
+    class Meta:
+        verbose_name = "Tarea en segundo plano"
+        verbose_name_plural = "Tareas en segundo plano"
+        indexes = [
+            models.Index(fields=['estado', 'ejecutar_despues'], name='tarea_estado_ejecutar_idx'),
+        ]
+
+
+# =========================
+# MODELO CasaEliminada (registro de bajas para sincronización)
+# =========================
+
+class CasaEliminada(models.Model):
+    """
+    Se crea al borrar una Casa (ver web/signals.py) para que los clientes
+    que sincronizan con ?updated_since= se enteren de la baja.
+    """
+    id_casa = models.IntegerField(db_index=True)
+    fecha_eliminacion = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Casa {self.id_casa} eliminada el {self.fecha_eliminacion:%d/%m/%Y %H:%M}"
+
+    class Meta:
+        verbose_name = "Casa eliminada"
+        verbose_name_plural = "Casas eliminadas"
+
+
+# =========================
+# MODELO ResumenCasas (estadísticas precalculadas)
+# =========================
+
+class ResumenCasas(models.Model):
+    """
+    Totales de las casas por estado, municipio, estatus y rango de precio.
+    Se mantiene al día con señales de Casa (ver web/resumen.py) y se puede
+    reconstruir completo con: python manage.py recalcular_resumen
+    """
+    estado = models.CharField(max_length=100, blank=True, default='')
+    municipio = models.CharField(max_length=100, blank=True, default='')
+    estatus = models.CharField(max_length=10)
+    # Índice del rango en settings.MULTICASA_RANGOS_PRECIO (si se cambian, hay que recalcular)
+    rango = models.PositiveSmallIntegerField()
+    cantidad = models.PositiveIntegerField(default=0)
+    suma_precio = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    precio_minimo = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    precio_maximo = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Solo casas con superficie capturada (para el precio por m²)
+    cantidad_con_superficie = models.PositiveIntegerField(default=0)
+    suma_superficie = models.PositiveBigIntegerField(default=0)
+    suma_precio_con_superficie = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.estado or '-'} / {self.municipio or '-'} / {self.estatus} / rango {self.rango}: {self.cantidad}"
+
+    class Meta:
+        verbose_name = "Resumen de casas"
+        verbose_name_plural = "Resumen de casas"
+        unique_together = ('estado', 'municipio', 'estatus', 'rango')
+
+
+# =========================
+# MODELO CodigoPostal (catálogo local de códigos postales)
+# =========================
+
+class CodigoPostal(models.Model):
+    """
+    Un código postal del catálogo de SEPOMEX (y su centroide, de GeoNames).
+    Se carga con: python manage.py importar_codigos_postales
+    Las consultas pasan por web/codigos_postales.py, que lo tiene en memoria.
+    """
+    codigo = models.CharField(max_length=5, primary_key=True)
+    estado = models.CharField(max_length=100)
+    municipio = models.CharField(max_length=100)
+    ciudad = models.CharField(max_length=100, blank=True, default='')
+    asentamientos = models.PositiveIntegerField(default=0, help_text="Colonias, fraccionamientos, etc. con este CP")
+    latitud = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    longitud = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.codigo} - {self.municipio}, {self.estado}"
+
+    class Meta:
+        verbose_name = "Código postal"
+        verbose_name_plural = "Códigos postales"
+
+
+# =========================
+# MODELO ReporteVentas (reportes PDF generados en segundo plano)
+# =========================
+
+class ReporteVentas(models.Model):
+    """
+    Un reporte de ventas pedido desde el admin (o programado cada noche).
+    Lo genera el worker (ver web/reportes.py); el PDF queda en MULTICASA_REPORTES_DIR.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='pendiente')
+    progreso = models.PositiveSmallIntegerField(default=0, help_text="Porcentaje de avance (0-100)")
+    mensaje = models.CharField(max_length=200, blank=True, help_text="Paso en el que va la generación")
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reportes_ventas'
+    )
+    programado = models.BooleanField(default=False, help_text="Generado por el reporte nocturno")
+    archivo = models.CharField(max_length=255, blank=True, help_text="Nombre del PDF dentro de MULTICASA_REPORTES_DIR")
+    tamano_bytes = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_solicitud = models.DateTimeField(auto_now_add=True, db_index=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_termino = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Reporte de ventas #{self.pk} ({self.get_estado_display()})"
+
+    @property
+    def terminado(self):
+        return self.estado in ('completado', 'fallido')
+
+    def nombre_descarga(self):
+        return f"Reporte_Ventas_Multicasa_{timezone.localtime(self.fecha_solicitud):%Y-%m-%d_%H%M}.pdf"
+
+    class Meta:
+        verbose_name = "Reporte de ventas"
+        verbose_name_plural = "Reportes de ventas"
+        ordering = ['-fecha_solicitud']
 
 
 # =========================
@@ -298,7 +623,13 @@ class ImagenBase(models.Model):
         max_length=255,
         help_text="Nombre descriptivo de la imagen"
     )
-    imagen_data = models.BinaryField(verbose_name="Datos de la imagen")
+    # Solo para imágenes antiguas: los binarios nuevos viven en el almacén
+    # (ver web/almacenamiento.py y el comando migrar_imagenes_almacen)
+    imagen_data = models.BinaryField(
+        null=True,
+        blank=True,
+        verbose_name="Datos de la imagen (heredado)"
+    )
     tipo_contenido = models.CharField(
         max_length=100,
         help_text="Tipo MIME (ej: image/jpeg, image/png)"
@@ -309,6 +640,13 @@ class ImagenBase(models.Model):
         null=True,
         help_text="Categoría (ej: exterior, interior, jardín)"
     )
+    hash_contenido = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="SHA-256 del contenido; se usa como ETag y como nombre en el almacén"
+    )
+    tamano_bytes = models.PositiveIntegerField(null=True, blank=True, editable=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -316,19 +654,138 @@ class ImagenBase(models.Model):
 
     def get_image_src(self):
         """
-        Genera el src para usar en etiquetas <img>
+        Genera el src para usar en etiquetas <img> (URL de la vista servir_imagen)
         """
-        if self.imagen_data and self.tipo_contenido:
-            base64_data = base64.b64encode(self.imagen_data).decode('utf-8')
-            return f"data:{self.tipo_contenido};base64,{base64_data}"
+        if self.pk:
+            return reverse('servir_imagen', args=[self.pk])
         return None
 
+    def get_miniatura_src(self):
+        return url_variante(self.pk, 'miniatura', 'jpeg')
+
+    def get_tarjeta_src(self):
+        return url_variante(self.pk, 'tarjeta', 'jpeg')
+
+    def get_srcset(self):
+        return srcset_imagen(self.pk, 'jpeg')
+
+    def get_srcset_webp(self):
+        return srcset_imagen(self.pk, 'webp')
+
+    def leer_datos(self):
+        """
+        Regresa los bytes de la imagen (del almacén o, si aún no se migró, de la BD)
+        """
+        almacen = obtener_almacen()
+        if almacen.existe(self.hash_contenido):
+            with almacen.abrir(self.hash_contenido) as archivo:
+                return archivo.read()
+        if self.imagen_data:
+            return bytes(self.imagen_data)
+        return None
+
+    def abrir_archivo(self):
+        """
+        Archivo binario listo para FileResponse, o None si no hay datos
+        """
+        almacen = obtener_almacen()
+        if almacen.existe(self.hash_contenido):
+            return almacen.abrir(self.hash_contenido)
+        datos = self.leer_datos()
+        return io.BytesIO(datos) if datos else None
+
+    def save(self, *args, **kwargs):
+        # Si llegaron bytes nuevos, se mueven al almacén y solo queda el hash en la tabla
+        if 'imagen_data' not in self.get_deferred_fields() and self.imagen_data:
+            datos = bytes(self.imagen_data)
+            self.hash_contenido = obtener_almacen().guardar(datos)
+            self.tamano_bytes = len(datos)
+            self.imagen_data = None
+            # La señal post_save genera las variantes con estos bytes (ver web/signals.py)
+            self._datos_nuevos = datos
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {
+                    'hash_contenido', 'tamano_bytes', 'imagen_data'
+                }
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Imagen de Galería"
         verbose_name_plural = "Imágenes de Galería"
         ordering = ['nombre']
 
 
+# =========================
+# MODELO VarianteImagen (miniaturas y versiones responsivas)
+# =========================
+
+class VarianteImagen(models.Model):
+    """
+    Versión redimensionada de una ImagenBase. Se genera una sola vez al
+    subir la imagen (ver web/imagenes.py) y nunca por petición. Los bytes
+    se guardan en el almacén de imágenes bajo hash_contenido.
+    """
+    TIPO_CHOICES = [
+        ('miniatura', 'Miniatura'),
+        ('tarjeta', 'Tarjeta'),
+        ('completa', 'Ancho completo'),
+    ]
+    FORMATO_CHOICES = [
+        ('jpeg', 'JPEG'),
+        ('webp', 'WebP'),
+    ]
+
+    # Ancho máximo en píxeles de cada tipo de variante
+    ANCHOS = {
+        'miniatura': 160,
+        'tarjeta': 480,
+        'completa': 1280,
+    }
+
+    id_variante = models.AutoField(primary_key=True)
+    imagen_base = models.ForeignKey(
+        ImagenBase,
+        on_delete=models.CASCADE,
+        related_name='variantes'
+    )
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+    ancho = models.PositiveIntegerField()
+    alto = models.PositiveIntegerField()
+    tamano_bytes = models.PositiveIntegerField(null=True, blank=True)
+    tipo_contenido = models.CharField(max_length=100)
+    hash_contenido = models.CharField(max_length=64, editable=False)
+
+    def __str__(self):
+        return f"{self.imagen_base_id} - {self.tipo} ({self.formato})"
+
+    class Meta:
+        verbose_name = "Variante de imagen"
+        verbose_name_plural = "Variantes de imágenes"
+        unique_together = [('imagen_base', 'tipo', 'formato')]
+
+
+def url_variante(id_imagen, tipo, formato):
+    """
+    URL de una variante; si aún no existe, la vista redirige al original.
+    """
+    if id_imagen:
+        return reverse('servir_variante', args=[id_imagen, tipo, formato])
+    return None
+
+
+def srcset_imagen(id_imagen, formato):
+    """
+    Genera el atributo srcset con todas las variantes de una imagen
+    """
+    if not id_imagen:
+        return ''
+    return ", ".join(
+        f"{url_variante(id_imagen, tipo, formato)} {ancho}w"
+        for tipo, ancho in VarianteImagen.ANCHOS.items()
+    )
+
+
 # =========================
 # MODELO ImagenCasa (relación Casa - ImagenBase)
 # =========================
@@ -348,9 +805,34 @@ class ImagenCasa(models.Model):
         return f"Imagen de {self.casa.titulo} - {self.imagen_base.nombre}"
 
     def get_image_src(self):
-        return self.imagen_base.get_image_src()
+        # Usamos el id directamente para no consultar ImagenBase
+        return reverse('servir_imagen', args=[self.imagen_base_id])
+
+    def get_miniatura_src(self):
+        return url_variante(self.imagen_base_id, 'miniatura', 'jpeg')
+
+    def get_tarjeta_src(self):
+        return url_variante(self.imagen_base_id, 'tarjeta', 'jpeg')
+
+    def get_srcset(self):
+        return srcset_imagen(self.imagen_base_id, 'jpeg')
+
+    def get_srcset_webp(self):
+        return srcset_imagen(self.imagen_base_id, 'webp')
 
     class Meta:
         verbose_name = "Imagen de Casa"
         verbose_name_plural = "Imágenes de Casas"
         ordering = ['orden']
+
+
+def prefetch_imagenes():
+    """
+    Prefetch de las imágenes de cada casa, ya ordenadas, en una sola consulta.
+    Quedan en casa.imagenes_ordenadas (y casa.portada toma la primera).
+    """
+    return models.Prefetch(
+        'imagenes',
+        queryset=ImagenCasa.objects.order_by('orden', 'id_imagen_casa'),
+        to_attr='imagenes_ordenadas'
+    )
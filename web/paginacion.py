@@ -0,0 +1,179 @@
+import base64
+import json
+import math
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# =========================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# =========================
+#
+# En lugar de OFFSET (que obliga a la BD a recorrer todas las filas anteriores),
+# cada página continúa "después" o "antes" de la última fila vista, usando los
+# valores de las columnas de ordenamiento. Así cualquier página cuesta lo mismo.
+
+TAMANO_PAGINA = 12
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime):
+        return ['dt', valor.isoformat()]
+    if isinstance(valor, Decimal):
+        return ['dec', str(valor)]
+    return ['v', valor]
+
+
+def _decodificar_valor(par):
+    tipo, valor = par
+    if tipo == 'dt':
+        return datetime.fromisoformat(valor)
+    if tipo == 'dec':
+        return Decimal(valor)
+    return valor
+
+
+def codificar_cursor(valores):
+    texto = json.dumps([_codificar_valor(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _convertir(campo, valor):
+    """
+    Valor del cursor convertido al tipo del campo; un texto donde va un número o
+    una fecha haría fallar la consulta al armarla.
+    """
+    try:
+        valor = campo.to_python(valor)
+    except (ValidationError, TypeError, ValueError) as e:
+        raise CursorInvalido(f"Cursor inválido: {e}")
+    if valor is None or (isinstance(valor, float) and not math.isfinite(valor)):
+        raise CursorInvalido(f"Cursor inválido: valor {valor!r}")
+    return valor
+
+
+def decodificar_cursor(cursor, campos=None):
+    """
+    Valores del cursor. Con 'campos' (los campos del ordenamiento, en orden) se
+    valida que haya uno por campo y que cada uno sea del tipo correcto.
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        pares = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+        valores = [_decodificar_valor(par) for par in pares]
+    except Exception as e:
+        raise CursorInvalido(f"Cursor inválido: {e}")
+    if campos is None:
+        return valores
+    if len(valores) != len(campos):
+        raise CursorInvalido("Cursor inválido: no corresponde al ordenamiento")
+    return [_convertir(campo, valor) for campo, valor in zip(campos, valores)]
+
+
+def _campo_orden(queryset, campo):
+    # Campo del modelo o anotación (p. ej. la relevancia de la búsqueda de texto)
+    if campo in queryset.query.annotations:
+        return queryset.query.annotations[campo].output_field
+    return queryset.model._meta.get_field(campo)
+
+
+def _valor(item, campo):
+    if isinstance(item, dict):
+        return item[campo]
+    return getattr(item, campo)
+
+
+def _filtro_posterior(orden, valores, invertir):
+    """
+    Construye (a < va) OR (a = va AND b < vb) OR ... según el sentido de cada campo.
+    """
+    condicion = Q()
+    iguales = Q()
+    for (campo, descendente), valor in zip(orden, valores):
+        menor = descendente != invertir
+        comparacion = Q(**{f"{campo}__{'lt' if menor else 'gt'}": valor})
+        condicion |= iguales & comparacion
+        iguales &= Q(**{campo: valor})
+    return condicion
+
+
+class PaginaKeyset:
+    def __init__(self, elementos, cursor_siguiente=None, cursor_anterior=None):
+        self.elementos = elementos
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+
+    def __iter__(self):
+        return iter(self.elementos)
+
+    def __len__(self):
+        return len(self.elementos)
+
+
+def paginar_keyset(queryset, orden, despues=None, antes=None, tamano=TAMANO_PAGINA):
+    """
+    Regresa una PaginaKeyset del queryset.
+
+    - orden: lista de (campo, descendente). El último campo debe ser único
+      (normalmente la llave primaria) y ninguno puede ser NULL.
+    - despues / antes: cursores recibidos en la URL (solo se usa uno).
+    Un cursor inválido se ignora y se regresa la primera página.
+    """
+    campos = [_campo_orden(queryset, campo) for campo, _ in orden]
+    try:
+        valores_despues = decodificar_cursor(despues, campos) if despues else None
+        valores_antes = decodificar_cursor(antes, campos) if antes and not despues else None
+    except CursorInvalido:
+        valores_despues = valores_antes = None
+
+    hacia_atras = valores_antes is not None
+    campos_orden = [
+        ('-' if descendente != hacia_atras else '') + campo
+        for campo, descendente in orden
+    ]
+
+    queryset = queryset.order_by(*campos_orden)
+    if valores_despues is not None:
+        queryset = queryset.filter(_filtro_posterior(orden, valores_despues, invertir=False))
+    elif hacia_atras:
+        queryset = queryset.filter(_filtro_posterior(orden, valores_antes, invertir=True))
+
+    # Pedimos uno de más para saber si hay otra página en esa dirección
+    elementos = list(queryset[:tamano + 1])
+    hay_mas = len(elementos) > tamano
+    elementos = elementos[:tamano]
+    if hacia_atras:
+        elementos.reverse()
+
+    if not elementos:
+        return PaginaKeyset(elementos)
+
+    def cursor_de(item):
+        return codificar_cursor([_valor(item, campo) for campo, _ in orden])
+
+    if hacia_atras:
+        anterior = cursor_de(elementos[0]) if hay_mas else None
+        siguiente = cursor_de(elementos[-1])
+    else:
+        siguiente = cursor_de(elementos[-1]) if hay_mas else None
+        anterior = cursor_de(elementos[0]) if valores_despues is not None else None
+
+    return PaginaKeyset(elementos, siguiente, anterior)
+
+
+def url_con_cursor(request, parametro, cursor):
+    """
+    Query string de la página indicada conservando los filtros actuales.
+    """
+    parametros = request.GET.copy()
+    parametros.pop('despues', None)
+    parametros.pop('antes', None)
+    parametros[parametro] = cursor
+    return '?' + parametros.urlencode()
@@ -0,0 +1,200 @@
+import io
+import os
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.template.loader import get_template
+from django.utils import timezone
+from xhtml2pdf import pisa
+
+from .almacenamiento import escribir_atomico
+from .models import Casa, ReporteVentas, ResumenCasas, Tarea
+
+
+# =========================
+# REPORTE DE VENTAS EN PDF (lo genera el worker, no la petición)
+# =========================
+
+PLANTILLA_REPORTE_VENTAS = 'admin/reporte_ventas.html'
+
+
+def directorio_reportes():
+    return getattr(settings, 'MULTICASA_REPORTES_DIR', os.path.join(settings.BASE_DIR, 'reportes'))
+
+
+def ruta_reporte(reporte):
+    return os.path.join(directorio_reportes(), reporte.archivo)
+
+
+def _avance(reporte, progreso, mensaje):
+    """
+    Guarda el avance con update() para que la vista de estado lo vea al momento.
+    """
+    reporte.progreso = progreso
+    reporte.mensaje = mensaje
+    ReporteVentas.objects.filter(pk=reporte.pk).update(progreso=progreso, mensaje=mensaje)
+
+
+def _resumen_por_municipio():
+    """
+    Conteos y totales por estado/municipio y estatus en UNA consulta agrupada
+    sobre el resumen precalculado (ResumenCasas). El resumen general y el
+    desglose por estado se suman a partir de aquí.
+    """
+    en_venta, vendida = Q(estatus='en venta'), Q(estatus='vendida')
+    return list(
+        ResumenCasas.objects.values('estado', 'municipio')
+        .annotate(
+            en_venta=Coalesce(Sum('cantidad', filter=en_venta), 0),
+            vendidas=Coalesce(Sum('cantidad', filter=vendida), 0),
+            total_en_venta=Coalesce(Sum('suma_precio', filter=en_venta), Decimal('0')),
+            total_vendidas=Coalesce(Sum('suma_precio', filter=vendida), Decimal('0')),
+        )
+        .order_by('estado', 'municipio')
+    )
+
+
+CAMPOS_TOTALES = ('en_venta', 'vendidas', 'total_en_venta', 'total_vendidas')
+
+
+def _completar(resumen):
+    resumen['cantidad'] = resumen['en_venta'] + resumen['vendidas']
+    resumen['total'] = resumen['total_en_venta'] + resumen['total_vendidas']
+    return resumen
+
+
+def _acumular(destino, grupo):
+    for campo in CAMPOS_TOTALES:
+        destino[campo] += grupo[campo]
+
+
+def _secciones(filas):
+    """
+    Una sección por estatus, repartiendo las filas de un solo recorrido
+    ordenado por estatus (la etiqueta {% for %} de la plantilla convierte el
+    generador en lista, así que cada sección se guarda ya como lista).
+    """
+    grupos = groupby(filas, key=itemgetter('estatus'))
+    siguiente = next(grupos, None)
+    # Mismo orden que el ORDER BY estatus de la consulta
+    for estatus in sorted(valor for valor, _ in Casa.ESTATUS_CHOICES):
+        if siguiente is not None and siguiente[0] == estatus:
+            yield {'estatus': estatus, 'filas': list(siguiente[1])}
+            siguiente = next(grupos, None)
+        else:
+            yield {'estatus': estatus, 'filas': []}
+
+
+def contexto_reporte_ventas():
+    por_municipio = _resumen_por_municipio()
+
+    general = dict.fromkeys(CAMPOS_TOTALES, 0)
+    por_estado = {}
+    for grupo in por_municipio:
+        _completar(grupo)
+        _acumular(general, grupo)
+        if grupo['estado'] not in por_estado:
+            por_estado[grupo['estado']] = {'estado': grupo['estado'], **dict.fromkeys(CAMPOS_TOTALES, 0)}
+        _acumular(por_estado[grupo['estado']], grupo)
+
+    # Las casas se leen una sola vez, como diccionarios y por lotes
+    filas = (
+        Casa.objects.filter(estatus__in=[estatus for estatus, _ in Casa.ESTATUS_CHOICES])
+        .order_by('estatus', '-fecha_publicacion')
+        .values('id_casa', 'titulo', 'precio', 'estatus', 'municipio', 'habitaciones', 'banos', 'fecha_publicacion')
+        .iterator(chunk_size=2000)
+    )
+
+    return {
+        'resumen': _completar(general),
+        'por_estado': [_completar(resumen) for resumen in por_estado.values()],
+        'por_municipio': por_municipio,
+        'secciones': _secciones(filas),
+        'fecha_reporte': timezone.now(),
+    }
+
+
+def generar_reporte_ventas(reporte):
+    """
+    Genera el PDF del reporte y lo deja listo para descargar.
+    Lanza una excepción si falla (la cola reintenta).
+    """
+    ReporteVentas.objects.filter(pk=reporte.pk).update(
+        estado='en_proceso', fecha_inicio=timezone.now(), error=''
+    )
+
+    _avance(reporte, 10, "Calculando totales")
+    contexto = contexto_reporte_ventas()
+
+    _avance(reporte, 30, "Armando el documento")
+    html = get_template(PLANTILLA_REPORTE_VENTAS).render(contexto)
+
+    _avance(reporte, 60, "Generando el PDF")
+    resultado = io.BytesIO()
+    pdf = pisa.pisaDocument(io.BytesIO(html.encode("UTF-8")), resultado)
+    if pdf.err:
+        raise RuntimeError("xhtml2pdf no pudo generar el reporte")
+
+    _avance(reporte, 90, "Guardando el archivo")
+    reporte.archivo = f"reporte_ventas_{reporte.pk}.pdf"
+    datos = resultado.getvalue()
+    escribir_atomico(ruta_reporte(reporte), datos)
+
+    reporte.estado = 'completado'
+    reporte.progreso = 100
+    reporte.mensaje = "Listo"
+    reporte.tamano_bytes = len(datos)
+    reporte.fecha_termino = timezone.now()
+    reporte.save(update_fields=['estado', 'progreso', 'mensaje', 'archivo', 'tamano_bytes', 'fecha_termino'])
+
+
+def solicitar_reporte_ventas(usuario=None, programado=False):
+    """
+    Crea un reporte y lo encola. Si ya hay uno en curso, regresa ese
+    (dos clics seguidos no generan dos PDFs). Uno "en curso" de hace más de
+    una hora se da por abandonado (p. ej. el worker se reinició a la mitad).
+    """
+    en_curso = ReporteVentas.objects.filter(
+        estado__in=['pendiente', 'en_proceso'],
+        fecha_solicitud__gte=timezone.now() - timedelta(hours=1),
+    ).first()
+    if en_curso is not None:
+        return en_curso
+
+    reporte = ReporteVentas.objects.create(solicitado_por=usuario, programado=programado, mensaje="En cola")
+    Tarea.encolar(
+        'generar_reporte_ventas',
+        {'id_reporte': reporte.pk},
+        clave=f'generar_reporte_ventas:{reporte.pk}',
+        max_intentos=3,
+    )
+    return reporte
+
+
+# =========================
+# REPORTE NOCTURNO
+# =========================
+#
+# Es una tarea que se vuelve a encolar a sí misma para la noche siguiente.
+# Se activa una sola vez con: python manage.py programar_reporte_nocturno
+
+def proxima_ejecucion_nocturna(ahora=None):
+    hora = getattr(settings, 'MULTICASA_REPORTE_NOCTURNO_HORA', 2)
+    ahora = timezone.localtime(ahora)
+    siguiente = timezone.make_aware(datetime.combine(ahora.date(), time(hour=hora)))
+    if siguiente <= ahora:
+        siguiente = timezone.make_aware(datetime.combine(ahora.date() + timedelta(days=1), time(hour=hora)))
+    return siguiente
+
+
+def programar_reporte_nocturno():
+    return Tarea.encolar(
+        'reporte_ventas_nocturno',
+        clave='reporte_ventas_nocturno',
+        ejecutar_despues=proxima_ejecucion_nocturna(),
+    )
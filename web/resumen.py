@@ -0,0 +1,206 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Casa, ResumenCasas
+
+
+# =========================
+# RANGOS DE PRECIO
+# =========================
+
+# (etiqueta, desde, hasta): desde <= precio < hasta; None = sin límite
+RANGOS_PRECIO_POR_DEFECTO = [
+    ('Menos de $1M', None, 1000000),
+    ('$1M - $2M', 1000000, 2000000),
+    ('$2M - $3M', 2000000, 3000000),
+    ('Más de $3M', 3000000, None),
+]
+
+
+def rangos_precio():
+    return getattr(settings, 'MULTICASA_RANGOS_PRECIO', RANGOS_PRECIO_POR_DEFECTO)
+
+
+def condicion_rango(desde, hasta, campo='precio'):
+    condicion = Q()
+    if desde is not None:
+        condicion &= Q(**{f'{campo}__gte': desde})
+    if hasta is not None:
+        condicion &= Q(**{f'{campo}__lt': hasta})
+    return condicion
+
+
+def indice_rango(precio):
+    for i, (_, desde, hasta) in enumerate(rangos_precio()):
+        if (desde is None or precio >= desde) and (hasta is None or precio < hasta):
+            return i
+    return None
+
+
+# =========================
+# RESUMEN INCREMENTAL (lo llaman las señales de Casa)
+# =========================
+#
+# Cada casa aporta a exactamente un renglón de ResumenCasas. Al guardar se resta
+# lo que aportaba antes (si cambió) y se suma lo nuevo; al borrar solo se resta.
+
+CAMPOS_RESUMEN = ('estado', 'municipio', 'estatus', 'precio', 'superficie_m2')
+
+
+def aporte(valores):
+    """
+    Lo que una casa aporta al resumen, a partir de sus CAMPOS_RESUMEN.
+    Regresa None si no cae en ningún rango de precio.
+    """
+    if valores['precio'] is None:
+        return None
+    rango = indice_rango(valores['precio'])
+    if rango is None:
+        return None
+    return {
+        'clave': {
+            'estado': valores['estado'] or '',
+            'municipio': valores['municipio'] or '',
+            'estatus': valores['estatus'],
+            'rango': rango,
+        },
+        'precio': valores['precio'],
+        'superficie': valores['superficie_m2'] if valores['superficie_m2'] and valores['superficie_m2'] > 0 else None,
+    }
+
+
+def aporte_de_casa(casa):
+    return aporte({campo: getattr(casa, campo) for campo in CAMPOS_RESUMEN})
+
+
+def _renglon_bloqueado(clave):
+    try:
+        with transaction.atomic():
+            renglon, _ = ResumenCasas.objects.select_for_update().get_or_create(**clave)
+    except IntegrityError:
+        # Otro proceso lo creó al mismo tiempo
+        renglon = ResumenCasas.objects.select_for_update().get(**clave)
+    return renglon
+
+
+def sumar(datos):
+    if datos is None:
+        return
+    with transaction.atomic():
+        renglon = _renglon_bloqueado(datos['clave'])
+        renglon.cantidad += 1
+        renglon.suma_precio += datos['precio']
+        if renglon.precio_minimo is None or datos['precio'] < renglon.precio_minimo:
+            renglon.precio_minimo = datos['precio']
+        if renglon.precio_maximo is None or datos['precio'] > renglon.precio_maximo:
+            renglon.precio_maximo = datos['precio']
+        if datos['superficie'] is not None:
+            renglon.cantidad_con_superficie += 1
+            renglon.suma_superficie += datos['superficie']
+            renglon.suma_precio_con_superficie += datos['precio']
+        renglon.save()
+
+
+def _casas_del_renglon(clave):
+    """
+    Casas que caen en un renglón del resumen (para recalcular su mínimo y máximo).
+    """
+    _, desde, hasta = rangos_precio()[clave['rango']]
+    casas = Casa.objects.filter(condicion_rango(desde, hasta), estatus=clave['estatus'])
+    for campo in ('estado', 'municipio'):
+        if clave[campo]:
+            casas = casas.filter(**{campo: clave[campo]})
+        else:
+            casas = casas.filter(Q(**{f'{campo}__isnull': True}) | Q(**{campo: ''}))
+    return casas
+
+
+def restar(datos):
+    if datos is None:
+        return
+    with transaction.atomic():
+        renglon = ResumenCasas.objects.select_for_update().filter(**datos['clave']).first()
+        if renglon is None:
+            return
+        if renglon.cantidad <= 1:
+            renglon.delete()
+            return
+
+        renglon.cantidad -= 1
+        renglon.suma_precio -= datos['precio']
+        if datos['superficie'] is not None:
+            renglon.cantidad_con_superficie -= 1
+            renglon.suma_superficie -= datos['superficie']
+            renglon.suma_precio_con_superficie -= datos['precio']
+        # Solo si se fue el precio mínimo o máximo hay que consultar las casas del renglón
+        if datos['precio'] in (renglon.precio_minimo, renglon.precio_maximo):
+            extremos = _casas_del_renglon(datos['clave']).aggregate(minimo=Min('precio'), maximo=Max('precio'))
+            renglon.precio_minimo = extremos['minimo']
+            renglon.precio_maximo = extremos['maximo']
+        renglon.save()
+
+
+# =========================
+# RECONSTRUCCIÓN COMPLETA
+# =========================
+
+def _anotar_rango(casas):
+    return casas.annotate(rango=Case(
+        *[When(condicion_rango(desde, hasta), then=Value(i)) for i, (_, desde, hasta) in enumerate(rangos_precio())],
+        default=Value(None),
+        output_field=IntegerField(),
+    ))
+
+
+def reconstruir_resumen(modelo_casa=Casa, modelo_resumen=ResumenCasas):
+    """
+    Borra y vuelve a calcular todo el resumen con una sola consulta agrupada.
+    Recibe los modelos para poder usarse también desde una migración.
+    """
+    con_superficie = Q(superficie_m2__gt=0)
+    grupos = (
+        _anotar_rango(modelo_casa.objects.filter(precio__isnull=False))
+        .exclude(rango=None)
+        .values('estado', 'municipio', 'estatus', 'rango')
+        .annotate(
+            cantidad=Count('pk'),
+            suma_precio=Sum('precio'),
+            precio_minimo=Min('precio'),
+            precio_maximo=Max('precio'),
+            cantidad_con_superficie=Count('pk', filter=con_superficie),
+            suma_superficie=Coalesce(Sum('superficie_m2', filter=con_superficie), 0),
+            suma_precio_con_superficie=Coalesce(Sum('precio', filter=con_superficie), Decimal('0')),
+        )
+        .order_by()
+    )
+
+    # estado/municipio NULL y '' van al mismo renglón
+    renglones = {}
+    for grupo in grupos:
+        clave = (grupo['estado'] or '', grupo['municipio'] or '', grupo['estatus'], grupo['rango'])
+        renglon = renglones.get(clave)
+        if renglon is None:
+            renglones[clave] = modelo_resumen(
+                estado=clave[0], municipio=clave[1], estatus=clave[2], rango=clave[3],
+                cantidad=grupo['cantidad'],
+                suma_precio=grupo['suma_precio'],
+                precio_minimo=grupo['precio_minimo'],
+                precio_maximo=grupo['precio_maximo'],
+                cantidad_con_superficie=grupo['cantidad_con_superficie'],
+                suma_superficie=grupo['suma_superficie'],
+                suma_precio_con_superficie=grupo['suma_precio_con_superficie'],
+            )
+            continue
+        for campo in ('cantidad', 'suma_precio', 'cantidad_con_superficie', 'suma_superficie', 'suma_precio_con_superficie'):
+            setattr(renglon, campo, getattr(renglon, campo) + grupo[campo])
+        renglon.precio_minimo = min(renglon.precio_minimo, grupo['precio_minimo'])
+        renglon.precio_maximo = max(renglon.precio_maximo, grupo['precio_maximo'])
+
+    with transaction.atomic():
+        modelo_resumen.objects.all().delete()
+        modelo_resumen.objects.bulk_create(renglones.values())
+    return len(renglones)
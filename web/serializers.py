@@ -2,20 +2,58 @@ from rest_framework import serializers
 from .models import Casa, ImagenCasa
 
 
+class CamposDinamicosMixin:
+    """
+    Permite elegir qué campos se devuelven (?fields=id_casa,titulo,precio).
+    Si no se indican, se usan los de Meta.campos_por_defecto (o todos).
+    """
+
+    def __init__(self, *args, **kwargs):
+        campos = kwargs.pop('campos', None)
+        super().__init__(*args, **kwargs)
+
+        if campos is None:
+            campos = getattr(self.Meta, 'campos_por_defecto', None)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
 class ImagenCasaSerializer(serializers.ModelSerializer):
-    """ Serializador para las imágenes de una casa """
+    """ Serializador para las imágenes de una casa (solo URLs, nunca binarios) """
+    url = serializers.SerializerMethodField()
+    url_tarjeta = serializers.SerializerMethodField()
+    url_miniatura = serializers.SerializerMethodField()
 
     class Meta:
         model = ImagenCasa
-        fields = ['imagen', 'texto_alternativo']
+        fields = ['url', 'url_tarjeta', 'url_miniatura', 'texto_alternativo', 'orden']
 
+    def _absoluta(self, ruta):
+        request = self.context.get('request')
+        if ruta and request is not None:
+            return request.build_absolute_uri(ruta)
+        return ruta
 
-class CasaListSerializer(serializers.ModelSerializer):
+    def get_url(self, obj):
+        return self._absoluta(obj.get_image_src())
+
+    def get_url_tarjeta(self, obj):
+        return self._absoluta(obj.get_tarjeta_src())
+
+    def get_url_miniatura(self, obj):
+        return self._absoluta(obj.get_miniatura_src())
+
+
+class CasaListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializador para mostrar la lista de casas en la API.
+    Las imágenes salen de casa.imagenes_ordenadas (ver prefetch_imagenes).
     """
-    # 'imagenes' es el 'related_name' que definimos en el modelo
-    imagenes = ImagenCasaSerializer(many=True, read_only=True)
+    portada = serializers.SerializerMethodField()
+    imagenes = ImagenCasaSerializer(source='imagenes_ordenadas', many=True, read_only=True)
+    # Solo tiene valor en búsquedas por cercanía (?lat=&lng=)
+    distancia_km = serializers.SerializerMethodField()
 
     class Meta:
         model = Casa
@@ -28,5 +66,52 @@ class CasaListSerializer(serializers.ModelSerializer):
             'habitaciones',
             'banos',
             'superficie_m2',
-            'imagenes'  # Añadimos las imágenes
-        ]
\ No newline at end of file
+            'municipio',
+            'estado',
+            'codigo_postal',
+            'fecha_publicacion',
+            'portada',
+            'imagenes',
+            'distancia_km',
+        ]
+        # La lista no incluye la galería completa salvo que se pida con ?fields=
+        campos_por_defecto = [
+            'id_casa',
+            'titulo',
+            'precio',
+            'estatus',
+            'habitaciones',
+            'banos',
+            'superficie_m2',
+            'municipio',
+            'estado',
+            'codigo_postal',
+            'fecha_publicacion',
+            'portada',
+            'distancia_km',
+        ]
+
+    def get_portada(self, obj):
+        portada = obj.portada
+        if portada is None:
+            return None
+        return ImagenCasaSerializer(portada, context=self.context).data
+
+    def get_distancia_km(self, obj):
+        distancia = getattr(obj, 'distancia', None)
+        return round(distancia, 2) if distancia is not None else None
+
+
+class CasaDetalleSerializer(CasaListSerializer):
+    """
+    Serializador con todos los datos de una casa y su galería.
+    """
+
+    class Meta(CasaListSerializer.Meta):
+        fields = CasaListSerializer.Meta.fields + [
+            'descripcion',
+            'direccion',
+            'latitud',
+            'longitud',
+        ]
+        campos_por_defecto = None
@@ -0,0 +1,207 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .busqueda import asegurar_indice_texto
+from .cache_paginas import invalidar_paginas
+from .estadisticas import invalidar_estadisticas
+from .fichas import eliminar_fichas
+from .imagenes import generar_variantes
+from .mapa import invalidar_mapa
+from .models import Casa, CasaEliminada, ImagenBase, ImagenCasa
+from .resumen import CAMPOS_RESUMEN, aporte, aporte_de_casa, restar, sumar
+from .tareas import encolar_ficha_pdf
+
+
+# =========================
+# SEÑALES DE Casa
+# =========================
+
+@receiver(post_delete, sender=Casa)
+def registrar_casa_eliminada(sender, instance, **kwargs):
+    """
+    Deja constancia de la baja para la sincronización incremental de la API.
+    """
+    CasaEliminada.objects.create(id_casa=instance.pk)
+
+
+# =========================
+# REGENERACIÓN DE FICHAS PDF
+# =========================
+#
+# Cada cambio encola la ficha (con una espera para juntar ediciones seguidas);
+# si alguien la pide antes de que el worker la genere, la vista la genera al vuelo.
+
+@receiver(post_save, sender=Casa)
+def casa_modificada(sender, instance, raw=False, **kwargs):
+    if not raw:
+        encolar_ficha_pdf(instance.pk)
+
+
+@receiver(post_delete, sender=Casa)
+def borrar_fichas_de_casa(sender, instance, **kwargs):
+    id_casa = instance.pk
+    transaction.on_commit(lambda: eliminar_fichas(id_casa))
+
+
+@receiver(post_save, sender=ImagenCasa)
+@receiver(post_delete, sender=ImagenCasa)
+def imagenes_de_casa_modificadas(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Si la casa se está borrando, la tarea simplemente no encontrará la casa
+        encolar_ficha_pdf(instance.casa_id)
+
+
+@receiver(post_save, sender=ImagenBase)
+def imagen_base_modificada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for id_casa in ImagenCasa.objects.filter(imagen_base=instance).values_list('casa_id', flat=True).distinct():
+        encolar_ficha_pdf(id_casa)
+
+
+# =========================
+# FECHA DE MODIFICACIÓN DE LA CASA AL CAMBIAR SUS IMÁGENES
+# =========================
+#
+# La portada y las imágenes son parte de la respuesta de la API: el ETag, el
+# Last-Modified y ?updated_since= dependen de Casa.fecha_modificacion, así que
+# agregar, reordenar o quitar una imagen también cuenta como cambio de la casa.
+# update() no dispara las señales de Casa (la caché de páginas se invalida aparte).
+
+def _tocar_casas(ids_casa):
+    ids_casa = set(ids_casa)
+    if ids_casa:
+        Casa.objects.filter(pk__in=ids_casa).update(fecha_modificacion=timezone.now())
+
+
+@receiver(post_save, sender=ImagenCasa)
+@receiver(post_delete, sender=ImagenCasa)
+def tocar_casa_de_imagen(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _tocar_casas([instance.casa_id])
+
+
+@receiver(post_save, sender=ImagenBase)
+def tocar_casas_de_imagen_base(sender, instance, raw=False, **kwargs):
+    # Al borrarla, sus ImagenCasa se borran en cascada y cada una toca su casa
+    if not raw:
+        _tocar_casas(ImagenCasa.objects.filter(imagen_base=instance).values_list('casa_id', flat=True))
+
+
+# =========================
+# VARIANTES DE ImagenBase (miniaturas y versiones responsivas)
+# =========================
+
+@receiver(post_save, sender=ImagenBase)
+def generar_variantes_de_imagen(sender, instance, raw=False, **kwargs):
+    """
+    ImagenBase.save() deja en _datos_nuevos los bytes que acaban de llegar;
+    guardar sin cambiar la imagen (p. ej. solo el nombre) no regenera nada.
+    """
+    datos = getattr(instance, '_datos_nuevos', None)
+    if raw or datos is None:
+        return
+    instance._datos_nuevos = None
+    generar_variantes(instance, datos)
+
+
+# =========================
+# CACHÉ DEL DASHBOARD
+# =========================
+
+@receiver(post_save, sender=Casa)
+@receiver(post_delete, sender=Casa)
+def invalidar_dashboard(sender, **kwargs):
+    invalidar_estadisticas()
+
+
+# =========================
+# CACHÉ DEL MAPA (clusters por tesela)
+# =========================
+
+@receiver(post_save, sender=Casa)
+@receiver(post_delete, sender=Casa)
+def invalidar_clusters_mapa(sender, raw=False, **kwargs):
+    if not raw:
+        invalidar_mapa()
+
+
+# =========================
+# CACHÉ DE PÁGINAS PÚBLICAS (homepage, detalle y API)
+# =========================
+
+@receiver(post_save, sender=Casa)
+@receiver(post_delete, sender=Casa)
+def invalidar_paginas_de_casa(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidar_paginas(instance.pk)
+
+
+@receiver(post_save, sender=ImagenCasa)
+@receiver(post_delete, sender=ImagenCasa)
+def invalidar_paginas_de_imagen_casa(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidar_paginas(instance.casa_id)
+
+
+@receiver(post_save, sender=ImagenBase)
+@receiver(post_delete, sender=ImagenBase)
+def invalidar_paginas_de_imagen_base(sender, instance, raw=False, **kwargs):
+    # Al borrarla, sus ImagenCasa se borran antes (en cascada) e invalidan sus casas
+    if not raw:
+        invalidar_paginas(*ImagenCasa.objects.filter(imagen_base=instance).values_list('casa_id', flat=True))
+
+
+# =========================
+# RESUMEN DE CASAS (ResumenCasas)
+# =========================
+
+@receiver(pre_save, sender=Casa)
+def guardar_aporte_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Antes de guardar, lee lo que la casa aportaba al resumen (una consulta),
+    salvo que sea nueva o un guardado parcial que no toca esos campos.
+    """
+    instance._aporte_anterior = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_RESUMEN):
+        instance._aporte_anterior = False
+        return
+    valores = Casa.objects.filter(pk=instance.pk).values(*CAMPOS_RESUMEN).first()
+    if valores is not None:
+        instance._aporte_anterior = aporte(valores)
+
+
+@receiver(post_save, sender=Casa)
+def actualizar_resumen(sender, instance, created, raw=False, **kwargs):
+    anterior = getattr(instance, '_aporte_anterior', None)
+    if raw or anterior is False:
+        return
+    nuevo = aporte_de_casa(instance)
+    if not created and anterior == nuevo:
+        return
+    if not created:
+        restar(anterior)
+    sumar(nuevo)
+
+
+@receiver(post_delete, sender=Casa)
+def descontar_del_resumen(sender, instance, **kwargs):
+    restar(aporte_de_casa(instance))
+
+
+# =========================
+# ÍNDICE DE BÚSQUEDA DE TEXTO
+# =========================
+
+@receiver(post_migrate)
+def revisar_indice_texto(sender, using='default', **kwargs):
+    """
+    En SQLite, cualquier migración que reconstruya web_casa (p. ej. AddField)
+    borra los triggers de la tabla FTS5: aquí se vuelven a crear.
+    """
+    if sender.name == 'web':
+        asegurar_indice_texto(connections[using], Casa._meta.db_table)
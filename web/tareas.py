@@ -0,0 +1,236 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .fichas import obtener_ficha
+from .models import Casa, ReporteVentas, Tarea
+from .reportes import generar_reporte_ventas, programar_reporte_nocturno, solicitar_reporte_ventas
+
+
+# =========================
+# REGISTRO DE TIPOS DE TAREA
+# =========================
+#
+# Cada tipo de tarea es una función que recibe la Tarea (con su 'carga').
+# Si lanza una excepción, la tarea se reintenta con espera exponencial
+# hasta agotar max_intentos; entonces se llama a su función 'al_fallar'.
+
+REGISTRO = {}
+
+# Espera antes del primer reintento; se duplica en cada intento (30s, 60s, 120s...)
+ESPERA_REINTENTO_SEGUNDOS = 30
+
+
+def registrar_tarea(tipo, al_fallar=None):
+    def decorador(funcion):
+        REGISTRO[tipo] = {'funcion': funcion, 'al_fallar': al_fallar}
+        return funcion
+    return decorador
+
+
+# =========================
+# WORKER
+# =========================
+
+# Una tarea 'en_proceso' sin cambios en este tiempo se da por abandonada (el
+# worker murió o se detuvo a la mitad) y vuelve a la cola
+def _minutos_abandono():
+    return getattr(settings, 'MULTICASA_TAREAS_MINUTOS_ABANDONO', 30)
+
+
+# Cada cuánto busca tomar_siguiente tareas abandonadas
+SEGUNDOS_REVISION_ABANDONADAS = 60
+
+_revision = {'ultima': 0.0}
+
+
+def recuperar_abandonadas():
+    """
+    Regresa a 'pendiente' las tareas 'en_proceso' abandonadas (el intento ya se
+    contó al tomarlas); si ya no les quedan intentos, las marca 'fallida'.
+    Regresa cuántas recuperó.
+    """
+    limite = timezone.now() - timedelta(minutes=_minutos_abandono())
+    recuperadas = 0
+    with transaction.atomic():
+        abandonadas = Tarea.objects.select_for_update(skip_locked=True).filter(
+            estado='en_proceso', fecha_actualizacion__lt=limite
+        )
+        for tarea in abandonadas:
+            tarea.ultimo_error = f"Sin terminar después de {_minutos_abandono()} minutos (worker detenido)."
+            if tarea.intentos < tarea.max_intentos:
+                tarea.estado = 'pendiente'
+                tarea.ejecutar_despues = timezone.now()
+            else:
+                tarea.estado = 'fallida'
+                registro = REGISTRO.get(tarea.tipo)
+                if registro and registro['al_fallar']:
+                    registro['al_fallar'](tarea)
+            tarea.save(update_fields=['estado', 'ultimo_error', 'ejecutar_despues', 'fecha_actualizacion'])
+            recuperadas += 1
+    return recuperadas
+
+
+def tomar_siguiente():
+    """
+    Toma la siguiente tarea lista y la marca 'en_proceso'. Con SKIP LOCKED
+    varios workers pueden correr a la vez sin tomar la misma tarea.
+    Cada SEGUNDOS_REVISION_ABANDONADAS devuelve a la cola las abandonadas.
+    """
+    if time.monotonic() - _revision['ultima'] >= SEGUNDOS_REVISION_ABANDONADAS:
+        _revision['ultima'] = time.monotonic()
+        recuperar_abandonadas()
+
+    with transaction.atomic():
+        tarea = (
+            Tarea.objects.select_for_update(skip_locked=True)
+            .filter(estado='pendiente', ejecutar_despues__lte=timezone.now())
+            .order_by('ejecutar_despues', 'pk')
+            .first()
+        )
+        if tarea is None:
+            return None
+        tarea.estado = 'en_proceso'
+        tarea.intentos += 1
+        tarea.save(update_fields=['estado', 'intentos', 'fecha_actualizacion'])
+        return tarea
+
+
+def ejecutar(tarea):
+    """
+    Ejecuta una tarea ya tomada y registra el resultado (o programa el reintento).
+    """
+    registro = REGISTRO.get(tarea.tipo)
+    if registro is None:
+        tarea.estado = 'fallida'
+        tarea.ultimo_error = f"Tipo de tarea desconocido: {tarea.tipo}"
+        tarea.save(update_fields=['estado', 'ultimo_error', 'fecha_actualizacion'])
+        return
+
+    try:
+        registro['funcion'](tarea)
+    except Exception as e:
+        tarea.ultimo_error = f"{type(e).__name__}: {e}"
+        if tarea.intentos < tarea.max_intentos:
+            tarea.estado = 'pendiente'
+            espera = ESPERA_REINTENTO_SEGUNDOS * 2 ** (tarea.intentos - 1)
+            tarea.ejecutar_despues = timezone.now() + timedelta(seconds=espera)
+        else:
+            tarea.estado = 'fallida'
+            if registro['al_fallar']:
+                registro['al_fallar'](tarea)
+        tarea.save(update_fields=['estado', 'ultimo_error', 'ejecutar_despues', 'fecha_actualizacion'])
+        return
+
+    tarea.estado = 'completada'
+    tarea.ultimo_error = ''
+    tarea.save(update_fields=['estado', 'ultimo_error', 'fecha_actualizacion'])
+
+
+# =========================
+# GEOCODIFICACIÓN DE CASAS
+# =========================
+
+def _geocodificacion_fallida(tarea):
+    Casa.objects.filter(pk=tarea.carga.get('id_casa'), estado_geocodificacion='pendiente').update(
+        estado_geocodificacion='fallida'
+    )
+
+
+@registrar_tarea('geocodificar_casa', al_fallar=_geocodificacion_fallida)
+def geocodificar_casa(tarea):
+    casa = Casa.objects.filter(pk=tarea.carga.get('id_casa')).first()
+    if casa is None or not casa.requiere_geocodificacion():
+        # La casa se borró o ya tiene coordenadas capturadas a mano
+        return
+
+    encontrada = casa.geocodificar_automaticamente(lanzar_errores=True)
+    casa.estado_geocodificacion = 'completada' if encontrada else 'fallida'
+    casa.save(update_fields=['latitud', 'longitud', 'estado_geocodificacion', 'fecha_modificacion'])
+
+
+def encolar_geocodificacion_pendiente(tamano_lote=1000):
+    """
+    Encola las casas marcadas como 'pendiente' que no tengan ya una tarea en la cola
+    (p. ej. tras una importación masiva o una migración). Regresa cuántas encoló.
+    """
+    encoladas = 0
+    ids = Casa.objects.filter(estado_geocodificacion='pendiente').order_by('pk').values_list('pk', flat=True)
+    lote = []
+    for id_casa in ids.iterator(chunk_size=tamano_lote):
+        lote.append(id_casa)
+        if len(lote) >= tamano_lote:
+            encoladas += _encolar_geocodificacion_lote(lote)
+            lote = []
+    if lote:
+        encoladas += _encolar_geocodificacion_lote(lote)
+    return encoladas
+
+
+def _encolar_geocodificacion_lote(ids):
+    claves = {id_casa: f'geocodificar_casa:{id_casa}' for id_casa in ids}
+    ya_encoladas = set(
+        Tarea.objects.filter(clave__in=claves.values(), estado__in=['pendiente', 'en_proceso'])
+        .values_list('clave', flat=True)
+    )
+    nuevas = [
+        Tarea(tipo='geocodificar_casa', carga={'id_casa': id_casa}, clave=clave)
+        for id_casa, clave in claves.items()
+        if clave not in ya_encoladas
+    ]
+    Tarea.objects.bulk_create(nuevas)
+    return len(nuevas)
+
+
+# =========================
+# FICHAS TÉCNICAS PDF
+# =========================
+
+# Espera antes de generar la ficha, para juntar varias ediciones seguidas en una sola
+ESPERA_FICHA_SEGUNDOS = 60
+
+
+def encolar_ficha_pdf(id_casa):
+    return Tarea.encolar(
+        'generar_ficha_pdf',
+        {'id_casa': id_casa},
+        clave=f'generar_ficha_pdf:{id_casa}',
+        ejecutar_despues=timezone.now() + timedelta(seconds=ESPERA_FICHA_SEGUNDOS),
+    )
+
+
+@registrar_tarea('generar_ficha_pdf')
+def generar_ficha_pdf(tarea):
+    casa = Casa.objects.filter(pk=tarea.carga.get('id_casa')).first()
+    if casa is None:
+        return
+    if obtener_ficha(casa) is None:
+        raise RuntimeError("xhtml2pdf no pudo generar la ficha")
+
+
+# =========================
+# REPORTES DE VENTAS
+# =========================
+
+def _reporte_fallido(tarea):
+    ReporteVentas.objects.filter(pk=tarea.carga.get('id_reporte')).update(
+        estado='fallido', mensaje="No se pudo generar", error=tarea.ultimo_error, fecha_termino=timezone.now()
+    )
+
+
+@registrar_tarea('generar_reporte_ventas', al_fallar=_reporte_fallido)
+def generar_reporte(tarea):
+    reporte = ReporteVentas.objects.filter(pk=tarea.carga.get('id_reporte')).first()
+    if reporte is None or reporte.estado == 'completado':
+        return
+    generar_reporte_ventas(reporte)
+
+
+@registrar_tarea('reporte_ventas_nocturno')
+def reporte_ventas_nocturno(tarea):
+    # Primero se programa la siguiente noche, para que un fallo no corte la cadena
+    programar_reporte_nocturno()
+    solicitar_reporte_ventas(programado=True)
@@ -0,0 +1,1055 @@
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import requests
+from PIL import Image
+
+from .almacenamiento import obtener_almacen
+from .codigos_postales import buscar_codigo_postal, catalogo_modificado, errores_de_ubicacion
+from .exportacion import filas_catalogo
+from .fichas import directorio_fichas, obtener_ficha
+from .geo import caja_alrededor, cerca_de, dentro_de_caja, distancia_km, leer_caja, leer_centro
+from .geocodificacion import ErrorGeocodificacion, GeocodificadorFalso, geocodificar_con_cache, obtener_geocodificador
+from .mapa import MAXIMO_TESELAS, clusters_de_caja, contar_teselas
+from .models import (
+    Casa, CodigoPostal, GeocodificacionCache, ImagenBase, ImagenCasa, ReporteVentas, ResumenCasas, Tarea, geocodificar_direccion,
+)
+from .paginacion import TAMANO_PAGINA, codificar_cursor
+from .resumen import reconstruir_resumen
+from .tareas import REGISTRO, ejecutar, recuperar_abandonadas, tomar_siguiente
+
+
+# =========================
+# DATOS DE PRUEBA
+# =========================
+
+CACHES_PRUEBA = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-default'},
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-local'},
+}
+
+
+def bytes_imagen(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def crear_casa(numero, **campos):
+    datos = {
+        'titulo': f"Casa número {numero}",
+        'descripcion': "Casa amplia con jardín y cochera.",
+        'precio': Decimal(1000000 + numero * 50000),
+        'direccion': f"Calle {numero}",
+        'municipio': 'Saltillo',
+        'estado': 'Coahuila',
+        'codigo_postal': '25000',
+        'latitud': Decimal('25.42') + Decimal(numero) / 1000,
+        'longitud': Decimal('-101.00'),
+        'estatus': 'en venta',
+        'habitaciones': 3,
+        'banos': 2,
+        'superficie_m2': 120,
+    }
+    datos.update(campos)
+    return Casa.objects.create(**datos)
+
+
+def agregar_imagenes(casa, cantidad):
+    for orden in range(cantidad):
+        imagen = ImagenBase.objects.create(
+            nombre=f"Imagen {casa.pk}-{orden}", tipo_contenido='image/jpeg', imagen_data=bytes_imagen()
+        )
+        ImagenCasa.objects.create(casa=casa, imagen_base=imagen, orden=orden)
+
+
+class PruebaConAlmacen(TestCase):
+    """
+    Almacén de imágenes y cachés aislados para cada clase de pruebas.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directorio = tempfile.mkdtemp()
+        cls.ajustes = override_settings(
+            MULTICASA_ALMACEN_IMAGENES_DIR=cls.directorio,
+            MULTICASA_FICHAS_DIR=cls.directorio,
+            MULTICASA_REPORTES_DIR=cls.directorio,
+            MULTICASA_GEOCODIFICADOR='web.geocodificacion.GeocodificadorFalso',
+            CACHES=CACHES_PRUEBA,
+        )
+        cls.ajustes.enable()
+        obtener_almacen.cache_clear()
+        obtener_geocodificador.cache_clear()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.ajustes.disable()
+        obtener_almacen.cache_clear()
+        obtener_geocodificador.cache_clear()
+        shutil.rmtree(cls.directorio, ignore_errors=True)
+
+    def setUp(self):
+        for alias in CACHES_PRUEBA:
+            caches[alias].clear()
+        # El catálogo de CP vive en memoria del proceso: se recarga de la BD de la prueba
+        catalogo_modificado()
+        # Respuestas del geocodificador falso: cada prueba pone las suyas
+        GeocodificadorFalso.resultados = {}
+        GeocodificadorFalso.direcciones = {}
+        GeocodificadorFalso.llamadas = []
+
+
+# =========================
+# CONSULTAS POR PÁGINA (sin N+1)
+# =========================
+
+class ConsultasFijasTests(PruebaConAlmacen):
+    """
+    El número de consultas no depende de cuántas casas ni cuántas imágenes hay.
+    """
+
+    def llenar(self, casas, imagenes_por_casa):
+        creadas = [crear_casa(numero) for numero in range(casas)]
+        for casa in creadas:
+            agregar_imagenes(casa, imagenes_por_casa)
+        caches['default'].clear()
+        caches['local'].clear()
+        return creadas
+
+    def assertConsultasFijas(self, url, consultas, casas_pocas=2, casas_muchas=8):
+        self.llenar(casas_pocas, 1)
+        with self.assertNumQueries(consultas):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.llenar(casas_muchas - casas_pocas, 3)
+        with self.assertNumQueries(consultas):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_homepage(self):
+        # Casas, imágenes de la página y últimos movimientos
+        self.assertConsultasFijas(reverse('homepage'), 3)
+
+    def test_api_listado(self):
+        # Huella del catálogo (ETag): casas y bajas; luego casas e imágenes
+        self.assertConsultasFijas(reverse('casa_api_list'), 4)
+
+    def test_detalle(self):
+        casa = crear_casa(100)
+        agregar_imagenes(casa, 1)
+        url = reverse('detalle_casa', args=[casa.pk])
+        caches['default'].clear()
+        caches['local'].clear()
+        # Casa, sus imágenes y las casas cercanas
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+        agregar_imagenes(casa, 5)
+        for numero in range(6):
+            crear_casa(200 + numero)
+        caches['default'].clear()
+        caches['local'].clear()
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_api_detalle(self):
+        casa = crear_casa(100)
+        agregar_imagenes(casa, 4)
+        caches['default'].clear()
+        # Casa e imágenes
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(reverse('casa_api_detalle', args=[casa.pk])).status_code, 200)
+
+
+# =========================
+# PAGINACIÓN POR CURSOR
+# =========================
+
+class PaginacionCursorTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        self.casas = [crear_casa(numero) for numero in range(7)]
+
+    def recorrer(self, url, enlace, **parametros):
+        """
+        Sigue los enlaces 'next' (o 'previous') de la API hasta el final.
+        """
+        paginas = []
+        respuesta = self.client.get(url, parametros).json()
+        paginas.append([casa['id_casa'] for casa in respuesta['results']])
+        while respuesta[enlace]:
+            consulta = parse_qs(urlparse(respuesta[enlace]).query)
+            respuesta = self.client.get(url, {clave: valores[0] for clave, valores in consulta.items()}).json()
+            paginas.append([casa['id_casa'] for casa in respuesta['results']])
+        return paginas, respuesta
+
+    def test_ida_y_vuelta_en_la_api(self):
+        url = reverse('casa_api_list')
+        paginas, ultima = self.recorrer(url, 'next', limite=3)
+        ids = [id_casa for pagina in paginas for id_casa in pagina]
+
+        # Más recientes primero, sin repetir ni saltar casas
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertEqual(sorted(ids), sorted(casa.pk for casa in self.casas))
+        self.assertEqual(len(ids), len(set(ids)))
+
+        # Desde la última página, 'previous' regresa las mismas páginas en orden inverso
+        consulta = parse_qs(urlparse(ultima['previous']).query)
+        regreso, _ = self.recorrer(url, 'previous', **{clave: valores[0] for clave, valores in consulta.items()})
+        self.assertEqual(regreso, paginas[-2::-1])
+
+    def test_los_filtros_se_conservan_en_los_enlaces(self):
+        crear_casa(50, habitaciones=5)
+        crear_casa(51, habitaciones=5)
+        paginas, _ = self.recorrer(reverse('casa_api_list'), 'next', limite=1, habitaciones=5)
+        self.assertEqual(len(paginas), 2)
+
+    def test_homepage_pagina_con_cursor(self):
+        # Más casas que una página de la homepage (TAMANO_PAGINA)
+        for numero in range(10, 20):
+            crear_casa(numero)
+        url = reverse('homepage')
+        respuesta = self.client.get(url)
+        primera = [casa.pk for casa in respuesta.context['lista_casas']]
+        self.assertEqual(len(primera), TAMANO_PAGINA)
+
+        siguiente = self.client.get(url + respuesta.context['url_pagina_siguiente'])
+        segunda = [casa.pk for casa in siguiente.context['lista_casas']]
+        self.assertEqual(len(segunda), 17 - TAMANO_PAGINA)
+        self.assertFalse(set(primera) & set(segunda))
+        self.assertIsNone(siguiente.context['url_pagina_siguiente'])
+
+        anterior = self.client.get(url + siguiente.context['url_pagina_anterior'])
+        self.assertEqual([casa.pk for casa in anterior.context['lista_casas']], primera)
+
+    def test_cursor_invalido_regresa_la_primera_pagina(self):
+        url = reverse('casa_api_list')
+        primera = self.client.get(url, {'limite': 3}).json()
+        # Basura, valores de otro tipo que los campos del orden y cantidad equivocada
+        for cursor in ('no-es-un-cursor', codificar_cursor(['abc', 1]), codificar_cursor([1])):
+            with self.subTest(cursor=cursor):
+                respuesta = self.client.get(url, {'limite': 3, 'despues': cursor})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(respuesta.json()['results'], primera['results'])
+                self.assertIsNone(respuesta.json()['previous'])
+
+    def test_cursor_con_tipos_equivocados_en_la_homepage(self):
+        for parametros in ({'antes': codificar_cursor(['abc', 'x'])}, {'q': 'jardín', 'despues': codificar_cursor(['abc', 1])}):
+            with self.subTest(parametros=parametros):
+                respuesta = self.client.get(reverse('homepage'), parametros)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertIsNone(respuesta.context['url_pagina_anterior'])
+
+
+# =========================
+# FILTROS DEL BUSCADOR Y DE LA API
+# =========================
+
+class FiltrosTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        self.barata = crear_casa(1, precio=Decimal('900000'), habitaciones=2)
+        self.cara = crear_casa(2, precio=Decimal('5000000'), habitaciones=4)
+
+    def ids_api(self, **parametros):
+        respuesta = self.client.get(reverse('casa_api_list'), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return {casa['id_casa'] for casa in respuesta.json()['results']}
+
+    def test_filtros_numericos(self):
+        self.assertEqual(self.ids_api(min_precio='1000000'), {self.cara.pk})
+        self.assertEqual(self.ids_api(max_precio='1000000'), {self.barata.pk})
+        self.assertEqual(self.ids_api(habitaciones='2'), {self.barata.pk})
+
+    def test_numeros_invalidos_se_ignoran(self):
+        todas = {self.barata.pk, self.cara.pk}
+        for valor in ('nan', 'NaN', 'inf', '-Infinity', 'abc', ''):
+            with self.subTest(valor=valor):
+                self.assertEqual(self.ids_api(min_precio=valor, max_precio=valor, habitaciones=valor), todas)
+                respuesta = self.client.get(reverse('homepage'), {'min_precio': valor, 'lat': valor, 'lng': valor})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(len(respuesta.context['lista_casas']), 2)
+
+    def test_campos_seleccionados(self):
+        respuesta = self.client.get(reverse('casa_api_list'), {'fields': 'id_casa,precio'})
+        self.assertEqual(set(respuesta.json()['results'][0]), {'id_casa', 'precio'})
+        self.assertEqual(self.client.get(reverse('casa_api_list'), {'fields': 'no_existe'}).status_code, 400)
+
+
+# =========================
+# COLA DE TAREAS Y GEOCODIFICACIÓN EN SEGUNDO PLANO
+# =========================
+
+class ColaTareasTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        self.fallidas = []
+        registro = {
+            'prueba_falla': {'funcion': self.fallar, 'al_fallar': self.fallidas.append},
+            'prueba_ok': {'funcion': lambda tarea: None, 'al_fallar': None},
+        }
+        parche = mock.patch.dict(REGISTRO, registro)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def fallar(self, tarea):
+        raise RuntimeError("servicio caído")
+
+    def correr(self):
+        tarea = tomar_siguiente()
+        self.assertIsNotNone(tarea)
+        ejecutar(tarea)
+        tarea.refresh_from_db()
+        return tarea
+
+    def test_reintentos_con_espera_exponencial(self):
+        Tarea.encolar('prueba_falla', max_intentos=3)
+        for intento, espera in ((1, 30), (2, 60)):
+            antes = timezone.now()
+            tarea = self.correr()
+            self.assertEqual((tarea.estado, tarea.intentos), ('pendiente', intento))
+            self.assertIn("RuntimeError: servicio caído", tarea.ultimo_error)
+            self.assertAlmostEqual((tarea.ejecutar_despues - antes).total_seconds(), espera, delta=5)
+            # Todavía no le toca
+            self.assertIsNone(tomar_siguiente())
+            Tarea.objects.filter(pk=tarea.pk).update(ejecutar_despues=timezone.now())
+
+        tarea = self.correr()
+        self.assertEqual((tarea.estado, tarea.intentos), ('fallida', 3))
+        self.assertEqual([fallida.pk for fallida in self.fallidas], [tarea.pk])
+
+    def test_tarea_exitosa_y_tipo_desconocido(self):
+        Tarea.encolar('prueba_ok')
+        self.assertEqual(self.correr().estado, 'completada')
+        Tarea.encolar('no_registrada')
+        self.assertEqual(self.correr().estado, 'fallida')
+
+    def test_misma_clave_no_se_duplica(self):
+        primera = Tarea.encolar('prueba_ok', clave='unica')
+        self.assertEqual(Tarea.encolar('prueba_ok', clave='unica').pk, primera.pk)
+
+    def test_recuperar_abandonadas(self):
+        con_intentos = Tarea.objects.create(tipo='prueba_falla', estado='en_proceso', intentos=1, max_intentos=3)
+        agotada = Tarea.objects.create(tipo='prueba_falla', estado='en_proceso', intentos=3, max_intentos=3)
+        reciente = Tarea.objects.create(tipo='prueba_falla', estado='en_proceso', intentos=1, max_intentos=3)
+        Tarea.objects.filter(pk__in=[con_intentos.pk, agotada.pk]).update(
+            fecha_actualizacion=timezone.now() - timedelta(hours=2)
+        )
+
+        self.assertEqual(recuperar_abandonadas(), 2)
+        for tarea in (con_intentos, agotada, reciente):
+            tarea.refresh_from_db()
+        self.assertEqual(con_intentos.estado, 'pendiente')
+        self.assertEqual(agotada.estado, 'fallida')
+        self.assertEqual([fallida.pk for fallida in self.fallidas], [agotada.pk])
+        self.assertEqual(reciente.estado, 'en_proceso')
+
+    def test_geocodificacion_en_segundo_plano(self):
+        casa = crear_casa(1, latitud=None, longitud=None)
+        self.assertEqual(casa.estado_geocodificacion, 'pendiente')
+        GeocodificadorFalso.resultados = {"Calle 1, Saltillo, Coahuila, 25000, México": (25.43, -101.0)}
+
+        tarea = self.correr()
+        self.assertEqual((tarea.tipo, tarea.estado), ('geocodificar_casa', 'completada'))
+        casa.refresh_from_db()
+        self.assertEqual(casa.estado_geocodificacion, 'completada')
+        self.assertAlmostEqual(float(casa.latitud), 25.43)
+
+    def test_geocodificacion_reintenta_si_el_servicio_falla(self):
+        casa = crear_casa(1, latitud=None, longitud=None)
+        with mock.patch.object(GeocodificadorFalso, 'geocodificar', side_effect=ErrorGeocodificacion("timeout")):
+            tarea = self.correr()
+        self.assertEqual((tarea.estado, tarea.intentos), ('pendiente', 1))
+        casa.refresh_from_db()
+        self.assertEqual(casa.estado_geocodificacion, 'pendiente')
+        self.assertIsNone(casa.latitud)
+
+
+# =========================
+# CACHÉ PERSISTENTE DE GEOCODIFICACIÓN
+# =========================
+
+class CacheGeocodificacionTests(PruebaConAlmacen):
+
+    def test_la_misma_direccion_normalizada_no_vuelve_a_la_red(self):
+        GeocodificadorFalso.resultados = {"Calle Hidalgo 5, Saltillo, México": (25.4, -101.0)}
+        self.assertEqual(geocodificar_con_cache("Calle Hidalgo 5, Saltillo, México"), (25.4, -101.0))
+        # Otra forma de escribirla: mismo renglón de la caché
+        self.assertEqual(geocodificar_con_cache("calle hidalgo 5,  SALTILLO, Mexico"), (25.4, -101.0))
+        self.assertEqual(len(GeocodificadorFalso.llamadas), 1)
+        self.assertEqual(GeocodificacionCache.objects.get().aciertos, 1)
+
+    def test_resultados_negativos_caducan_antes(self):
+        self.assertEqual(geocodificar_con_cache("Calle Inexistente, México"), (None, None))
+        self.assertEqual(geocodificar_con_cache("Calle Inexistente, México"), (None, None))
+        self.assertEqual(len(GeocodificadorFalso.llamadas), 1)
+
+        # Después de MULTICASA_GEOCACHE_DIAS_NEGATIVOS se vuelve a preguntar
+        GeocodificacionCache.objects.update(fecha_consulta=timezone.now() - timedelta(days=8))
+        geocodificar_con_cache("Calle Inexistente, México")
+        self.assertEqual(len(GeocodificadorFalso.llamadas), 2)
+
+    def test_los_errores_no_se_guardan(self):
+        with mock.patch.object(GeocodificadorFalso, 'geocodificar', side_effect=ErrorGeocodificacion("timeout")):
+            with self.assertRaises(ErrorGeocodificacion):
+                geocodificar_con_cache("Calle Hidalgo 5, Saltillo, México")
+        self.assertFalse(GeocodificacionCache.objects.exists())
+
+
+# =========================
+# IMPORTACIÓN MASIVA (importar_casas)
+# =========================
+
+class ImportarCasasTests(PruebaConAlmacen):
+
+    fila = {
+        'titulo': "Casa importada", 'descripcion': "Casa de prueba.", 'precio': '1500000',
+        'direccion': "Calle Juárez 10", 'municipio': 'Saltillo', 'estado': 'Coahuila',
+        'codigo_postal': '25000', 'estatus': 'en venta', 'habitaciones': 3, 'banos': 2,
+    }
+
+    def importar(self, nombre, contenido):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command('importar_casas', ruta, stdout=salida, stderr=errores)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_jsonl_con_lineas_que_no_son_objetos(self):
+        lineas = [json.dumps(self.fila), '[1, 2]', '"x"', '3', json.dumps({**self.fila, 'precio': '-5'})]
+        salida, errores = self.importar('casas.jsonl', "\n".join(lineas))
+
+        self.assertIn("5 filas leídas, 1 casas importadas, 4 filas con errores", salida)
+        for numero in (2, 3, 4):
+            self.assertIn(f"Fila {numero}: se esperaba un objeto JSON", errores)
+        self.assertIn("Fila 5: precio", errores)
+        casa = Casa.objects.get()
+        # Sin coordenadas: queda en la cola de geocodificación
+        self.assertEqual(casa.estado_geocodificacion, 'pendiente')
+        self.assertTrue(Tarea.objects.filter(clave=f'geocodificar_casa:{casa.pk}').exists())
+
+    def test_csv(self):
+        columnas = list(self.fila)
+        contenido = ",".join(columnas) + "\n" + ",".join(str(self.fila[campo]) for campo in columnas) + "\n"
+        salida, _ = self.importar('casas.csv', contenido)
+        self.assertIn("1 casas importadas", salida)
+        self.assertEqual(Casa.objects.get().estado_normalizado, 'coahuila')
+
+
+# =========================
+# EXPORTACIÓN DEL CATÁLOGO
+# =========================
+
+class ExportacionTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        self.casas = [crear_casa(numero) for numero in range(5)]
+        agregar_imagenes(self.casas[0], 2)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+
+    def descargar(self, formato, **parametros):
+        respuesta = self.client.get(reverse('exportar_catalogo', args=[formato]), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return b''.join(respuesta.streaming_content)
+
+    def test_lotes_por_id_cubren_todas_las_casas(self):
+        filas = list(filas_catalogo(incluir_portada=True, tamano_lote=2))
+        self.assertEqual([fila['id_casa'] for fila in filas], sorted(casa.pk for casa in self.casas))
+        self.assertIn(f'/imagen/{self.casas[0].imagenes.first().imagen_base_id}/', filas[0]['portada'])
+        self.assertEqual(filas[1]['portada'], '')
+
+    def test_csv_y_jsonl(self):
+        csv_texto = self.descargar('csv', estado='Coahuila').decode('utf-8-sig')
+        self.assertEqual(len(csv_texto.strip().splitlines()), 6)
+        self.assertTrue(csv_texto.startswith('id_casa,titulo,precio'))
+
+        lineas = self.descargar('jsonl', portada='1').decode('utf-8').splitlines()
+        self.assertEqual(len(lineas), 5)
+        self.assertIn('portada', json.loads(lineas[0]))
+
+    def test_xlsx_sin_openpyxl(self):
+        with mock.patch.dict(sys.modules, {'openpyxl': None}):
+            respuesta = self.client.get(reverse('exportar_catalogo', args=['xlsx']))
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_xlsx(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest("openpyxl no está instalado")
+        respuesta = self.client.get(reverse('exportar_catalogo', args=['xlsx']))
+        self.assertEqual(respuesta.status_code, 200)
+        hoja = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content))).active
+        self.assertEqual(hoja.max_row, 6)
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('exportar_catalogo', args=['csv'])).status_code, 302)
+
+
+# =========================
+# FICHAS TÉCNICAS PDF EN CACHÉ
+# =========================
+
+class FichasPdfTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        self.casa = crear_casa(1)
+        agregar_imagenes(self.casa, 1)
+
+    def test_guardar_encola_una_sola_ficha_con_espera(self):
+        self.casa.save()
+        self.casa.save()
+        tareas = Tarea.objects.filter(tipo='generar_ficha_pdf', clave=f'generar_ficha_pdf:{self.casa.pk}')
+        self.assertEqual(tareas.count(), 1)
+        self.assertGreater(tareas.get().ejecutar_despues, timezone.now() + timedelta(seconds=30))
+
+    def test_la_ficha_se_genera_una_vez_por_version(self):
+        with mock.patch('web.fichas.renderizar_ficha', return_value=b'%PDF-1.4 prueba') as renderizar:
+            ruta = obtener_ficha(self.casa)
+            self.assertEqual(obtener_ficha(self.casa), ruta)
+            self.assertEqual(renderizar.call_count, 1)
+
+            # Cambia un dato de la ficha: otra huella, otro PDF y el anterior se borra
+            self.casa.precio = Decimal('2750000')
+            self.casa.save()
+            nueva = obtener_ficha(self.casa)
+            self.assertEqual(renderizar.call_count, 2)
+        self.assertNotEqual(nueva, ruta)
+        self.assertEqual(os.listdir(directorio_fichas(self.casa.pk)), [os.path.basename(nueva)])
+
+    def test_descarga_con_etag(self):
+        url = reverse('generar_pdf_casa', args=[self.casa.pk])
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+        self.casa.titulo = "Otro título"
+        self.casa.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200)
+
+    def test_borrar_la_casa_borra_sus_fichas(self):
+        with mock.patch('web.fichas.renderizar_ficha', return_value=b'%PDF-1.4 prueba'):
+            obtener_ficha(self.casa)
+        directorio = directorio_fichas(self.casa.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.casa.delete()
+        self.assertFalse(os.path.exists(directorio))
+
+
+# =========================
+# REPORTE DE VENTAS EN SEGUNDO PLANO
+# =========================
+
+class ReporteVentasTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        crear_casa(1)
+        crear_casa(2, estatus='vendida')
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+
+    def estado(self, reporte):
+        return self.client.get(reverse('reporte_ventas_estado', args=[reporte.pk])).json()
+
+    def procesar(self):
+        while True:
+            tarea = tomar_siguiente()
+            if tarea is None:
+                return
+            ejecutar(tarea)
+            # Los reintentos esperan: en la prueba se adelantan
+            Tarea.objects.filter(tipo='generar_reporte_ventas', estado='pendiente').update(ejecutar_despues=timezone.now())
+
+    def test_ciclo_completo(self):
+        respuesta = self.client.post(reverse('reporte_ventas_pdf'))
+        self.assertRedirects(respuesta, reverse('reporte_ventas_pdf'))
+        # Un segundo clic no encola otro reporte
+        self.client.post(reverse('reporte_ventas_pdf'))
+        reporte = ReporteVentas.objects.get()
+        self.assertEqual(self.estado(reporte)['estado'], 'pendiente')
+        self.assertIsNone(self.estado(reporte)['url_descarga'])
+
+        self.procesar()
+        estado = self.estado(reporte)
+        self.assertEqual((estado['estado'], estado['progreso']), ('completado', 100))
+        descarga = self.client.get(estado['url_descarga'])
+        self.assertEqual(descarga['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(descarga.streaming_content).startswith(b'%PDF'))
+
+    def test_falla_despues_de_los_reintentos(self):
+        self.client.post(reverse('reporte_ventas_pdf'))
+        with mock.patch('web.reportes.contexto_reporte_ventas', side_effect=RuntimeError("sin datos")):
+            self.procesar()
+        reporte = ReporteVentas.objects.get()
+        self.assertEqual(reporte.estado, 'fallido')
+        self.assertIn("sin datos", reporte.error)
+        self.assertEqual(Tarea.objects.get(tipo='generar_reporte_ventas').intentos, 3)
+        self.assertEqual(
+            self.client.get(reverse('reporte_ventas_descargar', args=[reporte.pk])).status_code, 404
+        )
+
+
+# =========================
+# RESUMEN DE CASAS: INCREMENTAL = RECONSTRUIDO
+# =========================
+
+class ResumenCasasTests(PruebaConAlmacen):
+
+    def renglones(self):
+        campos = [
+            'estado', 'municipio', 'estatus', 'rango', 'cantidad', 'suma_precio', 'precio_minimo',
+            'precio_maximo', 'cantidad_con_superficie', 'suma_superficie', 'suma_precio_con_superficie',
+        ]
+        return sorted(
+            tuple(fila[campo] for campo in campos)
+            for fila in ResumenCasas.objects.filter(cantidad__gt=0).values(*campos)
+        )
+
+    def test_incremental_igual_a_reconstruir(self):
+        casas = [crear_casa(numero) for numero in range(6)]
+        crear_casa(10, municipio='Monterrey', estado='Nuevo León', codigo_postal='64000', superficie_m2=None)
+
+        # Cambios que mueven la casa de renglón (precio, estatus, ubicación) y bajas
+        casas[0].precio = Decimal('4500000')
+        casas[0].save()
+        casas[1].estatus = 'vendida'
+        casas[1].save()
+        casas[2].municipio, casas[2].estado = 'Zapopan', 'Jalisco'
+        casas[2].save()
+        casas[3].superficie_m2 = 300
+        casas[3].save()
+        casas[4].delete()
+        # La más cara de su renglón: el máximo se recalcula
+        casas[5].delete()
+
+        incremental = self.renglones()
+        reconstruir_resumen()
+        self.assertEqual(incremental, self.renglones())
+
+
+# =========================
+# BÚSQUEDA POR RADIO Y POR VENTANA DEL MAPA
+# =========================
+
+class BusquedaGeograficaTests(PruebaConAlmacen):
+
+    centro = (25.4232, -101.0053)
+
+    def setUp(self):
+        super().setUp()
+        # ~0 km, ~5.5 km y ~22 km al norte del centro
+        self.cerca = crear_casa(1, latitud=Decimal('25.4232'), longitud=Decimal('-101.0053'))
+        self.media = crear_casa(2, latitud=Decimal('25.4732'), longitud=Decimal('-101.0053'))
+        self.lejos = crear_casa(3, latitud=Decimal('25.6232'), longitud=Decimal('-101.0053'))
+
+    def test_radio_ordenado_por_distancia(self):
+        casas = list(cerca_de(Casa.objects.all(), *self.centro, 10).order_by('distancia'))
+        self.assertEqual([casa.pk for casa in casas], [self.cerca.pk, self.media.pk])
+        esperada = distancia_km(*self.centro, self.media.latitud, self.media.longitud)
+        self.assertAlmostEqual(casas[1].distancia, esperada, places=2)
+
+    def test_radio_con_maximo(self):
+        with self.settings(MULTICASA_RADIO_MAXIMO_KM=15):
+            self.assertEqual(cerca_de(Casa.objects.all(), *self.centro, 500).count(), 2)
+            self.assertEqual(leer_centro({'lat': '25.4', 'lng': '-101', 'radio_km': '500'})[2], 15)
+
+    def test_api_pagina_por_distancia(self):
+        parametros = {'lat': self.centro[0], 'lng': self.centro[1], 'radio_km': 50, 'limite': 1}
+        vistas = []
+        respuesta = self.client.get(reverse('casa_api_list'), parametros).json()
+        while True:
+            vistas += [casa['id_casa'] for casa in respuesta['results']]
+            if not respuesta['next']:
+                break
+            consulta = parse_qs(urlparse(respuesta['next']).query)
+            respuesta = self.client.get(reverse('casa_api_list'), {k: v[0] for k, v in consulta.items()}).json()
+        self.assertEqual(vistas, [self.cerca.pk, self.media.pk, self.lejos.pk])
+
+    def test_ventana_del_mapa(self):
+        caja = leer_caja({'bbox': '-101.1,25.4,-100.9,25.5'})
+        self.assertEqual(
+            set(dentro_de_caja(Casa.objects.all(), *caja).values_list('pk', flat=True)), {self.cerca.pk, self.media.pk}
+        )
+        for invalida in ('', '1,2,3', 'a,b,c,d', '-101,26,-100,25', 'nan,25,-100,26'):
+            with self.subTest(bbox=invalida):
+                self.assertIsNone(leer_caja({'bbox': invalida}))
+
+    def test_antimeridiano(self):
+        este = crear_casa(10, latitud=Decimal('0.5'), longitud=Decimal('179.9'))
+        oeste = crear_casa(11, latitud=Decimal('0.5'), longitud=Decimal('-179.9'))
+        caja = leer_caja({'bbox': '179,-1,-179,1'})
+        self.assertEqual(set(dentro_de_caja(Casa.objects.all(), *caja).values_list('pk', flat=True)), {este.pk, oeste.pk})
+
+        sur, izquierda, norte, derecha = caja_alrededor(0.5, 179.95, 30)
+        self.assertGreater(izquierda, derecha)
+        self.assertEqual(cerca_de(Casa.objects.all(), 0.5, 179.95, 30).count(), 2)
+
+
+# =========================
+# CLUSTERS DEL MAPA
+# =========================
+
+class MapaClustersTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        # Tres casas a unos cientos de metros entre sí, una vendida y una lejos
+        self.grupo = [
+            crear_casa(numero, latitud=Decimal('25.4232') + Decimal(numero) / 1000, longitud=Decimal('-101.0053'))
+            for numero in range(3)
+        ]
+        crear_casa(5, latitud=Decimal('25.4250'), longitud=Decimal('-101.0060'), estatus='vendida')
+        self.lejana = crear_casa(6, latitud=Decimal('20.6767'), longitud=Decimal('-103.3475'))
+
+    def clusters(self, **parametros):
+        respuesta = self.client.get(reverse('mapa_clusters'), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_agrupa_segun_el_zoom(self):
+        datos = self.clusters(zoom=6, bbox='-106,18,-98,28')
+        cantidades = sorted(feature['properties']['cantidad'] for feature in datos['features'])
+        # Las vendidas no aparecen
+        self.assertEqual(cantidades, [1, 3])
+        sola = next(f['properties'] for f in datos['features'] if f['properties']['cantidad'] == 1)
+        self.assertEqual(sola['id_casa'], self.lejana.pk)
+
+        cerca = self.clusters(zoom=18, bbox='-101.01,25.42,-101.00,25.43')
+        self.assertEqual(sum(f['properties']['cantidad'] for f in cerca['features']), 3)
+        self.assertGreater(len(cerca['features']), 1)
+
+    def test_caja_enorme_baja_el_zoom(self):
+        datos = self.clusters(zoom=20, bbox='-180,-85,180,85')
+        self.assertLessEqual(contar_teselas(datos['zoom'], -85, -180, 85, 180), MAXIMO_TESELAS)
+        self.assertEqual(sum(f['properties']['cantidad'] for f in datos['features']), 4)
+
+    def test_antimeridiano(self):
+        crear_casa(10, latitud=Decimal('-17.7'), longitud=Decimal('179.9'))
+        crear_casa(11, latitud=Decimal('-17.7'), longitud=Decimal('-179.9'))
+        datos = self.clusters(zoom=5, bbox='170,-25,-170,-10')
+        self.assertEqual(sum(f['properties']['cantidad'] for f in datos['features']), 2)
+
+    def test_teselas_en_cache_hasta_que_cambia_una_casa(self):
+        caja = (18, -106, 28, -98)
+        with self.captureOnCommitCallbacks(execute=True):
+            clusters_de_caja(6, *caja)
+        with self.assertNumQueries(0):
+            clusters_de_caja(6, *caja)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_casa(20, latitud=Decimal('25.4300'), longitud=Decimal('-101.0053'))
+        _, clusters = clusters_de_caja(6, *caja)
+        self.assertEqual(sum(cluster['cantidad'] for cluster in clusters), 5)
+
+    def test_parametros_invalidos(self):
+        url = reverse('mapa_clusters')
+        self.assertEqual(self.client.get(url, {'zoom': 5}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'zoom': 'x', 'bbox': '-106,18,-98,28'}).status_code, 400)
+
+
+# =========================
+# PROXY DE GEOCODIFICACIÓN (/geo/search y /geo/reverse)
+# =========================
+
+def respuesta_nominatim(status_code=200, datos=None, error_json=None):
+    respuesta = mock.Mock(status_code=status_code)
+    respuesta.json.side_effect = error_json
+    respuesta.json.return_value = datos
+    return respuesta
+
+
+@override_settings(
+    MULTICASA_GEOCODIFICADOR='web.geocodificacion.GeocodificadorNominatim', MULTICASA_NOMINATIM_INTERVALO=0
+)
+class ProxyGeocodificacionTests(PruebaConAlmacen):
+    """
+    Usa el geocodificador de Nominatim con requests.get simulado: nunca sale a la red.
+    """
+
+    def setUp(self):
+        super().setUp()
+        obtener_geocodificador.cache_clear()
+        self.addCleanup(obtener_geocodificador.cache_clear)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+
+    def buscar(self, respuesta_http, q="Calle Hidalgo 5, Saltillo"):
+        with mock.patch('web.geocodificacion.requests.get', **respuesta_http) as get:
+            return self.client.get(reverse('geo_buscar'), {'q': q}), get
+
+    def test_busqueda_y_cache(self):
+        datos = [{'lat': '25.42', 'lon': '-101.0', 'address': {'city': 'Saltillo'}}]
+        respuesta, get = self.buscar({'return_value': respuesta_nominatim(datos=datos)})
+        self.assertEqual(respuesta.json(), [{'lat': 25.42, 'lon': -101.0, 'address': {'city': 'Saltillo'}}])
+        self.assertEqual(get.call_args.kwargs['params']['countrycodes'], 'mx')
+
+        # La misma consulta ya no sale a Nominatim
+        respuesta, get = self.buscar({'side_effect': AssertionError("no debe llamarse")})
+        self.assertEqual(respuesta.status_code, 200)
+        get.assert_not_called()
+
+    def test_errores_del_servicio_son_503(self):
+        casos = {
+            'no_json': {'return_value': respuesta_nominatim(error_json=ValueError("Expecting value"))},
+            'http_500': {'return_value': respuesta_nominatim(status_code=500)},
+            'sin_red': {'side_effect': requests.ConnectionError("sin red")},
+        }
+        for nombre, respuesta_http in casos.items():
+            with self.subTest(nombre):
+                caches['default'].clear()
+                respuesta, _ = self.buscar(respuesta_http)
+                self.assertEqual(respuesta.status_code, 503)
+                self.assertEqual(respuesta['Retry-After'], '2')
+                self.assertIn('error', respuesta.json())
+
+    def test_respuesta_no_json_al_guardar_una_casa(self):
+        with mock.patch('web.geocodificacion.requests.get', return_value=respuesta_nominatim(error_json=ValueError())):
+            self.assertEqual(geocodificar_direccion("Calle 1", 'Saltillo', 'Coahuila', ''), (None, None))
+            with self.assertRaises(ErrorGeocodificacion):
+                caches['default'].clear()
+                geocodificar_direccion("Calle 1", 'Saltillo', 'Coahuila', '', lanzar_errores=True)
+
+    def test_inverso(self):
+        url = reverse('geo_inverso')
+        direccion = {'road': 'Calle Hidalgo', 'country_code': 'mx'}
+        with mock.patch('web.geocodificacion.requests.get', return_value=respuesta_nominatim(datos={'address': direccion})) as get:
+            respuesta = self.client.get(url, {'lat': '25.4232', 'lon': '-101.0053'})
+        self.assertEqual(respuesta.json(), {'address': direccion})
+        self.assertEqual(get.call_args.kwargs['params']['countrycodes'], 'mx')
+
+        # Fuera de México no hay dirección
+        caches['default'].clear()
+        fuera = {'address': {'road': 'Main St', 'country_code': 'us'}}
+        with mock.patch('web.geocodificacion.requests.get', return_value=respuesta_nominatim(datos=fuera)):
+            self.assertEqual(self.client.get(url, {'lat': '29.76', 'lon': '-95.36'}).json(), {'address': {}})
+
+    def test_parametros_invalidos_y_sesion(self):
+        self.assertEqual(self.client.get(reverse('geo_buscar')).status_code, 400)
+        for parametros in ({'lat': 'x', 'lon': '1'}, {'lat': '95', 'lon': '1'}, {'lat': 'nan', 'lon': '1'}):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(reverse('geo_inverso'), parametros).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('geo_buscar'), {'q': 'x'}).status_code, 302)
+
+
+# =========================
+# CATÁLOGO LOCAL DE CÓDIGOS POSTALES
+# =========================
+
+SEPOMEX_PRUEBA = (
+    "El Catálogo Nacional de Códigos Postales es elaborado por Correos de México.\n"
+    "d_codigo|d_asenta|d_tipo_asenta|D_mnpio|d_estado|d_ciudad|d_CP|c_estado\n"
+    "25000|Zona Centro|Colonia|Saltillo|Coahuila de Zaragoza|Saltillo|25001|05\n"
+    "25000|República|Colonia|Saltillo|Coahuila de Zaragoza|Saltillo|25001|05\n"
+    "64000|Monterrey Centro|Colonia|Monterrey|Nuevo León|Monterrey|64001|19\n"
+)
+
+GEONAMES_PRUEBA = (
+    "MX\t25000\tZona Centro\tCoahuila\t05\tSaltillo\t030\t\t\t25.42\t-101.00\t4\n"
+    "MX\t25000\tRepública\tCoahuila\t05\tSaltillo\t030\t\t\t25.44\t-101.02\t4\n"
+)
+
+
+class CodigosPostalesTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        sepomex = os.path.join(self.directorio, 'CPdescarga.txt')
+        with open(sepomex, 'w', encoding='latin-1') as archivo:
+            archivo.write(SEPOMEX_PRUEBA)
+        geonames = os.path.join(self.directorio, 'MX.txt')
+        with open(geonames, 'w', encoding='utf-8') as archivo:
+            archivo.write(GEONAMES_PRUEBA)
+        call_command('importar_codigos_postales', sepomex, geonames, stdout=io.StringIO())
+
+    def test_importacion_combina_sepomex_y_geonames(self):
+        saltillo = CodigoPostal.objects.get(codigo='25000')
+        # Nombres de SEPOMEX, centroide promedio de GeoNames
+        self.assertEqual((saltillo.estado, saltillo.municipio, saltillo.asentamientos), ('Coahuila de Zaragoza', 'Saltillo', 2))
+        self.assertAlmostEqual(float(saltillo.latitud), 25.43)
+        self.assertIsNone(CodigoPostal.objects.get(codigo='64000').latitud)
+
+    def test_busqueda_en_memoria(self):
+        buscar_codigo_postal('25000')
+        with self.assertNumQueries(0):
+            self.assertEqual(buscar_codigo_postal('25000').municipio, 'Saltillo')
+            self.assertIsNone(buscar_codigo_postal('99999'))
+
+    def test_validacion_de_ubicacion(self):
+        self.assertEqual(errores_de_ubicacion('25000', 'Coahuila', 'saltillo'), {})
+        self.assertEqual(set(errores_de_ubicacion('25000', 'Jalisco', 'Zapopan')), {'estado', 'municipio'})
+        # CP fuera del catálogo: no se puede validar
+        self.assertEqual(errores_de_ubicacion('99999', 'Jalisco', 'Zapopan'), {})
+
+    def test_el_cp_es_el_primer_nivel_de_geocodificacion(self):
+        # Sin calle: el centroide, sin red
+        self.assertEqual(geocodificar_direccion('', 'Saltillo', 'Coahuila', '25000'), (25.43, -101.01))
+        self.assertEqual(GeocodificadorFalso.llamadas, [])
+
+        # Con calle: la red refina; si no encuentra la calle, queda el centroide
+        GeocodificadorFalso.resultados = {"Calle 1, Saltillo, Coahuila, 25000, México": (25.4251, -101.0001)}
+        self.assertEqual(geocodificar_direccion('Calle 1', 'Saltillo', 'Coahuila', '25000'), (25.4251, -101.0001))
+        self.assertEqual(geocodificar_direccion('Calle 2', 'Saltillo', 'Coahuila', '25000'), (25.43, -101.01))
+
+        # Si el servicio falla, el centroide; la cola prefiere reintentar
+        with mock.patch.object(GeocodificadorFalso, 'geocodificar', side_effect=ErrorGeocodificacion("timeout")):
+            self.assertEqual(geocodificar_direccion('Calle 3', 'Saltillo', 'Coahuila', '25000'), (25.43, -101.01))
+            with self.assertRaises(ErrorGeocodificacion):
+                geocodificar_direccion('Calle 3', 'Saltillo', 'Coahuila', '25000', lanzar_errores=True)
+
+    def test_api(self):
+        respuesta = self.client.get(reverse('codigo_postal_detalle', args=['25000']))
+        self.assertEqual(respuesta.json()['municipio'], 'Saltillo')
+        self.assertEqual(self.client.get(reverse('codigo_postal_detalle', args=['99999'])).status_code, 404)
+
+    def test_reimportar_recarga_el_catalogo(self):
+        self.assertIsNotNone(buscar_codigo_postal('64000'))
+        sepomex = os.path.join(self.directorio, 'solo_saltillo.txt')
+        with open(sepomex, 'w', encoding='latin-1') as archivo:
+            archivo.write(SEPOMEX_PRUEBA.rsplit('64000', 1)[0])
+        call_command('importar_codigos_postales', sepomex, stdout=io.StringIO())
+        self.assertIsNone(buscar_codigo_postal('64000'))
+
+
+# =========================
+# CACHÉ DE PÁGINAS PÚBLICAS
+# =========================
+
+class CachePaginasTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        self.casa = crear_casa(1)
+        self.otra = crear_casa(2)
+
+    def get(self, url):
+        # Las invalidaciones corren en on_commit: aquí se ejecutan al momento
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url)
+
+    def guardar(self, objeto):
+        with self.captureOnCommitCallbacks(execute=True):
+            objeto.save()
+
+    def get_api(self, url, host, secure):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url, {'limite': 2}, HTTP_HOST=host, secure=secure)
+
+    def test_segunda_peticion_sale_de_la_cache(self):
+        self.assertEqual(self.get('/?estado=Coahuila&q=')['X-Cache'], 'MISS')
+        self.assertEqual(self.get('/?q=&estado=Coahuila')['X-Cache'], 'HIT')
+
+    def test_guardar_una_casa_invalida_listado_y_su_detalle(self):
+        detalle = reverse('detalle_casa', args=[self.casa.pk])
+        detalle_otra = reverse('detalle_casa', args=[self.otra.pk])
+        for url in ('/', detalle, detalle_otra):
+            self.get(url)
+
+        self.casa.titulo = "Casa con título nuevo"
+        self.guardar(self.casa)
+
+        respuesta = self.get('/')
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertContains(respuesta, "Casa con título nuevo")
+        self.assertEqual(self.get(detalle)['X-Cache'], 'MISS')
+        # La otra casa no cambió: su detalle sigue en caché
+        self.assertEqual(self.get(detalle_otra)['X-Cache'], 'HIT')
+
+    def test_agregar_imagen_invalida_la_tarjeta(self):
+        self.get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            agregar_imagenes(self.casa, 1)
+        imagen = self.casa.imagenes.get()
+
+        respuesta = self.get('/')
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertContains(respuesta, reverse('servir_variante', args=[imagen.imagen_base_id, 'tarjeta', 'jpeg']))
+
+    def test_token_csrf_por_visitante(self):
+        primero = self.get('/')
+        segundo = self.get('/')
+        self.assertEqual(segundo['X-Cache'], 'HIT')
+        self.assertNotContains(segundo, '__multicasa_csrf__')
+        self.assertContains(segundo, 'name="csrfmiddlewaretoken"')
+        self.assertEqual(primero.status_code, 200)
+
+    @override_settings(ALLOWED_HOSTS=['multicasa.com', 'www.multicasa.com'])
+    def test_la_clave_incluye_host_y_esquema(self):
+        for numero in range(3, 6):
+            crear_casa(numero)
+        url = reverse('casa_api_list')
+
+        def siguiente(host, secure=False):
+            respuesta = self.get_api(url, host, secure)
+            return respuesta['X-Cache'], urlparse(respuesta.json()['next'])[:2]
+
+        self.assertEqual(siguiente('multicasa.com'), ('MISS', ('http', 'multicasa.com')))
+        self.assertEqual(siguiente('multicasa.com'), ('HIT', ('http', 'multicasa.com')))
+        self.assertEqual(siguiente('www.multicasa.com'), ('MISS', ('http', 'www.multicasa.com')))
+        self.assertEqual(siguiente('multicasa.com', secure=True), ('MISS', ('https', 'multicasa.com')))
+
+
+# =========================
+# CACHÉ DE FRAGMENTOS (tarjetas y últimos movimientos)
+# =========================
+
+class CacheFragmentosTests(PruebaConAlmacen):
+
+    def setUp(self):
+        super().setUp()
+        self.casas = [crear_casa(numero) for numero in range(4)]
+        for casa in self.casas:
+            agregar_imagenes(casa, 2)
+
+    def get(self, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url)
+
+    def test_tarjetas_reutilizadas_con_filtros_nuevos(self):
+        self.get('/')
+        # Filtros nuevos: la página no está en caché, pero las tarjetas sí
+        # (solo la consulta de casas; sin imágenes ni últimos movimientos)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get('/?habitaciones=3')['X-Cache'], 'MISS')
+
+    def test_solo_se_rehace_la_tarjeta_que_cambio(self):
+        self.get('/')
+        casa = self.casas[0]
+        casa.titulo = "Tarjeta actualizada"
+        with self.captureOnCommitCallbacks(execute=True):
+            casa.save()
+
+        # Casas, imágenes de la casa que cambió y últimos movimientos (versión del listado)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.get('/?banos=2')
+        self.assertEqual(len(consultas), 3)
+        imagenes = [consulta['sql'] for consulta in consultas if 'web_imagencasa' in consulta['sql']]
+        self.assertEqual(len(imagenes), 1)
+        self.assertIn(f'IN ({casa.pk})', imagenes[0])
+        self.assertContains(respuesta, "Tarjeta actualizada")
+        self.assertEqual(len(respuesta.context['lista_casas']), 4)
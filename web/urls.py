@@ -10,12 +10,29 @@ urlpatterns = [
 
     path('casa/<int:id_casa>/pdf/', views.generar_pdf_casa, name='generar_pdf_casa'),
 
+    # Imágenes de la galería servidas como archivos (con ETag y 304)
+    path('imagen/<int:id_imagen>/', views.servir_imagen, name='servir_imagen'),
+    path('imagen/<int:id_imagen>/<slug:tipo>.<slug:formato>', views.servir_variante, name='servir_variante'),
+
     # --- Ruta Privada/Admin ---
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('exportar/catalogo.<slug:formato>', views.exportar_catalogo, name='exportar_catalogo'),
+
+    # Proxy de geocodificación para el mapa del admin (caché + límite de Nominatim)
+    path('geo/search/', views.geo_buscar, name='geo_buscar'),
+    path('geo/reverse/', views.geo_inverso, name='geo_inverso'),
 
     # --- RUTAS DE API REST (JSON) ---
     path('api/casas/', views.casa_api_list, name='casa_api_list'),
+    path('api/casas/<int:id_casa>/', views.casa_api_detalle, name='casa_api_detalle'),
+    path('api/mapa/clusters/', views.mapa_clusters, name='mapa_clusters'),
+    path('api/ubicaciones/estados/', views.ubicaciones_estados, name='ubicaciones_estados'),
+    path('api/ubicaciones/municipios/', views.ubicaciones_municipios, name='ubicaciones_municipios'),
+    path('api/ubicaciones/codigos-postales/', views.ubicaciones_codigos_postales, name='ubicaciones_codigos_postales'),
+    path('api/codigos-postales/<str:codigo>/', views.codigo_postal_detalle, name='codigo_postal_detalle'),
     
     # --- NUEVA RUTA PARA REPORTE DE VENTAS (FUERA DEL ADMIN) ---
     path('reporte-ventas/', views.reporte_ventas_pdf, name='reporte_ventas_pdf'),
+    path('reporte-ventas/<int:id_reporte>/estado/', views.reporte_ventas_estado, name='reporte_ventas_estado'),
+    path('reporte-ventas/<int:id_reporte>/pdf/', views.reporte_ventas_descargar, name='reporte_ventas_descargar'),
 ]
\ No newline at end of file
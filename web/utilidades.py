@@ -0,0 +1,15 @@
+import re
+import unicodedata
+
+
+def normalizar_texto(texto):
+    """
+    Minúsculas, sin acentos y sin signos: 'Ramos Arizpe, Coah.' -> 'ramos arizpe coah'
+    """
+    if not texto:
+        return ''
+    sin_acentos = ''.join(
+        caracter for caracter in unicodedata.normalize('NFKD', str(texto))
+        if not unicodedata.combining(caracter)
+    )
+    return re.sub(r'[^a-z0-9]+', ' ', sin_acentos.lower()).strip()
@@ -1,37 +1,41 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Casa  # Importamos el modelo Casa
-from django.http import HttpResponse
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-import io
+from .models import Casa, CasaEliminada, ImagenBase, ReporteVentas, VarianteImagen, prefetch_imagenes  # Importamos los modelos
+from django.http import HttpResponse, FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
+from django.db.models import Count, Max
 from django.core.mail import send_mail
 from django.contrib import messages
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .serializers import CasaListSerializer
+from .serializers import CasaListSerializer, CasaDetalleSerializer
+from .almacenamiento import obtener_almacen
+from .paginacion import TAMANO_PAGINA, paginar_keyset, url_con_cursor
+from .filtros import filtrar_casas, orden_resultados, prefijo
+from .fichas import huella_ficha, obtener_ficha, portada_ficha
+from .estadisticas import estadisticas_dashboard
+from .reportes import ruta_reporte, solicitar_reporte_ventas
+from .exportacion import GENERADORES, TIPO_CONTENIDO_XLSX, columnas_exportacion, escribir_xlsx, filas_catalogo
+from .utilidades import normalizar_texto
+from .geo import cerca_de, leer_caja, leer_centro, radio_por_defecto
+from .mapa import ZOOM_MAXIMO, clusters_de_caja, como_geojson
+from .geocodificacion import ErrorGeocodificacion, buscar_lugar, direccion_de_punto
+from .codigos_postales import buscar_codigo_postal
+from .cache_paginas import (
+    alias_cache_fragmentos, pagina_en_cache, preparar_tarjetas, segundos_cache_fragmentos, version_listado,
+)
 from django.utils import timezone  # NUEVO IMPORT
+from django.utils.dateparse import parse_datetime
+import hashlib
+import tempfile
 
 
-def render_to_pdf(template_src, context_dict={}):
-    """
-    Función para renderizar un template HTML a un PDF.
-    """
-    template = get_template(template_src)
-    html = template.render(context_dict)
-
-    # Creamos el PDF en memoria
-    result = io.BytesIO()
-
-    # Convertimos el HTML a PDF
-    pdf = pisa.pisaDocument(io.BytesIO(html.encode("UTF-8")), result)
-
-    if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
-    return None
+# Radios (km) que ofrece el buscador para "Cerca de mí"
+RADIOS_BUSQUEDA_KM = [2, 5, 10, 25, 50]
 
 
+@pagina_en_cache('homepage')
 def homepage(request):
     """
     Vista para la página de inicio.
@@ -63,55 +67,56 @@ def homepage(request):
         return redirect('homepage')
 
     # --- 2. LÓGICA DE BÚSQUEDA (SI ES GET) ---
-    # CAMBIO: Agregar prefetch_related para optimizar consultas de imágenes
-    casas = Casa.objects.filter(estatus='en venta').order_by('-fecha_publicacion').prefetch_related('imagenes')
-
-    # NUEVOS FILTROS - Reemplazando los anteriores
-    municipio = request.GET.get('municipio')
-    if municipio:
-        casas = casas.filter(municipio__icontains=municipio)
-
-    estado = request.GET.get('estado')
-    if estado:
-        casas = casas.filter(estado__icontains=estado)
-
-    # NUEVO FILTRO: Código Postal
-    codigo_postal = request.GET.get('codigo_postal')
-    if codigo_postal:
-        casas = casas.filter(codigo_postal__icontains=codigo_postal)
-
-    habitaciones = request.GET.get('habitaciones')
-    if habitaciones and habitaciones != "":
-        casas = casas.filter(habitaciones=habitaciones)
-
-    banos = request.GET.get('banos')
-    if banos and banos != "":
-        casas = casas.filter(banos=banos)
-
-    min_precio = request.GET.get('min_precio')
-    if min_precio:
-        casas = casas.filter(precio__gte=min_precio)
-
-    max_precio = request.GET.get('max_precio')
-    if max_precio:
-        casas = casas.filter(precio__lte=max_precio)
+    casas = Casa.objects.filter(estatus='en venta')
+
+    # Filtros del buscador (texto libre, cercanía, municipio, estado, CP, habitaciones, baños, precio)
+    casas = filtrar_casas(casas, request.GET)
+    centro = leer_centro(request.GET)
+
+    # Paginación por cursor sobre (fecha_publicacion, id_casa), o sobre
+    # (relevancia, id_casa) si se buscó texto: cada página cuesta lo mismo sin
+    # importar qué tan profunda sea
+    pagina = paginar_keyset(
+        casas,
+        orden=orden_resultados(casas),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+    )
+    # Las tarjetas salen de la caché de fragmentos; las imágenes se cargan en UNA
+    # consulta y solo para las casas cuya tarjeta no está en caché
+    preparar_tarjetas(pagina.elementos, prefetch_imagenes())
 
     # --- 3. ÚLTIMOS MOVIMIENTOS ---
-    # Obtener las últimas 5 casas (vendidas o en venta) ordenadas por fecha de modificación
+    # Obtener las últimas 5 casas (vendidas o en venta) ordenadas por fecha de modificación.
+    # El queryset es perezoso: si el bloque está en caché, no se consulta
     ultimos_movimientos = Casa.objects.all().order_by('-fecha_publicacion')[:5]
 
     # --- 4. CONTEXTO FINAL ---
     contexto = {
-        'lista_casas': casas,
+        'lista_casas': pagina,
+        'url_pagina_siguiente': url_con_cursor(request, 'despues', pagina.cursor_siguiente) if pagina.cursor_siguiente else None,
+        'url_pagina_anterior': url_con_cursor(request, 'antes', pagina.cursor_anterior) if pagina.cursor_anterior else None,
         'ultimos_movimientos': ultimos_movimientos,  # NUEVO: agregar al contexto
         'titulo_pagina': 'Bienvenido a Multicasa',
-        'valores_filtro': request.GET
+        'valores_filtro': request.GET,
+        'radios_busqueda': RADIOS_BUSQUEDA_KM,
+        'radio_seleccionado': centro[2] if centro else radio_por_defecto(),
+        'por_distancia': centro is not None,
+        'version_listado': version_listado(),
+        'cache_fragmentos': alias_cache_fragmentos(),
+        'cache_fragmentos_segundos': segundos_cache_fragmentos(),
     }
 
     return render(request, 'publico/index.html', contexto)
 
 
+# Casas cercanas que se muestran en el detalle
+CASAS_CERCANAS = 6
+RADIO_CASAS_CERCANAS_KM = 5
+
+
 # --- Nueva Vista ---
+@pagina_en_cache('detalle_casa', por_casa=True)
 def detalle_casa(request, id_casa):
     """
     Muestra el detalle completo de una casa específica.
@@ -119,92 +124,73 @@ def detalle_casa(request, id_casa):
     # CAMBIO: Agregar prefetch_related para cargar todas las imágenes
     casa = get_object_or_404(Casa.objects.prefetch_related('imagenes'), pk=id_casa)
 
+    # Otras casas en venta alrededor (para el mapa y la lista de cercanas)
+    casas_cercanas = []
+    if casa.latitud is not None and casa.longitud is not None:
+        casas_cercanas = list(
+            cerca_de(
+                Casa.objects.filter(estatus='en venta').exclude(pk=casa.pk),
+                float(casa.latitud), float(casa.longitud), RADIO_CASAS_CERCANAS_KM,
+            ).order_by('distancia', 'id_casa')[:CASAS_CERCANAS]
+        )
+
     contexto = {
         'casa': casa,
+        'casas_cercanas': casas_cercanas,
+        'radio_cercanas_km': RADIO_CASAS_CERCANAS_KM,
         'titulo_pagina': casa.titulo
     }
     return render(request, 'publico/detalle_casa.html', contexto)
 
 
-def generar_pdf_casa(request, id_casa):
+def _ficha_solicitada(request, id_casa):
     """
-    Genera la ficha técnica de una casa en formato PDF.
+    (casa, portada, huella) de la ficha pedida; se calcula una sola vez por petición.
     """
-    # 1. Obtenemos la casa con sus imágenes
-    casa = get_object_or_404(Casa.objects.prefetch_related('imagenes'), pk=id_casa)
+    if not hasattr(request, '_ficha_pdf'):
+        casa = get_object_or_404(Casa, pk=id_casa)
+        portada = portada_ficha(casa)
+        request._ficha_pdf = (casa, portada, huella_ficha(casa, portada))
+    return request._ficha_pdf
 
-    # 2. Definimos el contexto (datos que irán al HTML)
-    contexto = {
-        'casa': casa,
-    }
 
-    # 3. Usamos nuestra función auxiliar para crear el PDF
-    pdf = render_to_pdf('publico/ficha_tecnica.html', contexto)
+def _etag_ficha(request, id_casa):
+    return _ficha_solicitada(request, id_casa)[2]
 
-    if pdf:
-        # 4. Preparamos la respuesta HTTP para que sea una descarga
-        response = HttpResponse(pdf, content_type='application/pdf')
 
-        # El nombre del archivo que se descargará
-        filename = f"Ficha_Tecnica_Casa_{id_casa}.pdf"
+@condition(etag_func=_etag_ficha)
+def generar_pdf_casa(request, id_casa):
+    """
+    Descarga la ficha técnica de una casa en PDF.
+    El PDF se genera una sola vez por versión de la casa (ver web/fichas.py);
+    normalmente ya está listo porque la cola lo genera después de cada edición.
+    """
+    casa, portada, huella = _ficha_solicitada(request, id_casa)
 
-        # Le decimos al navegador que es una descarga.
-        content = f"attachment; filename={filename}"
-        response['Content-Disposition'] = content
-        return response
+    ruta = obtener_ficha(casa, portada, huella)
+    if ruta is None:
+        return HttpResponse("Error al generar el PDF", status=400)
 
-    # Si falla, regresamos un error
-    return HttpResponse("Error al generar el PDF", status=400)
+    response = FileResponse(
+        open(ruta, 'rb'),
+        as_attachment=True,
+        filename=f"Ficha_Tecnica_Casa_{id_casa}.pdf",
+        content_type='application/pdf'
+    )
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
 
 
 @login_required(login_url='/admin/login/')  # Redirige al login del admin si no está logueado
 def admin_dashboard(request):
     """
     Vista para el dashboard privado de administración con gráficos.
+    Los datos vienen de la caché (ver web/estadisticas.py).
     """
-    # --- Gráfico 1: Casas por Estatus (En Venta vs. Vendidas) ---
-    # Contamos las casas agrupadas por 'estatus'
-    estatus_data = Casa.objects.values('estatus').annotate(
-        cantidad=Count('id_casa')
-    ).order_by('estatus')
-
-    # Preparamos los datos para Chart.js
-    estatus_labels = [item['estatus'].title() for item in estatus_data]
-    estatus_valores = [item['cantidad'] for item in estatus_data]
-
-    # --- Gráfico 2: Casas por Rango de Costo ---
-    # Definimos nuestros rangos de precio
-    rangos_precio = {
-        'Menos de $1M': Q(precio__lt=1000000),
-        '$1M - $2M': Q(precio__range=(1000000, 2000000)),
-        '$2M - $3M': Q(precio__range=(2000001, 3000000)),
-        'Más de $3M': Q(precio__gt=3000000),
-    }
-
-    # Creamos un diccionario para guardar los conteos
-    costo_data = {}
-    for nombre, rango_q in rangos_precio.items():
-        # Contamos cuántas casas caen en cada rango
-        costo_data[nombre] = Casa.objects.filter(rango_q).count()
-
-    # Preparamos los datos para Chart.js
-    costo_labels = list(costo_data.keys())
-    costo_valores = list(costo_data.values())
-
-    # --- Preparamos el contexto final ---
     contexto = {
         'titulo_pagina': 'Dashboard de Administración',
-
-        # Datos para el gráfico de estatus
-        'estatus_labels': estatus_labels,
-        'estatus_valores': estatus_valores,
-
-        # Datos para el gráfico de costos
-        'costo_labels': costo_labels,
-        'costo_valores': costo_valores,
+        **estadisticas_dashboard(),
     }
-
-    # Renderizamos la nueva plantilla
     return render(request, 'admin/dashboard.html', contexto)
 
 
@@ -250,62 +236,461 @@ def contact_view(request):
     return render(request, 'publico/contacto.html', contexto)
 
 
+# --- VISTA PARA SERVIR IMÁGENES ---
+
+def _etag_imagen(request, id_imagen):
+    """
+    ETag fuerte a partir del hash del contenido (sin leer el binario).
+    """
+    return ImagenBase.objects.filter(pk=id_imagen).values_list('hash_contenido', flat=True).first() or None
+
+
+def _ultima_modificacion_imagen(request, id_imagen):
+    return ImagenBase.objects.filter(pk=id_imagen).values_list('fecha_creacion', flat=True).first()
+
+
+@condition(etag_func=_etag_imagen, last_modified_func=_ultima_modificacion_imagen)
+def servir_imagen(request, id_imagen):
+    """
+    Sirve los bytes de una imagen de la galería con su tipo de contenido.
+    Si el navegador ya la tiene (ETag / Last-Modified), responde 304.
+    """
+    imagen = get_object_or_404(
+        ImagenBase.objects.only('hash_contenido', 'tipo_contenido'),
+        pk=id_imagen
+    )
+    archivo = imagen.abrir_archivo()
+    if archivo is None:
+        return HttpResponse("Imagen no disponible", status=404)
+
+    response = FileResponse(archivo, content_type=imagen.tipo_contenido)
+    # Los navegadores y CDNs pueden guardarla; al expirar revalidan con el ETag
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+def _etag_variante(request, id_imagen, tipo, formato):
+    return VarianteImagen.objects.filter(
+        imagen_base_id=id_imagen, tipo=tipo, formato=formato
+    ).values_list('hash_contenido', flat=True).first() or None
+
+
+@condition(etag_func=_etag_variante)
+def servir_variante(request, id_imagen, tipo, formato):
+    """
+    Sirve una variante pregenerada (miniatura, tarjeta o completa).
+    Si la imagen todavía no tiene variantes, redirige al original.
+    """
+    variante = VarianteImagen.objects.filter(
+        imagen_base_id=id_imagen, tipo=tipo, formato=formato
+    ).only('hash_contenido', 'tipo_contenido').first()
+    almacen = obtener_almacen()
+    if variante is None or not almacen.existe(variante.hash_contenido):
+        return redirect('servir_imagen', id_imagen=id_imagen)
+
+    response = FileResponse(almacen.abrir(variante.hash_contenido), content_type=variante.tipo_contenido)
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
 # --- VISTA DE API REST ---
 
+def _estado_catalogo(request):
+    """
+    Huella barata del catálogo: total de casas, última modificación y última baja.
+    Se calcula una vez por petición (la usan el ETag y el Last-Modified).
+    """
+    if not hasattr(request, '_estado_catalogo'):
+        resumen = Casa.objects.aggregate(total=Count('id_casa'), ultima=Max('fecha_modificacion'))
+        ultima_baja = CasaEliminada.objects.aggregate(ultima=Max('fecha_eliminacion'))['ultima']
+        fechas = [fecha for fecha in (resumen['ultima'], ultima_baja) if fecha]
+        request._estado_catalogo = {
+            'total': resumen['total'],
+            'ultima': resumen['ultima'],
+            'ultima_baja': ultima_baja,
+            'ultima_modificacion': max(fechas) if fechas else None,
+        }
+    return request._estado_catalogo
+
+
+def _etag_catalogo(request):
+    estado = _estado_catalogo(request)
+    # La respuesta también depende de los parámetros (filtros, cursor, campos)
+    parametros = sorted(request.GET.lists())
+    huella = f"{estado['total']}|{estado['ultima']}|{estado['ultima_baja']}|{parametros}"
+    return hashlib.sha1(huella.encode('utf-8')).hexdigest()
+
+
+def _ultima_modificacion_catalogo(request):
+    return _estado_catalogo(request)['ultima_modificacion']
+
+
+@condition(etag_func=_etag_catalogo, last_modified_func=_ultima_modificacion_catalogo)
+@pagina_en_cache('casa_api_list', tipos=('application/json',))
 @api_view(['GET'])
 def casa_api_list(request):
     """
-    API REST para listar todas las casas en venta.
+    API REST para listar las casas en venta, paginada por cursor.
+    Acepta los mismos filtros que la homepage (incluida la búsqueda de texto ?q=,
+    ordenada por relevancia, la de cercanía ?lat=&lng=&radio_km=, ordenada por
+    distancia, y la ventana del mapa ?bbox=oeste,sur,este,norte) y ?fields=.
+    Con ?updated_since=<fecha ISO> devuelve solo los cambios desde esa fecha.
+    Responde 304 si el cliente ya tiene la versión actual (ETag / Last-Modified).
     """
     try:
-        # 1. Obtenemos las casas con sus imágenes
-        casas = Casa.objects.filter(estatus='en venta').prefetch_related('imagenes')
+        campos = _campos_solicitados(request, CasaListSerializer)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    updated_since = request.GET.get('updated_since')
+    if updated_since:
+        desde = parse_datetime(updated_since)
+        if desde is None:
+            return Response({'error': 'updated_since debe ser una fecha ISO 8601.'}, status=400)
+        if timezone.is_naive(desde):
+            desde = timezone.make_aware(desde)
+        return _casa_api_cambios(request, desde, campos)
 
-        # 2. Las pasamos por el serializador
-        serializer = CasaListSerializer(casas, many=True)
+    try:
+        # 1. Casas filtradas; las imágenes se precargan en una sola consulta
+        casas = Casa.objects.filter(estatus='en venta').prefetch_related(prefetch_imagenes())
+        casas = filtrar_casas(casas, request.GET)
 
-        # 3. Devolvemos la respuesta JSON
-        return Response(serializer.data)
+        # 2. Página actual (siempre del mismo tamaño, sin importar la profundidad)
+        pagina = paginar_keyset(
+            casas,
+            orden=orden_resultados(casas),
+            despues=request.GET.get('despues'),
+            antes=request.GET.get('antes'),
+            tamano=_tamano_pagina_api(request),
+        )
+
+        # 3. Las pasamos por el serializador
+        serializer = CasaListSerializer(pagina.elementos, many=True, campos=campos, context={'request': request})
+
+        # 4. Devolvemos la respuesta JSON con los enlaces de paginación
+        return Response(_respuesta_paginada(request, pagina, serializer.data))
 
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 
-# --- NUEVA VISTA PARA REPORTE DE VENTAS ---
+def _casa_api_cambios(request, desde, campos):
+    """
+    Sincronización incremental: casas creadas, modificadas o vendidas después
+    de 'desde' (de cualquier estatus, en orden de modificación) y los ids de
+    las casas eliminadas en ese periodo (solo en la primera página).
+    """
+    sincronizado_en = timezone.now()
+    casas = Casa.objects.filter(fecha_modificacion__gt=desde).prefetch_related(prefetch_imagenes())
+    pagina = paginar_keyset(
+        casas,
+        orden=[('fecha_modificacion', False), ('id_casa', False)],
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        tamano=_tamano_pagina_api(request),
+    )
+    serializer = CasaListSerializer(pagina.elementos, many=True, campos=campos, context={'request': request})
+
+    datos = _respuesta_paginada(request, pagina, serializer.data)
+    datos['sincronizado_en'] = sincronizado_en
+    if not request.GET.get('despues') and not request.GET.get('antes'):
+        datos['eliminadas'] = list(
+            CasaEliminada.objects.filter(fecha_eliminacion__gt=desde)
+            .order_by('fecha_eliminacion')
+            .values_list('id_casa', flat=True)
+        )
+    return Response(datos)
+
+
+def _respuesta_paginada(request, pagina, resultados):
+    base = request.build_absolute_uri(request.path)
+    return {
+        'next': base + url_con_cursor(request, 'despues', pagina.cursor_siguiente) if pagina.cursor_siguiente else None,
+        'previous': base + url_con_cursor(request, 'antes', pagina.cursor_anterior) if pagina.cursor_anterior else None,
+        'results': resultados,
+    }
+
+
+@pagina_en_cache('casa_api_detalle', por_casa=True, tipos=('application/json',))
+@api_view(['GET'])
+def casa_api_detalle(request, id_casa):
+    """
+    API REST con el detalle de una casa y todas sus imágenes.
+    """
+    try:
+        campos = _campos_solicitados(request, CasaDetalleSerializer)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    casa = Casa.objects.prefetch_related(prefetch_imagenes()).filter(pk=id_casa).first()
+    if casa is None:
+        return Response({'error': 'Casa no encontrada'}, status=404)
+
+    serializer = CasaDetalleSerializer(casa, campos=campos, context={'request': request})
+    return Response(serializer.data)
+
+
+def _campos_solicitados(request, serializer_class):
+    """
+    Lee ?fields=a,b,c y valida que existan en el serializador.
+    """
+    fields = request.GET.get('fields')
+    if not fields:
+        return None
+    campos = [campo.strip() for campo in fields.split(',') if campo.strip()]
+    desconocidos = set(campos) - set(serializer_class.Meta.fields)
+    if desconocidos:
+        raise ValueError(f"Campos no disponibles: {', '.join(sorted(desconocidos))}")
+    return campos
+
+
+def _tamano_pagina_api(request, maximo=100):
+    """
+    ?limite=N (entre 1 y 100); por defecto el mismo tamaño que la homepage.
+    """
+    try:
+        return max(1, min(int(request.GET.get('limite', TAMANO_PAGINA)), maximo))
+    except ValueError:
+        return TAMANO_PAGINA
+
+
+# =========================
+# AUTOCOMPLETADO DEL BUSCADOR
+# =========================
+
+SUGERENCIAS_MAXIMAS = 10
+
+
+def _sugerencias(casas, campo, campo_normalizado, texto):
+    """
+    Valores distintos de 'campo' entre las casas en venta cuyo valor normalizado
+    empieza con 'texto', con cuántas casas tiene cada uno (las más comunes primero).
+    """
+    if texto:
+        casas = casas.filter(prefijo(campo_normalizado, texto))
+    filas = (
+        casas.exclude(**{campo_normalizado: ''})
+        .values(campo_normalizado)
+        .annotate(nombre=Max(campo), cantidad=Count('id_casa'))
+        .order_by('-cantidad', campo_normalizado)[:SUGERENCIAS_MAXIMAS]
+    )
+    response = Response([{'valor': fila['nombre'], 'casas': fila['cantidad']} for fila in filas])
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
+@api_view(['GET'])
+def ubicaciones_estados(request):
+    """
+    Sugerencias de estado: /api/ubicaciones/estados/?q=nue
+    """
+    casas = Casa.objects.filter(estatus='en venta')
+    return _sugerencias(casas, 'estado', 'estado_normalizado', normalizar_texto(request.GET.get('q')))
+
+
+@api_view(['GET'])
+def ubicaciones_municipios(request):
+    """
+    Sugerencias de municipio, opcionalmente dentro de un estado:
+    /api/ubicaciones/municipios/?q=mon&estado=Nuevo León
+    """
+    casas = Casa.objects.filter(estatus='en venta')
+    estado = normalizar_texto(request.GET.get('estado'))
+    if estado:
+        casas = casas.filter(prefijo('estado_normalizado', estado))
+    return _sugerencias(casas, 'municipio', 'municipio_normalizado', normalizar_texto(request.GET.get('q')))
+
+
+@api_view(['GET'])
+def ubicaciones_codigos_postales(request):
+    """
+    Sugerencias de código postal por prefijo: /api/ubicaciones/codigos-postales/?q=250
+    """
+    casas = Casa.objects.filter(estatus='en venta')
+    texto = (request.GET.get('q') or '').strip()
+    return _sugerencias(casas, 'codigo_postal', 'codigo_postal', texto)
+
+
+@api_view(['GET'])
+def codigo_postal_detalle(request, codigo):
+    """
+    Municipio, estado y centroide de un CP según el catálogo local (sin red):
+    /api/codigos-postales/25000/. Lo usa el formulario del admin para autollenar.
+    """
+    ubicacion = buscar_codigo_postal(codigo)
+    if ubicacion is None:
+        return Response({'error': 'Código postal no encontrado.'}, status=404)
+    response = Response(ubicacion._asdict())
+    response['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+# =========================
+# MAPA DE LA HOMEPAGE
+# =========================
+
+@api_view(['GET'])
+def mapa_clusters(request):
+    """
+    Casas en venta agrupadas para el mapa: /api/mapa/clusters/?zoom=12&bbox=oeste,sur,este,norte
+    Regresa un FeatureCollection de GeoJSON con un punto por cluster (cantidad,
+    rango de precios y, si es una sola casa, su id). Ver web/mapa.py.
+    """
+    caja = leer_caja(request.GET)
+    if caja is None:
+        return Response({'error': 'bbox debe ser oeste,sur,este,norte en grados.'}, status=400)
+    try:
+        zoom = max(0, min(int(request.GET.get('zoom', '')), ZOOM_MAXIMO))
+    except ValueError:
+        return Response({'error': 'zoom debe ser un número entero.'}, status=400)
+
+    zoom, clusters = clusters_de_caja(zoom, *caja)
+    datos = como_geojson(clusters)
+    datos['zoom'] = zoom
+    response = Response(datos)
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+# =========================
+# PROXY DE GEOCODIFICACIÓN (mapa del admin, ver static/js/casa_map.js)
+# =========================
+
+def _servicio_ocupado(error):
+    response = JsonResponse({'error': str(error)}, status=503)
+    response['Retry-After'] = '2'
+    return response
+
+
+@login_required(login_url='/admin/login/')
+def geo_buscar(request):
+    """
+    /geo/search/?q=<dirección>: coordenadas y componentes de la dirección
+    (lista con 0 o 1 resultado, con los mismos campos que usa Nominatim).
+    """
+    consulta = (request.GET.get('q') or '').strip()
+    if not consulta:
+        return JsonResponse({'error': 'Falta el parámetro q.'}, status=400)
+    try:
+        resultado = buscar_lugar(consulta[:300])
+    except ErrorGeocodificacion as e:
+        return _servicio_ocupado(e)
+    response = JsonResponse([resultado] if resultado else [], safe=False)
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+@login_required(login_url='/admin/login/')
+def geo_inverso(request):
+    """
+    /geo/reverse/?lat=<lat>&lon=<lon>: componentes de la dirección del punto.
+    """
+    try:
+        lat = float(request.GET.get('lat', ''))
+        lon = float(request.GET.get('lon', ''))
+    except ValueError:
+        return JsonResponse({'error': 'lat y lon deben ser números.'}, status=400)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return JsonResponse({'error': 'Coordenadas fuera de rango.'}, status=400)
+    try:
+        direccion = direccion_de_punto(lat, lon)
+    except ErrorGeocodificacion as e:
+        return _servicio_ocupado(e)
+    response = JsonResponse({'address': direccion or {}})
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+# =========================
+# EXPORTACIÓN DEL CATÁLOGO
+# =========================
+
+@login_required(login_url='/admin/login/')
+def exportar_catalogo(request, formato):
+    """
+    Descarga todo el catálogo (respetando los filtros del buscador) como CSV,
+    JSONL o XLSX. CSV y JSONL se generan en streaming; XLSX (un zip, que no se
+    puede enviar a medias) se escribe en modo write_only a un archivo temporal y
+    se envía desde ahí. En ambos casos la memoria no crece con el catálogo.
+    ?portada=1 agrega la URL de la imagen de portada de cada casa.
+    """
+    if formato not in GENERADORES and formato != 'xlsx':
+        raise Http404("Formato no soportado")
+
+    incluir_portada = request.GET.get('portada') in ('1', 'true', 'si')
+    filas = filas_catalogo(
+        filtrar_casas(Casa.objects.all(), request.GET),
+        incluir_portada=incluir_portada,
+        url_base=request.build_absolute_uri('/')[:-1],
+    )
+    filename = f"Catalogo_Multicasa_{timezone.now().strftime('%Y-%m-%d')}.{formato}"
+
+    if formato == 'xlsx':
+        destino = tempfile.TemporaryFile()
+        try:
+            escribir_xlsx(filas, columnas_exportacion(incluir_portada), destino)
+        except ImportError as e:
+            destino.close()
+            raise Http404(str(e))
+        destino.seek(0)
+        return FileResponse(destino, as_attachment=True, filename=filename, content_type=TIPO_CONTENIDO_XLSX)
+
+    generador, tipo_contenido = GENERADORES[formato]
+    response = StreamingHttpResponse(
+        generador(filas, columnas_exportacion(incluir_portada)),
+        content_type=tipo_contenido
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# --- REPORTE DE VENTAS (se genera en segundo plano, ver web/reportes.py) ---
 @login_required(login_url='/admin/login/')
 def reporte_ventas_pdf(request):
     """
-    Genera un PDF con el reporte de ventas de todas las casas.
-    """
-    # Obtener todas las casas
-    casas = Casa.objects.all().order_by('estatus', '-fecha_publicacion')
-    
-    # Calcular totales
-    casas_en_venta = casas.filter(estatus='en venta')
-    casas_vendidas = casas.filter(estatus='vendida')
-    
-    total_en_venta = sum(casa.precio for casa in casas_en_venta if casa.precio)
-    total_vendidas = sum(casa.precio for casa in casas_vendidas if casa.precio)
-    total_general = total_en_venta + total_vendidas
-    
-    # Contexto para el template
+    GET: lista los últimos reportes. POST: pide uno nuevo y regresa a la lista,
+    donde se muestra el avance hasta que el PDF está listo para descargar.
+    """
+    if request.method == 'POST':
+        reporte = solicitar_reporte_ventas(usuario=request.user)
+        messages.info(request, f"El reporte #{reporte.pk} se está generando; puedes seguir trabajando.")
+        return redirect('reporte_ventas_pdf')
+
     contexto = {
-        'casas': casas,
-        'casas_en_venta': casas_en_venta,
-        'casas_vendidas': casas_vendidas,
-        'total_en_venta': total_en_venta,
-        'total_vendidas': total_vendidas,
-        'total_general': total_general,
-        'fecha_reporte': timezone.now(),
+        'title': 'Reportes de ventas',
+        'reportes': ReporteVentas.objects.select_related('solicitado_por')[:20],
+    }
+    return render(request, 'admin/reportes_ventas.html', contexto)
+
+
+def _estado_reporte(reporte):
+    return {
+        'id': reporte.pk,
+        'estado': reporte.estado,
+        'estado_display': reporte.get_estado_display(),
+        'progreso': reporte.progreso,
+        'mensaje': reporte.mensaje,
+        'url_descarga': reverse('reporte_ventas_descargar', args=[reporte.pk]) if reporte.estado == 'completado' else None,
     }
-    
-    # Generar PDF
-    pdf = render_to_pdf('admin/reporte_ventas.html', contexto)
-    
-    if pdf:
-        response = HttpResponse(pdf, content_type='application/pdf')
-        filename = f"Reporte_Ventas_Multicasa_{timezone.now().strftime('%Y-%m-%d')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    
-    return HttpResponse("Error al generar el PDF", status=400)
\ No newline at end of file
+
+
+@login_required(login_url='/admin/login/')
+def reporte_ventas_estado(request, id_reporte):
+    """
+    Estado y avance de un reporte en JSON (la lista lo consulta cada pocos segundos).
+    """
+    reporte = get_object_or_404(ReporteVentas, pk=id_reporte)
+    return JsonResponse(_estado_reporte(reporte))
+
+
+@login_required(login_url='/admin/login/')
+def reporte_ventas_descargar(request, id_reporte):
+    reporte = get_object_or_404(ReporteVentas, pk=id_reporte, estado='completado')
+    try:
+        archivo = open(ruta_reporte(reporte), 'rb')
+    except FileNotFoundError:
+        raise Http404("El archivo del reporte ya no existe")
+    return FileResponse(
+        archivo, as_attachment=True, filename=reporte.nombre_descarga(), content_type='application/pdf'
+    )